@@ -0,0 +1,288 @@
+# bench_nodes.py
+# This file contains the per-node benchmark. It runs the whole graph, and then
+# each node on its own, against the offline fake model, and reports wall time,
+# CPU time and allocated memory per node.
+#
+# Run it from the repository root:
+#     python -m benchmarks.bench_nodes --personas 2,4,8 --ideas 5,10
+#     python -m benchmarks.bench_nodes --compare benchmarks/results/<commit>.json
+
+import asyncio
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import typer
+from langchain_core.callbacks import BaseCallbackHandler
+from langgraph.types import Command
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks.fake_llm import FakeChatModel, FakeSearch, fake_arxiv_fetch
+from brainstorm.agents.batch import InterruptPolicy, answer_interrupt
+from brainstorm.agents.checkpoints import open_checkpointer
+from brainstorm.agents.speculation import cancel_speculations
+from brainstorm.agents.state import initial_state
+from brainstorm.agents.workflow import build_graph
+from brainstorm.utils.llm_governor import GovernedChatModel, LLMGovernor
+from brainstorm.utils.ui import console as node_console
+from main import stream_graph
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Nodes that wait for the user. They are timed in the graph run only, since
+# they cannot run outside it.
+INTERACTIVE_NODES = {
+    "ask_for_pdf_path",
+    "user_filter_ideas",
+    "user_select_idea",
+    "ask_for_arxiv_search",
+    "user_feedback_on_plan",
+}
+
+out = Console()
+
+
+class NodeTimer(BaseCallbackHandler):
+    """
+    Sums the wall and CPU time of each graph node from its chain callbacks.
+
+    CPU time is process-wide, so nodes that run concurrently (the two
+    context branches) are each charged for the other's work.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self.started: Dict[Any, tuple] = {}
+        self.totals: Dict[str, Dict[str, float]] = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        name = kwargs.get("name")
+        if metadata and name and metadata.get("langgraph_node") == name:
+            self.started[run_id] = (name, time.perf_counter(), time.process_time())
+
+    def _finish(self, run_id) -> None:
+        if run_id not in self.started:
+            return
+        name, wall, cpu = self.started.pop(run_id)
+        totals = self.totals.setdefault(name, {"wall_ms": 0.0, "cpu_ms": 0.0, "calls": 0})
+        totals["wall_ms"] += (time.perf_counter() - wall) * 1000
+        totals["cpu_ms"] += (time.process_time() - cpu) * 1000
+        totals["calls"] += 1
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        # Interrupts surface as errors; the time until the interrupt still counts.
+        self._finish(run_id)
+
+
+def make_config(
+    thread_id: str, llm, workdir: Path, search_latency: float, **overrides
+) -> Dict[str, Any]:
+    return {
+        "configurable": {
+            "thread_id": thread_id,
+            "llm": llm,
+            "cache_enabled": False,
+            "blob_dir": workdir / "blobs",
+            "web_search_tool": FakeSearch(search_latency),
+            "arxiv_fetch": fake_arxiv_fetch,
+            "search_rate": 1e9,
+            "search_burst": 1e9,
+            **overrides,
+        }
+    }
+
+
+async def time_node(runnable, values: Dict, config: Dict, repeat: int) -> Dict[str, float]:
+    """Runs one node `repeat` times untraced for its timings, then once traced for its allocations."""
+    walls, cpus = [], []
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        await runnable.ainvoke(values, config)
+        walls.append((time.perf_counter() - wall) * 1000)
+        cpus.append((time.process_time() - cpu) * 1000)
+    tracemalloc.start()
+    try:
+        await runnable.ainvoke(values, config)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "wall_ms": statistics.median(walls),
+        "cpu_ms": statistics.median(cpus),
+        "alloc_kib": peak / 1024,
+    }
+
+
+async def bench_case(
+    personas: int,
+    ideas_per_persona: int,
+    brainstorm_type: str,
+    latency: float,
+    repeat: int,
+) -> Dict[str, Any]:
+    """Benchmarks the graph and its nodes for one persona and idea count."""
+    model = FakeChatModel(personas=personas, ideas_per_persona=ideas_per_persona, latency=latency)
+    governor = LLMGovernor(max_in_flight=64, rpm=1e9, tpm=1e12)
+    llm = GovernedChatModel(model=model, governor=governor)
+    policy = InterruptPolicy(arxiv_search=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        async with open_checkpointer(workdir / "checkpoints.sqlite") as checkpointer:
+            app = build_graph(checkpointer)
+            timer = NodeTimer()
+            config = make_config("bench-graph", llm, workdir, latency)
+            config["callbacks"] = [timer]
+
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                result = await stream_graph(app, initial_state("Benchmark topic", brainstorm_type), config)
+                while "__interrupt__" in result:
+                    value = answer_interrupt(policy, result["__interrupt__"][0].value)
+                    result = await stream_graph(app, Command(resume=value), config)
+            finally:
+                cancel_speculations("bench-graph")
+            graph = {
+                "wall_ms": (time.perf_counter() - wall) * 1000,
+                "cpu_ms": (time.process_time() - cpu) * 1000,
+                "llm_calls": governor.stats()["requests"],
+            }
+
+            # Each node's input is the state recorded just before it ran.
+            inputs: Dict[str, Dict] = {}
+            async for snapshot in app.aget_state_history(config):
+                for name in snapshot.next:
+                    if name in app.builder.nodes and name not in INTERACTIVE_NODES:
+                        inputs[name] = snapshot.values
+
+            # Background work is disabled so each node is timed on its own.
+            isolated_config = make_config(
+                "bench-node", llm, workdir, latency, speculative_critique=False, speculative_plans=0
+            )
+            nodes: Dict[str, Dict[str, float]] = {}
+            for name, totals in timer.totals.items():
+                nodes[name] = {"graph_wall_ms": totals["wall_ms"], "graph_cpu_ms": totals["cpu_ms"]}
+            for name, values in inputs.items():
+                runnable = app.builder.nodes[name].runnable
+                nodes.setdefault(name, {}).update(
+                    await time_node(runnable, values, isolated_config, repeat)
+                )
+            cancel_speculations("bench-node")
+
+    return {
+        "personas": personas,
+        "ideas_per_persona": ideas_per_persona,
+        "graph": graph,
+        "nodes": nodes,
+    }
+
+
+def case_key(case: Dict[str, Any]) -> str:
+    return f"personas={case['personas']},ideas={case['ideas_per_persona']}"
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _delta(value: Optional[float], baseline: Optional[float]) -> str:
+    if value is None or not baseline:
+        return ""
+    change = (value - baseline) / baseline * 100
+    style = "red" if change > 10 else "green" if change < -10 else "dim"
+    return f"[{style}]{change:+.0f}%[/{style}]"
+
+
+def print_case(case: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    graph = case["graph"]
+    base_nodes = (baseline or {}).get("nodes", {})
+    table = Table(
+        title=(
+            f"{case_key(case)}: graph {graph['wall_ms']:.0f} ms wall, "
+            f"{graph['cpu_ms']:.0f} ms CPU, {graph['llm_calls']} LLM calls"
+            + (f" ({_delta(graph['wall_ms'], baseline['graph']['wall_ms'])})" if baseline else "")
+        )
+    )
+    table.add_column("Node")
+    table.add_column("In graph (ms)", justify="right")
+    table.add_column("Wall (ms)", justify="right")
+    table.add_column("CPU (ms)", justify="right")
+    table.add_column("Alloc (KiB)", justify="right")
+    if baseline:
+        table.add_column("Δ wall", justify="right")
+        table.add_column("Δ CPU", justify="right")
+    for name, node in case["nodes"].items():
+        row = [
+            name,
+            f"{node.get('graph_wall_ms', 0):.1f}",
+            f"{node['wall_ms']:.1f}" if "wall_ms" in node else "-",
+            f"{node['cpu_ms']:.1f}" if "cpu_ms" in node else "-",
+            f"{node['alloc_kib']:.0f}" if "alloc_kib" in node else "-",
+        ]
+        if baseline:
+            base = base_nodes.get(name, {})
+            row += [_delta(node.get("wall_ms"), base.get("wall_ms")), _delta(node.get("cpu_ms"), base.get("cpu_ms"))]
+        table.add_row(*row)
+    out.print(table)
+
+
+def main(
+    personas: str = typer.Option("2,4,8", help="Comma-separated persona counts"),
+    ideas: str = typer.Option("5", help="Comma-separated ideas per persona"),
+    brainstorm_type: str = typer.Option("project", "--type", help="'project' or 'research_paper'"),
+    latency: float = typer.Option(0.0, help="Seconds each fake LLM and search call waits"),
+    repeat: int = typer.Option(3, min=1, help="Timed runs of each node on its own (the median is kept)"),
+    output: Optional[Path] = typer.Option(
+        None, help="Where to write the results (default: benchmarks/results/<commit>.json)"
+    ),
+    compare: Optional[Path] = typer.Option(None, help="Earlier results file to compare against"),
+):
+    """Benchmarks the graph and each node against an offline fake model."""
+    baseline_cases = {}
+    if compare:
+        baseline = json.loads(compare.read_text(encoding="utf-8"))
+        baseline_cases = {case_key(case): case for case in baseline["cases"]}
+        out.print(f"Comparing with {compare} (commit {baseline['commit']}).", style="dim")
+
+    cases: List[Dict[str, Any]] = []
+    node_console.quiet = True
+    for persona_count in (int(p) for p in personas.split(",")):
+        for idea_count in (int(i) for i in ideas.split(",")):
+            case = asyncio.run(bench_case(persona_count, idea_count, brainstorm_type, latency, repeat))
+            cases.append(case)
+            print_case(case, baseline_cases.get(case_key(case)))
+
+    results = {
+        "commit": current_commit(),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "brainstorm_type": brainstorm_type,
+        "latency": latency,
+        "repeat": repeat,
+        "cases": cases,
+    }
+    output = output or RESULTS_DIR / f"{results['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    out.print(f"✅ Results written to {output}", style="green")
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,199 @@
+# bench_startup.py
+# This file contains the CLI startup benchmark. It times short invocations
+# (help, invalid arguments) in fresh interpreters and fails when one of them
+# crashes, returns an unexpected exit code, or imports a heavy dependency that
+# only a running session needs.
+#
+# Run it from the repository root:
+#     python -m benchmarks.bench_startup
+#     python -m benchmarks.bench_startup --max-ms 800 --top 10
+
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Invocations that must return without starting a session, with the exit
+# code each must return.
+PROBES: Dict[str, Tuple[List[str], int]] = {
+    "--help": (["--help"], 0),
+    "run --help": (["run", "--help"], 0),
+    "batch --help": (["batch", "--help"], 0),
+    "invalid --type": (["run", "--type", "bogus", "--topic", "startup"], 1),
+    "invalid --pdf-backend": (["--pdf-backend", "bogus", "run"], 1),
+}
+
+# Packages (and our own modules) that are only needed once a session runs.
+HEAVY_MODULES = (
+    "langchain_google_genai",
+    "langgraph",
+    "langchain",
+    "langchain_community",
+    "langchain_text_splitters",
+    "langchain_core",
+    "pypdf",
+    "pymupdf",
+    "numpy",
+    "brainstorm.agents.nodes",
+    "brainstorm.agents.workflow",
+)
+
+# Runs the CLI with the given arguments, then writes the loaded module names
+# to the file named by BENCH_MODULES_FILE. The CLI's exit code and any
+# traceback are left to the interpreter, so a crash shows in both.
+DRIVER = """
+import json, os, sys
+sys.argv = ["main.py", *sys.argv[1:]]
+try:
+    import main
+    main.app()
+finally:
+    with open(os.environ["BENCH_MODULES_FILE"], "w") as f:
+        json.dump(sorted(sys.modules), f)
+"""
+
+out = Console()
+
+
+def heavy_imports(modules: List[str]) -> List[str]:
+    """Returns the entries of HEAVY_MODULES that `modules` include."""
+    return [
+        heavy
+        for heavy in HEAVY_MODULES
+        if any(module == heavy or module.startswith(heavy + ".") for module in modules)
+    ]
+
+
+def run_probe(args: List[str], importtime: bool = False) -> Tuple[float, List[str], str, int]:
+    """
+    Runs the CLI once in a fresh interpreter. Returns its wall time (ms),
+    loaded modules, stderr and exit code.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        modules_file = Path(tmp) / "modules.json"
+        env = {
+            **os.environ,
+            "BENCH_MODULES_FILE": str(modules_file),
+            # Keeps `run` from prompting for a key before it validates its options.
+            "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "startup-benchmark"),
+        }
+        command = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", DRIVER, *args]
+        start = time.perf_counter()
+        completed = subprocess.run(
+            command,
+            cwd=ROOT,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        modules = json.loads(modules_file.read_text()) if modules_file.exists() else []
+    return elapsed, modules, completed.stderr, completed.returncode
+
+
+def error_summary(stderr: str) -> str:
+    """Returns the exception line at the end of `stderr` (rejoined if wrapped), or its last line."""
+    lines = [line.strip() for line in stderr.strip().splitlines()]
+    for index in range(len(lines) - 1, -1, -1):
+        if re.match(r"[\w.]+(Error|Exception)\b", lines[index]):
+            return " ".join(lines[index:])
+    return lines[-1] if lines else "no output"
+
+
+def interpreter_ms(repeat: int) -> float:
+    """Returns the median time to start and stop a bare interpreter, for reference."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def slowest_imports(importtime_log: str, top: int) -> List[Tuple[str, float]]:
+    """Returns the top-level packages with the largest cumulative import time (ms)."""
+    totals: Dict[str, float] = {}
+    for match in re.finditer(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", importtime_log):
+        cumulative, name = int(match.group(1)), match.group(3)
+        if "." not in name:
+            totals[name] = max(totals.get(name, 0.0), cumulative / 1000)
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main(
+    repeat: int = typer.Option(5, min=1, help="Runs of each invocation (the median is reported)"),
+    max_ms: Optional[float] = typer.Option(
+        None, help="Fail when an invocation's median wall time exceeds this many milliseconds"
+    ),
+    top: int = typer.Option(0, min=0, help="Also list the N slowest top-level imports of each invocation"),
+):
+    """
+    Times short CLI invocations and checks that they exit as expected without
+    importing session-only dependencies.
+    """
+    baseline = interpreter_ms(repeat)
+    table = Table(title=f"CLI startup (bare interpreter: {baseline:.0f} ms)")
+    table.add_column("Invocation")
+    table.add_column("Median (ms)", justify="right")
+    table.add_column("Min (ms)", justify="right")
+    table.add_column("Modules", justify="right")
+    table.add_column("Exit", justify="right")
+    table.add_column("Heavy imports")
+
+    failures = []
+    profiles = {}
+    for name, (args, expected_code) in PROBES.items():
+        times, modules = [], []
+        crashes = set()
+        for _ in range(repeat):
+            elapsed, modules, stderr, code = run_probe(args)
+            times.append(elapsed)
+            if code != expected_code or "Traceback" in stderr:
+                crashes.add(f"{name} exited with {code} (expected {expected_code}): {error_summary(stderr)}")
+        failures.extend(sorted(crashes))
+        median = statistics.median(times)
+        heavy = heavy_imports(modules)
+        if heavy:
+            failures.append(f"{name} imports {', '.join(heavy)}")
+        if max_ms is not None and median > max_ms:
+            failures.append(f"{name} took {median:.0f} ms (limit {max_ms:.0f} ms)")
+        table.add_row(
+            name,
+            f"{median:.0f}",
+            f"{min(times):.0f}",
+            str(len(modules)),
+            f"[red]{code}[/red]" if crashes else str(code),
+            f"[red]{', '.join(heavy)}[/red]" if heavy else "[green]none[/green]",
+        )
+        if top:
+            profiles[name] = slowest_imports(run_probe(args, importtime=True)[2], top)
+    out.print(table)
+
+    for name, imports in profiles.items():
+        out.print(f"\nSlowest imports for '{name}':", style="bold")
+        for package, ms in imports:
+            out.print(f"  {package:<32} {ms:8.1f} ms")
+
+    if failures:
+        for failure in failures:
+            out.print(f"❌ {failure}", style="red")
+        raise typer.Exit(code=1)
+    out.print("✅ Every invocation exited as expected without loading a session-only dependency.", style="green")
+
+
+if __name__ == "__main__":
+    typer.run(main)
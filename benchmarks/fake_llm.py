@@ -0,0 +1,146 @@
+# fake_llm.py
+# This file contains a deterministic, offline stand-in for the chat model and
+# the web and ArXiv searches, so the graph can be timed without a provider.
+
+import asyncio
+import json
+import random
+import re
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from brainstorm.agents.schemas import (
+    CritiqueList,
+    IdeaVoteList,
+    PersonaList,
+    ProjectIdeasList,
+    ResearchIdeasList,
+)
+
+WORDS = (
+    "adaptive solar drone ledger garden sensor quantum river flood bike library "
+    "vaccine compost museum parking elder turbine language recipe transit canopy "
+    "privacy tutor clinic harvest battery marine wildfire census archive robot "
+    "schedule water noise housing market volunteer sleep posture allergy"
+).split()
+
+
+def _format_schema_key(prompt: str) -> Optional[str]:
+    """Returns the top-level field of the JSON example in the prompt's format instructions."""
+    keys = re.findall(r'^\{"(\w+)": \[', prompt, re.MULTILINE)
+    return keys[-1] if keys else None
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Answers every prompt of the graph with a schema-valid response.
+
+    Responses depend only on the prompt, so runs are repeatable. Each call
+    waits `latency` seconds, and streamed responses are split into words.
+    """
+
+    personas: int = 4
+    ideas_per_persona: int = 5
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"personas": self.personas, "ideas_per_persona": self.ideas_per_persona}
+
+    def respond(self, prompt: str) -> str:
+        rng = random.Random(zlib.crc32(prompt.encode()))
+        key = _format_schema_key(prompt)
+
+        if key == "personas":
+            personas = [
+                {"Role": f"Expert {i + 1}", "Goal": "Find strong ideas.", "Backstory": " ".join(rng.sample(WORDS, 12))}
+                for i in range(self.personas)
+            ]
+            return PersonaList.model_validate({"personas": personas}).model_dump_json()
+        if key in ("project_ideas", "research_ideas"):
+            role = re.search(r"- Role: (.*)", prompt)
+            seed = zlib.crc32((role.group(1) if role else "").encode())
+            ideas = []
+            for j in range(self.ideas_per_persona):
+                words = random.Random(seed + j).sample(WORDS, 6)
+                if key == "project_ideas":
+                    ideas.append({"idea": f"A {' '.join(words[:3])} service", "target_audience": words[3], "problem_solved": words[4], "rationale": words[5]})
+                else:
+                    ideas.append({"research_question": f"How does {' '.join(words[:3])} behave?", "potential_methodology": words[3], "potential_contribution": words[4], "rationale": words[5]})
+            model = ProjectIdeasList if key == "project_ideas" else ResearchIdeasList
+            return model.model_validate({key: ideas}).model_dump_json()
+        if key == "votes":
+            ids = re.findall(r"### \[(I\d+)\]", prompt)
+            picks = rng.sample(ids, min(len(ids), max(2, len(ids) // 2)))
+            votes = [{"id": idea_id, "rationale": "Promising."} for idea_id in picks]
+            return IdeaVoteList.model_validate({"votes": votes}).model_dump_json()
+        if key == "critiques":
+            ids = re.findall(r"Idea ID: (\S+)", prompt)
+            critiques = [{"idea_id": idea_id, "critique": " ".join(rng.sample(WORDS, 10))} for idea_id in ids]
+            return CritiqueList.model_validate({"critiques": critiques}).model_dump_json()
+
+        if "Keywords:" in prompt:
+            return ", ".join(rng.sample(WORDS, 4))
+        if "Here are the top ideas" in prompt:
+            listed = re.findall(r"^### \[(I\d+)\] (.*)$", prompt, re.MULTILINE)[:3] or [("I1", "Idea")]
+            titles = [title for _, title in listed]
+            top = [
+                {"idea_id": idea_id, "title": title, "description": " ".join(rng.sample(WORDS, 15))}
+                for idea_id, title in listed
+            ]
+            table = "\n".join(f"| {title} | ... | 7 | 7 | 7 | ok |" for title in titles)
+            return f"{table}\n\nHere are the top ideas:\n```json\n{json.dumps(top)}\n```"
+        if "mermaid" in prompt:
+            body = "\n".join(" ".join(rng.sample(WORDS, 12)) for _ in range(20))
+            return f"# Plan\n\n{body}\n\n```mermaid\ngraph TD; A-->B; B-->C\n```"
+        return " ".join(rng.choice(WORDS) for _ in range(120))
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        text = self.respond("\n".join(str(m.content) for m in messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        text = self.respond("\n".join(str(m.content) for m in messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        text = self.respond("\n".join(str(m.content) for m in messages))
+        for piece in re.split(r"(?<=\s)", text):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+
+class FakeSearch:
+    """A web search tool with the `run` method of DuckDuckGoSearchRun."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def run(self, query: str) -> str:
+        time.sleep(self.latency)
+        rng = random.Random(zlib.crc32(query.encode()))
+        return " ".join(rng.choice(WORDS) for _ in range(200))
+
+
+def fake_arxiv_fetch(query: str, max_docs: int) -> List[Dict[str, Optional[str]]]:
+    """Returns `max_docs` recent paper records for `query`, like the ArXiv fetcher."""
+    rng = random.Random(zlib.crc32(query.encode()))
+    published = time.strftime("%Y-%m-%d")
+    return [
+        {"title": f"On {query} ({i + 1})", "published": published, "summary": " ".join(rng.sample(WORDS, 30))}
+        for i in range(max_docs)
+    ]
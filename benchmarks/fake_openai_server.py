@@ -0,0 +1,121 @@
+# fake_openai_server.py
+# This file contains a local OpenAI-compatible chat completions server that
+# answers with the offline fake model, so the "openai" provider and its
+# connection pool can be exercised without a real endpoint.
+#
+# Run it from the repository root, then point the app at it:
+#     python -m benchmarks.fake_openai_server --port 8765
+#     python main.py --provider openai --base-url http://127.0.0.1:8765/v1 run -q "my topic"
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+import typer
+from rich.console import Console
+
+from benchmarks.fake_llm import FakeChatModel
+
+out = Console()
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Serves POST /v1/chat/completions, streamed or not, over keep-alive connections."""
+
+    protocol_version = "HTTP/1.1"
+    model: FakeChatModel
+    stats: Dict[str, int]
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with self.lock:
+            self.stats["connections"] += 1
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        with self.lock:
+            self.stats["requests"] += 1
+        time.sleep(self.model.latency)
+        prompt = "\n".join(str(message.get("content", "")) for message in request["messages"])
+        text = self.model.respond(prompt)
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(text) // 4,
+            "total_tokens": (len(prompt) + len(text)) // 4,
+        }
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": request.get("model", "fake")}
+
+        if request.get("stream"):
+            events = []
+            for piece in text.split(" "):
+                delta = {"role": "assistant", "content": piece + " "}
+                chunk = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                events.append(f"data: {json.dumps(chunk)}\n\n")
+            last = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            events.append(f"data: {json.dumps(last)}\n\n")
+            if (request.get("stream_options") or {}).get("include_usage"):
+                usage_chunk = {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+                events.append(f"data: {json.dumps(usage_chunk)}\n\n")
+            events.append("data: [DONE]\n\n")
+            self._send("text/event-stream", "".join(events).encode())
+            return
+
+        message = {"role": "assistant", "content": text}
+        response = {
+            **base,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+        self._send("application/json", json.dumps(response).encode())
+
+    def _send(self, content_type: str, body: bytes) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(port: int, model: FakeChatModel) -> ThreadingHTTPServer:
+    """Starts the server on a background thread and returns it; its handler class holds the counters."""
+    handler = type(
+        "Handler", (FakeOpenAIHandler,), {"model": model, "stats": {"connections": 0, "requests": 0}}
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(
+    port: int = typer.Option(8765, help="Port to listen on (127.0.0.1)"),
+    personas: int = typer.Option(4, help="Personas the fake model proposes"),
+    ideas: int = typer.Option(5, help="Ideas per persona"),
+    latency: float = typer.Option(0.0, help="Seconds each response waits"),
+):
+    """Serves fake chat completions until interrupted, then reports requests per connection."""
+    server = serve(port, FakeChatModel(personas=personas, ideas_per_persona=ideas, latency=latency))
+    out.print(f"Serving fake chat completions on http://127.0.0.1:{port}/v1 (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        stats = server.RequestHandlerClass.stats
+        out.print(f"{stats['requests']} requests over {stats['connections']} connections.")
+
+
+if __name__ == "__main__":
+    typer.run(main)
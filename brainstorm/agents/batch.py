@@ -0,0 +1,69 @@
+# batch.py
+# This file contains the input format and scripted interrupt answers for headless batch runs.
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Optional, Union
+
+from pydantic import BaseModel, Field, ValidationError
+
+
+class InterruptPolicy(BaseModel):
+    """Scripted answers for the questions a session normally asks the user."""
+
+    pdf_path: Optional[str] = Field(
+        None, description="PDF to use as extra context, or null to skip."
+    )
+    remove_ideas: List[int] = Field(
+        default_factory=list,
+        description="1-based numbers of shortlisted ideas to remove. Empty keeps all ideas.",
+    )
+    select_idea: int = Field(
+        1, ge=1, description="1-based rank of the top idea to plan. 1 picks the top-ranked idea."
+    )
+    arxiv_search: bool = Field(
+        True, description="Whether to include ArXiv papers in the final plan."
+    )
+
+
+class BatchItem(BaseModel):
+    """A single topic to brainstorm in a batch run."""
+
+    topic: str = Field(..., min_length=1)
+    type: Literal["project", "research_paper"] = "project"
+    policy: InterruptPolicy = Field(default_factory=InterruptPolicy)
+
+
+def load_batch_file(path: Union[str, Path]) -> List[BatchItem]:
+    """
+    Reads a JSONL file with one BatchItem per line. Blank lines are skipped.
+
+    Raises ValueError naming the offending line if any entry is invalid.
+    """
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(BatchItem.model_validate(json.loads(line)))
+            except (json.JSONDecodeError, ValidationError) as e:
+                raise ValueError(f"Line {line_number}: {e}") from e
+    return items
+
+
+def answer_interrupt(policy: InterruptPolicy, payload: Dict[str, Any]) -> str:
+    """Returns the answer the policy gives to an interrupt, as the user would type it."""
+    kind = payload.get("kind")
+    if kind == "pdf_path":
+        return policy.pdf_path or ""
+    if kind == "filter_ideas":
+        return ", ".join(str(number) for number in policy.remove_ideas)
+    if kind == "select_idea":
+        return str(policy.select_idea)
+    if kind == "arxiv_search":
+        return "y" if policy.arxiv_search else "n"
+    if kind == "plan_feedback":
+        # Going back to the selection screen needs a human, so batches always approve.
+        return "y"
+    raise ValueError(f"No scripted answer for interrupt '{kind}'")
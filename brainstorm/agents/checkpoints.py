@@ -0,0 +1,103 @@
+# checkpoints.py
+# This file contains the durable SQLite checkpointer and its retention policy.
+
+import re
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Optional, Union
+
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from brainstorm.utils.cache import DEFAULT_CACHE_DIR
+
+DEFAULT_CHECKPOINT_PATH = DEFAULT_CACHE_DIR / "checkpoints.sqlite"
+
+
+def new_thread_id(topic: str) -> str:
+    """Returns a unique, readable thread id for a new session."""
+    slug = re.sub(r"[^a-z0-9]+", "-", topic.lower()).strip("-")[:32] or "session"
+    return f"{slug}-{uuid.uuid4().hex[:8]}"
+
+
+@asynccontextmanager
+async def open_checkpointer(
+    path: Union[str, Path, None] = None,
+) -> AsyncIterator[AsyncSqliteSaver]:
+    """Opens (and creates, if needed) the file-backed checkpointer."""
+    path = Path(path) if path else DEFAULT_CHECKPOINT_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    async with AsyncSqliteSaver.from_conn_string(str(path)) as saver:
+        await saver.setup()
+        async with saver.lock:
+            await saver.conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " thread_id TEXT PRIMARY KEY,"
+                " topic TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            await saver.conn.commit()
+        yield saver
+
+
+async def touch_session(
+    saver: AsyncSqliteSaver, thread_id: str, topic: Optional[str] = None
+) -> None:
+    """Records that a session was active, registering it on first use."""
+    now = time.time()
+    async with saver.lock:
+        await saver.conn.execute(
+            "INSERT INTO sessions (thread_id, topic, created_at, updated_at) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT(thread_id) DO UPDATE SET updated_at = excluded.updated_at",
+            (thread_id, topic, now, now),
+        )
+        await saver.conn.commit()
+
+
+async def compact_thread(saver: AsyncSqliteSaver, thread_id: str, keep_last: int) -> int:
+    """
+    Deletes all but the `keep_last` most recent checkpoints of a thread.
+
+    Only the latest checkpoint is needed to resume, so older history (for
+    example from repeated 'R' plan loops) can be dropped along with its
+    pending writes. Returns the number of checkpoints removed.
+    """
+    keep_last = max(1, keep_last)
+    async with saver.lock:
+        # Checkpoint ids are time-ordered, so the newest sort last.
+        cursor = await saver.conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ''"
+            " ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, keep_last),
+        )
+        stale_ids = [row[0] for row in await cursor.fetchall()]
+        if not stale_ids:
+            return 0
+        placeholders = ",".join("?" * len(stale_ids))
+        for table in ("checkpoints", "writes"):
+            await saver.conn.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_id IN ({placeholders})",
+                (thread_id, *stale_ids),
+            )
+        await saver.conn.commit()
+    return len(stale_ids)
+
+
+async def prune_sessions(saver: AsyncSqliteSaver, max_age_days: float) -> int:
+    """Deletes sessions that have not been active for `max_age_days`. Returns how many."""
+    cutoff = time.time() - max_age_days * 24 * 3600
+    async with saver.lock:
+        cursor = await saver.conn.execute(
+            "SELECT thread_id FROM sessions WHERE updated_at < ?", (cutoff,)
+        )
+        thread_ids = [row[0] for row in await cursor.fetchall()]
+        await saver.conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+        await saver.conn.commit()
+    for thread_id in thread_ids:
+        await saver.adelete_thread(thread_id)
+    if thread_ids:
+        async with saver.lock:
+            await saver.conn.execute("VACUUM")
+    return len(thread_ids)
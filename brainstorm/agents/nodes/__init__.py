@@ -3,11 +3,16 @@
 from .context import (
     ask_for_pdf_path_node,
     process_pdf_node,
+    web_research_node,
     context_generation_node,
     ask_for_arxiv_search_node,
     arxiv_search_node,
 )
-from .ideation import persona_generation_node, divergent_ideation_node
+from .ideation import (
+    persona_generation_node,
+    divergent_ideation_node,
+    idea_deduplication_node,
+)
 from .evaluation import (
     collaborative_discussion_node,
     red_team_critique_node,
@@ -20,7 +25,7 @@ from .interaction import (
 )
 from .planning import implementation_planning_node
 from .routing import (
-    route_pdf_input,
     route_arxiv_search_feedback,
     route_after_plan_feedback,
+    route_after_idea_selection,
 )
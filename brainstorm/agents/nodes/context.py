@@ -1,83 +1,176 @@
 # This file contains nodes related to context gathering (PDF, Web, ArXiv).
 
-import pypdf
 import datetime
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+from brainstorm.utils.arxiv_search import search_arxiv
+from brainstorm.utils.pdf_utils import extract_pdf_text
 from brainstorm.utils.ui import console
+from brainstorm.utils.web_search import CachedWebSearch, get_search_limiter
 import asyncio
 
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_community.document_loaders import ArxivLoader
+from langchain_core.runnables import Runnable, RunnableConfig
 from langgraph.types import interrupt
 
+from ..runtime import get_blob_store, get_setting, node_llm, node_tracer, open_cache
 from ..state import GraphState
 
+# Rough conversion used to size chunks without calling a tokenizer.
+CHARS_PER_TOKEN = 4
+
 
 async def ask_for_pdf_path_node(state: GraphState) -> Dict[str, Any]:
     """Interrupts to ask the user for a PDF path or to skip."""
     pdf_path = interrupt(
         {
+            "kind": "pdf_path",
             "message": "Optional: Enter the full path to a PDF file for context, or press Enter to skip: "
         }
     )
-    return {"pdf_text": pdf_path.strip() if pdf_path else None}
+    return {"pdf_path": pdf_path.strip() if pdf_path else None}
+
+
+def build_summarizer_chain(llm) -> Runnable:
+    summarizer_prompt = PromptTemplate.from_template(
+        "You are a Research Analyst. Your task is to provide a concise, neutral summary of the following text. Focus on key concepts, definitions, and the current state of the topic.\nText:\n---\n{text_to_summarize}\n---\n\nProvide your summary in a single, dense paragraph."
+    )
+    return summarizer_prompt | llm | StrOutputParser()
 
 
-async def process_pdf_node(state: GraphState) -> Dict[str, Any]:
-    """Extracts text from the PDF path provided in the state."""
-    pdf_path = state.get("pdf_text")
+async def process_pdf_node(state: GraphState, config: RunnableConfig) -> Dict[str, Any]:
+    """
+    PDF branch of the context stage: extracts the PDF provided in the state
+    and summarizes it. Runs alongside the web research branch.
+    """
+    pdf_path = state.get("pdf_path")
     if not pdf_path:
-        return {"pdf_text": None}
+        return {"pdf_text_ref": None, "pdf_summary_ref": None}
 
     if pdf_path.startswith("~"):
         pdf_path = pdf_path.replace("~", str(Path.home()), 1)
 
     console.print(f"📄 PDF path provided: {pdf_path}")
     console.print(f"\n--- 📄 Processing PDF: {pdf_path} ---", style="bold cyan")
+    blob_store = get_blob_store(config)
     try:
-        with open(pdf_path, "rb") as f:
-            reader = pypdf.PdfReader(f)
-            pdf_text = ""
-            for page in reader.pages:
-                extracted = page.extract_text()
-                if extracted:
-                    pdf_text += extracted + "\n\n"
-        if pdf_text:
-            console.print("✅ PDF text successfully extracted.", style="green")
-            return {"pdf_text": pdf_text}
-        else:
+        pdf_text = await asyncio.to_thread(
+            extract_pdf_text,
+            pdf_path,
+            backend=get_setting(config, "pdf_backend", "pypdf"),
+            pages=get_setting(config, "pdf_pages"),
+            workers=get_setting(config, "pdf_workers"),
+        )
+        if not pdf_text:
             console.print(
                 "⚠️ Could not extract text from PDF. Continuing without it.",
                 style="yellow",
             )
-            return {"pdf_text": None}
+            return {"pdf_text_ref": None, "pdf_summary_ref": None}
+        console.print("✅ PDF text successfully extracted.", style="green")
     except FileNotFoundError:
         console.print(
             f"❌ Error: The file '{pdf_path}' was not found. Continuing without it.",
             style="red",
         )
-        return {"pdf_text": None}
+        return {"pdf_text_ref": None, "pdf_summary_ref": None}
     except Exception as e:
         console.print(
             f"❌ An error occurred while reading the PDF: {e}. Continuing without it.",
             style="red",
         )
-        return {"pdf_text": None}
+        return {"pdf_text_ref": None, "pdf_summary_ref": None}
+
+    pdf_text_ref = blob_store.put(pdf_text)
+    try:
+        pdf_summary = await summarize_document(
+            build_summarizer_chain(node_llm(config, "context_generation")),
+            pdf_text,
+            get_setting(config, "summary_chunk_tokens", 8_000),
+            get_setting(config, "summary_concurrency", 4),
+        )
+        console.print("✅ PDF summarized.", style="green")
+        return {"pdf_text_ref": pdf_text_ref, "pdf_summary_ref": blob_store.put(pdf_summary)}
+    except Exception as e:
+        console.print(f"❌ Error summarizing the PDF: {e}. Continuing without it.", style="red")
+        return {"pdf_text_ref": pdf_text_ref, "pdf_summary_ref": None}
 
 
-async def context_generation_node(state: GraphState) -> Dict[str, Any]:
+async def summarize_document(
+    summarizer_chain: Runnable,
+    text: str,
+    chunk_tokens: int = 8_000,
+    max_concurrency: int = 4,
+) -> str:
     """
-    Generates a combined context from a web search and an optional user-provided PDF.
+    Summarizes `text`, using map-reduce when it does not fit in one chunk.
+
+    The text is split into token-bounded chunks that are summarized
+    concurrently (at most `max_concurrency` calls in flight). The partial
+    summaries are then grouped and summarized again, level by level, until a
+    single summary remains.
     """
-    console.print("\n--- 🌐 Context Generation Node ---", style="bold cyan")
+    chunk_chars = chunk_tokens * CHARS_PER_TOKEN
+    if len(text) <= chunk_chars:
+        return await summarizer_chain.ainvoke({"text_to_summarize": text})
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def summarize(piece: str) -> str:
+        async with semaphore:
+            return await summarizer_chain.ainvoke({"text_to_summarize": piece})
+
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_chars, chunk_overlap=chunk_chars // 20
+    )
+    chunks = splitter.split_text(text)
+    console.print(f"-> Summarizing document in {len(chunks)} chunks...")
+    summaries = await asyncio.gather(*(summarize(c) for c in chunks))
+
+    while len(summaries) > 1:
+        # Pack summaries into groups that fit in a chunk; every group takes at
+        # least two so each level shrinks.
+        groups: List[List[str]] = [[]]
+        group_chars = 0
+        for summary in summaries:
+            if len(groups[-1]) >= 2 and group_chars + len(summary) > chunk_chars:
+                groups.append([])
+                group_chars = 0
+            groups[-1].append(summary)
+            group_chars += len(summary)
+        if len(groups) > 1 and len(groups[-1]) == 1:
+            groups[-2].extend(groups.pop())
+        summaries = await asyncio.gather(
+            *(summarize("\n\n".join(group)) for group in groups)
+        )
+    return summaries[0]
+
+
+async def web_research_node(
+    state: GraphState, config: RunnableConfig
+) -> Dict[str, Any]:
+    """
+    Web branch of the context stage: extracts search concepts from the topic,
+    searches them and summarizes the results. Runs alongside the PDF branch.
+    """
+    console.print("\n--- 🌐 Web Research Node ---", style="bold cyan")
     topic = state["topic"]
-    pdf_text = state.get("pdf_text")
-    llm = state["llm"]
+    blob_store = get_blob_store(config)
+    llm = node_llm(config, "context_generation")
 
-    search = DuckDuckGoSearchRun()
+    search = CachedWebSearch(
+        cache=open_cache(config, "search"),
+        search=get_setting(config, "web_search_tool"),
+        limiter=get_search_limiter(
+            get_setting(config, "search_rate", 1.0),
+            get_setting(config, "search_burst", 3.0),
+        ),
+        max_retries=get_setting(config, "search_max_retries", 5),
+        tracer=node_tracer(config),
+    )
 
     concept_extractor_prompt = PromptTemplate.from_template(
         "You are a research assistant. Your task is to deconstruct the user's topic into a list of 3-5 core, searchable concepts or keywords. "
@@ -93,7 +186,7 @@ async def context_generation_node(state: GraphState) -> Dict[str, Any]:
         concepts_str = await concept_extractor_chain.ainvoke({"topic": topic})
         search_concepts = [
             concept.strip() for concept in concepts_str.split(",") if concept.strip()
-        ]
+        ] or [topic]
         console.print(
             f"--- 🔍 Identified concepts for search: {search_concepts} ---",
             style="bold",
@@ -102,56 +195,79 @@ async def context_generation_node(state: GraphState) -> Dict[str, Any]:
         console.print(f"❌ Error during concept extraction: {e}", style="red")
         search_concepts = [topic]
 
-    all_search_results = []
-    for concept in search_concepts:
-        while True:
-            try:
-                search_results = search.run(concept)
-                if search_results:
-                    all_search_results.append(search_results)
-                    console.print(f"✅ Found results for concept '{concept}'.", style="green")
-                else:
-                    console.print(f"⚠️ No results found for concept '{concept}'.", style="yellow")
-                break
-            except Exception as e:
-                if "Ratelimit" in str(e):
-                    console.print("⚠️ Rate limit reached. Retrying after a short delay...", style="yellow")
-                    await asyncio.sleep(3)
-                else:
-                    console.print(f"❌ Error during concept extraction: {e}", style="red")
-                    break
-
-    web_context = "\n\n".join(all_search_results)
+    async def search_concept(concept: str) -> Optional[str]:
+        try:
+            search_results = await search.arun(concept)
+        except Exception as e:
+            console.print(f"❌ Error searching for concept '{concept}': {e}", style="red")
+            return None
+        if search_results:
+            console.print(f"✅ Found results for concept '{concept}'.", style="green")
+        else:
+            console.print(f"⚠️ No results found for concept '{concept}'.", style="yellow")
+        return search_results
 
-    summarizer_prompt = PromptTemplate.from_template(
-        "You are a Research Analyst. Your task is to provide a concise, neutral summary of the following text. Focus on key concepts, definitions, and the current state of the topic.\nText:\n---\n{text_to_summarize}\n---\n\nProvide your summary in a single, dense paragraph."
+    # Search all concepts concurrently, keeping whatever finished before the deadline.
+    search_tasks = [asyncio.create_task(search_concept(c)) for c in search_concepts]
+    done, pending = await asyncio.wait(
+        search_tasks, timeout=get_setting(config, "search_deadline", 60.0)
     )
-    summarizer_chain = summarizer_prompt | llm | StrOutputParser()
+    for task in pending:
+        task.cancel()
+    if pending:
+        console.print(
+            f"⚠️ Search deadline reached. Skipping {len(pending)} unfinished concept searches.",
+            style="yellow",
+        )
+    all_search_results = [
+        task.result() for task in search_tasks if task in done and task.result()
+    ]
+
+    web_context = "\n\n".join(all_search_results)
 
     try:
-        web_summary = await summarizer_chain.ainvoke({"text_to_summarize": web_context})
-        combined_context = f"**Web Search Summary:**\n{web_summary}"
+        web_summary = await summarize_document(
+            build_summarizer_chain(llm),
+            web_context,
+            get_setting(config, "summary_chunk_tokens", 8_000),
+            get_setting(config, "summary_concurrency", 4),
+        )
+        return {"web_summary_ref": blob_store.put(web_summary)}
+    except Exception as e:
+        console.print(f"❌ Error summarizing web search results: {e}", style="red")
+        return {"web_summary_ref": None}
 
-        if pdf_text:
-            pdf_summary = await summarizer_chain.ainvoke(
-                {"text_to_summarize": pdf_text}
-            )
-            combined_context += (
-                f"\n\n---\n\n**Uploaded Document Context:**\n{pdf_summary}"
-            )
 
-        console.print("\n--- Combined Context Summary ---", style="bold magenta")
-        console.print(combined_context)
-        return {"combined_context": combined_context}
-    except Exception as e:
-        console.print(f"❌ Error during context generation: {e}", style="red")
-        return {"combined_context": "No summary could be generated."}
+async def context_generation_node(
+    state: GraphState, config: RunnableConfig
+) -> Dict[str, Any]:
+    """
+    Joins the context branches: combines the web summary and the optional
+    PDF summary into the context used by the later stages.
+    """
+    console.print("\n--- 🧩 Context Generation Node ---", style="bold cyan")
+    blob_store = get_blob_store(config)
+    web_summary = blob_store.get(state.get("web_summary_ref"))
+    pdf_summary = blob_store.get(state.get("pdf_summary_ref"))
+
+    if not web_summary and not pdf_summary:
+        console.print("❌ Error during context generation: no summary was produced.", style="red")
+        return {"combined_context_ref": blob_store.put("No summary could be generated.")}
+
+    combined_context = f"**Web Search Summary:**\n{web_summary or 'No web summary could be generated.'}"
+    if pdf_summary:
+        combined_context += f"\n\n---\n\n**Uploaded Document Context:**\n{pdf_summary}"
+
+    console.print("\n--- Combined Context Summary ---", style="bold magenta")
+    console.print(combined_context)
+    return {"combined_context_ref": blob_store.put(combined_context)}
 
 
 async def ask_for_arxiv_search_node(state: GraphState) -> Dict[str, Any]:
     """Interrupts to ask the user if they want to perform an ArXiv search."""
     use_arxiv = interrupt(
         {
+            "kind": "arxiv_search",
             "message": "\nDo you want to include a search for relevant ArXiv papers in the final plan? (Y/n): "
         }
     )
@@ -161,10 +277,46 @@ async def ask_for_arxiv_search_node(state: GraphState) -> Dict[str, Any]:
         return {"use_arxiv_search": False}
 
 
-async def arxiv_search_node(state: GraphState) -> Dict[str, Any]:
+NO_ARXIV_CONTEXT = "No relevant papers found on ArXiv for this topic."
+
+
+async def fetch_arxiv_context(
+    search_query: str, cache=None, fetch=None, tracer=None
+) -> Tuple[str, List[str]]:
+    """
+    Searches ArXiv and formats the papers from the last two years as plan context.
+
+    Returns the context and the titles of the papers skipped for being older.
+    """
+    papers = await search_arxiv(
+        search_query, cache=cache, max_docs=8, fetch=fetch, tracer=tracer
+    )
+    summaries = []
+    skipped = []
+    today = datetime.datetime.now().date()
+    for paper in papers:
+        title = paper["title"] or "N/A"
+        published_date = (
+            datetime.date.fromisoformat(paper["published"])
+            if paper["published"]
+            else None
+        )
+        if published_date and (today - published_date).days <= 2 * 365:
+            summaries.append(
+                f"**Paper: {title}**\nAbstract: {paper['summary'].replace('\n', ' ') or 'N/A'}"
+            )
+        else:
+            skipped.append(f"Skipping paper '{title}' published on {published_date} (older than 2 years)")
+
+    if not summaries:
+        return NO_ARXIV_CONTEXT, skipped
+    return "**Relevant Research from ArXiv:**\n\n" + "\n\n---\n\n".join(summaries), skipped
+
+
+async def arxiv_search_node(state: GraphState, config: RunnableConfig) -> Dict[str, Any]:
     """Search relevant paper on ArXiv"""
     idea = state["chosen_idea"]
-    arxiv_context = "No relevant papers found on ArXiv for this topic."
+    arxiv_context = NO_ARXIV_CONTEXT
 
     if not idea:
         return {"arxiv_context": arxiv_context}
@@ -174,32 +326,16 @@ async def arxiv_search_node(state: GraphState) -> Dict[str, Any]:
     console.print("\n--- 📚 Searching ArXiv for relevant papers... ---", style="bold cyan")
 
     try:
-        arxiv_loader = ArxivLoader(
-            query=search_query, load_max_docs=8, load_all_available_meta=True
+        arxiv_context, skipped = await fetch_arxiv_context(
+            search_query,
+            cache=open_cache(config, "arxiv"),
+            fetch=get_setting(config, "arxiv_fetch"),
+            tracer=node_tracer(config),
         )
-        paper_documents = arxiv_loader.get_summaries_as_docs()
-
-        if paper_documents:
-            summaries = []
-            today = datetime.datetime.now().date()
-            for doc in paper_documents:
-                published_date = doc.metadata.get("Published")
-                if published_date and (today - published_date).days <= 2 * 365:
-                    summaries.append(
-                        f"**Paper: {doc.metadata.get('Title', 'N/A')}**\nAbstract: {doc.page_content.replace('\n', ' ') or 'N/A'}"
-                    )
-                else:
-                    console.print(
-                        f"Skipping paper '{doc.metadata.get('Title', 'N/A')}' published on {published_date} (older than 2 years)",
-                        style="yellow",
-                    )
-
-            if summaries:
-                arxiv_context = (
-                    "**Relevant Research from ArXiv:**\n\n"
-                    + "\n\n---\n\n".join(summaries)
-                )
-                console.print(arxiv_context)
+        for message in skipped:
+            console.print(message, style="yellow")
+        if arxiv_context != NO_ARXIV_CONTEXT:
+            console.print(arxiv_context)
     except Exception as e:
         console.print(f"❌ Error during ArXiv search: {e}", style="red")
 
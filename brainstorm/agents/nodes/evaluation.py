@@ -1,18 +1,24 @@
 # This file contains nodes related to evaluating and critiquing ideas.
 
-import json
-import re
 import asyncio
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+from brainstorm.utils.prompt_budget import fit_prompt
+from brainstorm.utils.structured_output import (
+    ainvoke_structured,
+    find_json,
+    format_instructions,
+    parse_response,
+)
+from brainstorm.utils.token_stream import ConsoleTokenStream
 from brainstorm.utils.ui import console
-from collections import defaultdict
 
 from langchain.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import merge_configs
 
 from ..schemas import (
-    ProjectIdeasList,
-    ResearchIdeasList,
+    IdeaVoteList,
     CritiqueList,
     TopIdeasList,
 )
@@ -20,11 +26,17 @@ from ..prompts import (
     collaborative_discussion_prompts,
     red_team_prompts,
     evaluation_prompts,
+    top_ideas_prompt,
 )
+from ..registry import copy_registry, idea_title, known_ids, proposed_by
+from ..runtime import get_setting, native_json_provider, node_budget, node_llm
+from ..speculation import background_config, speculate, take_speculation
 from ..state import GraphState
 
 
-async def collaborative_discussion_node(state: GraphState) -> Dict[str, Any]:
+async def collaborative_discussion_node(
+    state: GraphState, config: RunnableConfig
+) -> Dict[str, Any]:
     """
     Simulates a discussion where each persona evaluates all ideas.
     Ideas selected by two or more personas are kept, along with the rationales from each agent who selected them.
@@ -32,33 +44,26 @@ async def collaborative_discussion_node(state: GraphState) -> Dict[str, Any]:
     console.print("\n--- 🤝 Collaborative Discussion Node ---", style="bold cyan")
     topic = state["topic"]
     personas = state["personas"]
-    all_generated_ideas = state["all_generated_ideas"]
+    idea_ids = state["idea_ids"]
     brainstorm_type = state["brainstorm_type"]
-    llm = state.get("llm")
+    llm = node_llm(config, "collaborative_discussion")
 
-    if not all_generated_ideas:
+    if not idea_ids:
         console.print("⚠️ No ideas to discuss. Skipping.", style="yellow")
-        return {"all_generated_ideas": []}
-
-    # Determine the correct parser and keys based on the brainstorm type
-    if brainstorm_type == "project":
-        parser = JsonOutputParser(pydantic_object=ProjectIdeasList)
-        ideas_key = "project_ideas"
-        idea_title_key = "idea"
-    else:  # research_paper
-        parser = JsonOutputParser(pydantic_object=ResearchIdeasList)
-        ideas_key = "research_ideas"
-        idea_title_key = "research_question"
-
-    # Format all ideas into a single string for the prompt context
+        return {"idea_ids": []}
+
+    registry = copy_registry(state["idea_registry"])
+
+    # Format all ideas into a single string for the prompt context. Personas
+    # answer with the bracketed IDs instead of copying the ideas back.
     all_ideas_text = ""
-    for idea in all_generated_ideas:
+    for idea_id in idea_ids:
+        idea = registry["ideas"][idea_id]
         all_ideas_text += (
-            f"### Idea from {idea['Role']}: {idea.get(idea_title_key, 'Untitled')}\n"
+            f"### [{idea_id}] Idea from {proposed_by(registry, idea_id)}: {idea_title(idea)}\n"
         )
         for key, value in idea.items():
-            if key != "Role":
-                all_ideas_text += f"- **{key.replace('_', ' ').title()}:** {value}\n"
+            all_ideas_text += f"- **{key.replace('_', ' ').title()}:** {value}\n"
         all_ideas_text += "\n---\n"
 
     # Set up the LangChain prompt and chain
@@ -66,31 +71,42 @@ async def collaborative_discussion_node(state: GraphState) -> Dict[str, Any]:
     prompt = PromptTemplate(
         template=template,
         input_variables=["Role", "backstory", "topic", "all_ideas"],
-        partial_variables={"format_instructions": parser.get_format_instructions()},
+        partial_variables={"format_instructions": format_instructions(IdeaVoteList)},
     )
-    chain = prompt | llm | parser
+    budget = node_budget(config, "collaborative_discussion")
+    provider = native_json_provider(config)
+    retries = get_setting(config, "json_retries", 1)
 
-    async def get_persona_selections(persona: Dict) -> List[Dict]:
-        """Sub-task to get selections for a single persona."""
+    async def get_persona_votes(persona: Dict) -> List[Dict]:
+        """Sub-task to get the votes of a single persona."""
         console.print(f"-> Asking {persona['Role']} for their top picks...")
         try:
             persona_input = {
                 "role": persona["Role"],
                 "backstory": persona["Backstory"],
             }
-            response = await chain.ainvoke(
-                {
-                    **persona_input,
-                    "topic": topic,
-                    "all_ideas": all_ideas_text,
-                }
+            values, _ = fit_prompt(
+                prompt,
+                {**persona_input, "topic": topic, "all_ideas": all_ideas_text},
+                ["all_ideas"],
+                budget,
+                f"{persona['Role']} discussion",
             )
-            selected_ideas = response.get(ideas_key, [])
+            response = await ainvoke_structured(
+                prompt,
+                llm,
+                values,
+                IdeaVoteList,
+                provider=provider,
+                retries=retries,
+                label=f"{persona['Role']} votes",
+            )
+            votes = [vote.model_dump() for vote in response.votes]
             console.print(
-                f"✅ {persona['Role']} selected {len(selected_ideas)} ideas.",
+                f"✅ {persona['Role']} selected {len(votes)} ideas.",
                 style="green",
             )
-            return selected_ideas
+            return votes
         except Exception as e:
             console.print(
                 f"❌ Error getting selections from {persona['Role']}: {e}",
@@ -98,128 +114,280 @@ async def collaborative_discussion_node(state: GraphState) -> Dict[str, Any]:
             )
             return []
 
-    # Gather selections from all personas
-    persona_selections = await asyncio.gather(
-        *(get_persona_selections(p) for p in personas)
-    )
-
-    # Use a dictionary to track idea counts and rationales
-    idea_tracker = defaultdict(
-        lambda: {"count": 0, "rationales": [], "idea_data": None}
-    )
-
-    # Correlate selections with the persona who made them to store their specific rationale
-    for persona, selected_ideas_list in zip(personas, persona_selections):
-        if not selected_ideas_list:
-            continue
-        for idea in selected_ideas_list:
-            title = idea.get(idea_title_key)
-            if not title:
+    # Gather votes from all personas
+    persona_votes = await asyncio.gather(*(get_persona_votes(p) for p in personas))
+
+    # Record the votes by idea ID, keeping each voter's rationale
+    shortlisted = set(idea_ids)
+    unknown_ids = 0
+    for persona, votes in zip(personas, persona_votes):
+        for vote in votes:
+            matched = known_ids(registry, [vote.get("id", "")])
+            if not matched or matched[0] not in shortlisted:
+                unknown_ids += 1
                 continue
-
-            rationale = idea.get("rationale", "No rationale provided.")
-
-            # Increment the count and add the persona's rationale
-            idea_tracker[title]["count"] += 1
-            idea_tracker[title]["rationales"].append(
-                f"**{persona['Role']}**: {rationale}"
+            # A persona voting twice for the same idea still counts once.
+            registry["votes"].setdefault(matched[0], {}).setdefault(
+                persona["Role"], vote.get("rationale") or "No rationale provided."
             )
-
-            # Store the full original idea data only the first time we encounter it
-            if idea_tracker[title]["idea_data"] is None:
-                original_idea = next(
-                    (
-                        og
-                        for og in all_generated_ideas
-                        if og.get(idea_title_key) == title
-                    ),
-                    None,
-                )
-                if original_idea:
-                    idea_tracker[title]["idea_data"] = original_idea.copy()
-
-    # Filter for ideas that have reached a consensus (selected >= 2 times)
-    collaborative_ideas = []
-    for title, data in idea_tracker.items():
-        if data["count"] >= 2:
-            final_idea = data["idea_data"]
-            if final_idea:
-                # Replace the original rationale with the collection of new ones
-                final_idea["rationale"] = "\n".join(data["rationales"])
-                collaborative_ideas.append(final_idea)
+    if unknown_ids:
+        console.print(f"⚠️ Ignored {unknown_ids} votes for unknown idea IDs.", style="yellow")
+
+    # Keep the ideas that reached a consensus (selected >= 2 times), in the
+    # order they were generated, with the voters' rationales.
+    collaborative_ids = []
+    for idea_id in idea_ids:
+        votes = registry["votes"].get(idea_id, {})
+        if len(votes) >= 2:
+            registry["ideas"][idea_id]["rationale"] = "\n".join(
+                f"**{role}**: {rationale}" for role, rationale in votes.items()
+            )
+            collaborative_ids.append(idea_id)
 
     console.print(
-        f"\nTotal ideas with consensus (>= 2 selections): {len(collaborative_ideas)}",
+        f"\nTotal ideas with consensus (>= 2 selections): {len(collaborative_ids)}",
         style="bold",
     )
-    return {"all_generated_ideas": collaborative_ideas}
 
+    # Critique the whole shortlist while the user is filtering it; the Red
+    # Team node keeps the critiques of the ideas that survive.
+    if collaborative_ids and get_setting(config, "speculative_critique", True):
+        red_team_llm = node_llm(config, "red_team_critique")
+        shortlist = {idea_id: registry["ideas"][idea_id] for idea_id in collaborative_ids}
+        speculate(
+            config,
+            "red_team_critique",
+            lambda: critique_in_shards(
+                red_team_llm,
+                shortlist,
+                brainstorm_type,
+                shard_size=get_setting(config, "critique_shard_size", 4),
+                max_retries=get_setting(config, "critique_shard_retries", 2),
+                config=background_config(config, "red_team_critique"),
+                budget=node_budget(config, "red_team_critique"),
+                provider=native_json_provider(config),
+            ),
+        )
+    return {"idea_registry": registry, "idea_ids": collaborative_ids}
 
-async def red_team_critique_node(state: GraphState) -> Dict[str, Any]:
-    """Runs a 'Red Team' agent to critique a list of ideas."""
-    console.print("\n--- 🛡️ Red Team Critique Node ---", style="bold cyan")
-    ideas_to_critique = state["filtered_ideas"]
-    brainstorm_type = state["brainstorm_type"]
-    llm = state["llm"]
 
-    if not ideas_to_critique:
-        console.print("⚠️ No ideas to critique. Skipping.", style="yellow")
-        return {"critiques": []}
+async def critique_ideas(
+    llm,
+    ideas: Dict[str, Dict],
+    brainstorm_type: str,
+    config: Optional[RunnableConfig] = None,
+    budget: Optional[int] = None,
+    provider: Optional[str] = None,
+) -> Dict[str, str]:
+    """
+    Asks the Red Team agent to critique `ideas`, keyed by ID, in one call,
+    in the native JSON mode of `provider` if given.
 
+    The ideas are trimmed to fit a prompt of `budget` tokens. Returns the
+    critiques by idea ID; critiques of unknown IDs are dropped. Raises if
+    the response is not a CritiqueList even after local repair.
+    """
     critique_input_str = ""
-    for i, idea in enumerate(ideas_to_critique):
-        title = idea.get("idea") or idea.get("research_question", f"Idea {i+1}")
-        critique_input_str += f"Idea Title: {title}\n"
+    for idea_id, idea in ideas.items():
+        critique_input_str += f"Idea ID: {idea_id}\nIdea Title: {idea_title(idea)}\n"
         for key, value in idea.items():
-            if key not in ["Role"]:
-                critique_input_str += f"- {key.replace('_', ' ').title()}: {value}\n"
+            critique_input_str += f"- {key.replace('_', ' ').title()}: {value}\n"
         critique_input_str += "---\n"
 
-    parser = JsonOutputParser(pydantic_object=CritiqueList)
     template = red_team_prompts[brainstorm_type]
     prompt = PromptTemplate(
         template=template,
         input_variables=["ideas_to_critique"],
-        partial_variables={"format_instructions": parser.get_format_instructions()},
+        partial_variables={"format_instructions": format_instructions(CritiqueList)},
     )
-    chain = prompt | llm | parser
+    values, _ = fit_prompt(
+        prompt, {"ideas_to_critique": critique_input_str}, ["ideas_to_critique"], budget, "critique"
+    )
+    # Unrepairable responses are re-requested by the shard retries.
+    response = await ainvoke_structured(
+        prompt, llm, values, CritiqueList, config=config, provider=provider, retries=0
+    )
+    critiques = {}
+    for critique in response.critiques:
+        idea_id = critique.idea_id.strip().strip("[]")
+        if idea_id in ideas:
+            critiques.setdefault(idea_id, critique.critique)
+    return critiques
+
+
+async def critique_in_shards(
+    llm,
+    ideas: Dict[str, Dict],
+    brainstorm_type: str,
+    shard_size: int = 4,
+    max_retries: int = 2,
+    config: Optional[RunnableConfig] = None,
+    budget: Optional[int] = None,
+    provider: Optional[str] = None,
+) -> Tuple[Dict[str, str], int]:
+    """
+    Critiques `ideas`, keyed by ID, in concurrent shards of `shard_size` ideas.
+
+    Shards whose call fails (for example with JSON that could not be
+    repaired) are retried up to `max_retries` times, bypassing the response
+    cache, without repeating the shards that succeeded. Returns the merged
+    critiques by idea ID and the number of shards that still failed.
+    """
+    shard_size = max(1, shard_size)
+    items = list(ideas.items())
+    shards = {
+        start: dict(items[start : start + shard_size]) for start in range(0, len(items), shard_size)
+    }
+    critiques: Dict[str, str] = {}
+    pending = list(shards)
+    for _ in range(max_retries + 1):
+        if not pending:
+            break
+        responses = await asyncio.gather(
+            *(
+                critique_ideas(llm, shards[start], brainstorm_type, config, budget, provider)
+                for start in pending
+            ),
+            return_exceptions=True,
+        )
+        failed = []
+        for start, response in zip(pending, responses):
+            if isinstance(response, Exception):
+                failed.append(start)
+            else:
+                critiques.update(response)
+        pending = failed
+        # A cached response would fail the same way again.
+        llm = llm.model_copy(update={"cache": False})
+    return critiques, len(pending)
+
+
+async def red_team_critique_node(
+    state: GraphState, config: RunnableConfig
+) -> Dict[str, Any]:
+    """Runs a 'Red Team' agent to critique a list of ideas."""
+    console.print("\n--- 🛡️ Red Team Critique Node ---", style="bold cyan")
+    registry = copy_registry(state["idea_registry"])
+    ideas_to_critique = {
+        idea_id: registry["ideas"][idea_id] for idea_id in state["filtered_idea_ids"]
+    }
+    brainstorm_type = state["brainstorm_type"]
+    llm = node_llm(config, "red_team_critique")
+
+    speculative = take_speculation(config, "red_team_critique")
+
+    if not ideas_to_critique:
+        if speculative:
+            speculative.cancel()
+        console.print("⚠️ No ideas to critique. Skipping.", style="yellow")
+        return {"idea_registry": registry}
+
+    critiques: Dict[str, str] = {}
+    if speculative:
+        try:
+            speculative_critiques, _ = await speculative
+            critiques = {
+                idea_id: critique
+                for idea_id, critique in speculative_critiques.items()
+                if idea_id in ideas_to_critique
+            }
+            console.print(
+                f"♻️ Reused {len(critiques)} critiques prepared during your review "
+                f"(discarded {len(speculative_critiques) - len(critiques)} for removed ideas).",
+                style="dim",
+            )
+        except Exception as e:
+            console.print(f"⚠️ Background critique failed ({e}). Critiquing now.", style="yellow")
+    remaining = {
+        idea_id: idea for idea_id, idea in ideas_to_critique.items() if idea_id not in critiques
+    }
 
     try:
-        response = await chain.ainvoke({"ideas_to_critique": critique_input_str})
-        critiques = response.get("critiques", [])
-        for crit in critiques:
-            console.print(f"\nCritique for '{crit['idea_title']}':", style="bold")
-            console.print(f"  - {crit['critique']}")
-        return {"critiques": critiques}
+        if remaining:
+            new_critiques, failed_shards = await critique_in_shards(
+                llm,
+                remaining,
+                brainstorm_type,
+                shard_size=get_setting(config, "critique_shard_size", 4),
+                max_retries=get_setting(config, "critique_shard_retries", 2),
+                config=config,
+                budget=node_budget(config, "red_team_critique"),
+                provider=native_json_provider(config),
+            )
+            critiques.update(new_critiques)
+            if failed_shards:
+                console.print(
+                    f"⚠️ {failed_shards} critique shard(s) failed after retries; "
+                    "their ideas are evaluated without a critique.",
+                    style="yellow",
+                )
     except Exception as e:
         console.print(f"❌ Error during Red Team critique: {e}", style="red")
-        return {"critiques": []}
+
+    for idea_id, idea in ideas_to_critique.items():
+        if idea_id in critiques:
+            console.print(f"\nCritique for [{idea_id}] '{idea_title(idea)}':", style="bold")
+            console.print(f"  - {critiques[idea_id]}")
+    registry["critiques"].update(critiques)
+    return {"idea_registry": registry}
 
 
-async def convergent_evaluation_node(state: GraphState) -> Dict[str, Any]:
+async def request_top_ideas(
+    llm, analysis: str, config: RunnableConfig, retries: int = 0
+) -> TopIdeasList:
+    """
+    Asks for the top ideas recommended by `analysis` on their own, for an
+    analysis whose list could not be read. Raises ValueError if the answer
+    cannot be repaired after `retries` more requests.
+    """
+    prompt = PromptTemplate(
+        template=top_ideas_prompt,
+        input_variables=["analysis"],
+        partial_variables={"format_instructions": format_instructions(TopIdeasList)},
+    )
+    values, _ = fit_prompt(
+        prompt,
+        {"analysis": analysis},
+        ["analysis"],
+        node_budget(config, "convergent_evaluation"),
+        "top ideas",
+    )
+    return await ainvoke_structured(
+        prompt,
+        llm,
+        values,
+        TopIdeasList,
+        config=config,
+        provider=native_json_provider(config),
+        retries=retries,
+        label="top ideas",
+    )
+
+
+async def convergent_evaluation_node(
+    state: GraphState, config: RunnableConfig
+) -> Dict[str, Any]:
     """Analyzes, critiques, and selects the top ideas."""
     console.print("\n--- 📊 Convergent Evaluation Node ---", style="bold cyan")
-    ideas_to_evaluate = state["filtered_ideas"]
-    critiques = state.get("critiques", [])
+    registry = state["idea_registry"]
+    ideas_to_evaluate = state["filtered_idea_ids"]
     brainstorm_type = state["brainstorm_type"]
-    llm = state["llm"]
+    llm = node_llm(config, "convergent_evaluation")
 
     if not ideas_to_evaluate:
         console.print("⚠️ No ideas to evaluate. Skipping.", style="yellow")
         return {"top_ideas": [], "evaluation_markdown": ""}
 
     raw_ideas_string = ""
-    for idea in ideas_to_evaluate:
-        title = idea.get("idea") or idea.get("research_question", "Untitled")
-        raw_ideas_string += f"### {title}\n"
+    for idea_id in ideas_to_evaluate:
+        idea = registry["ideas"][idea_id]
+        raw_ideas_string += f"### [{idea_id}] {idea_title(idea)}\n"
         for key, value in idea.items():
             raw_ideas_string += f"- **{key.replace('_', ' ').title()}:** {value}\n"
 
-        matching_critique = next(
-            (c["critique"] for c in critiques if c["idea_title"] == title), None
-        )
-        if matching_critique:
-            raw_ideas_string += f"- **Red Team Critique:** {matching_critique}\n"
+        critique = registry["critiques"].get(idea_id)
+        if critique:
+            raw_ideas_string += f"- **Red Team Critique:** {critique}\n"
         raw_ideas_string += "\n---\n"
 
     parser = StrOutputParser()
@@ -228,34 +396,68 @@ async def convergent_evaluation_node(state: GraphState) -> Dict[str, Any]:
     chain = prompt | llm | parser
 
     try:
-        full_response = await chain.ainvoke({"raw_ideas": raw_ideas_string})
+        values, _ = fit_prompt(
+            prompt,
+            {"raw_ideas": raw_ideas_string},
+            ["raw_ideas"],
+            node_budget(config, "convergent_evaluation"),
+            "evaluation",
+        )
+        # The analysis is printed as it is generated; the JSON block is
+        # extracted once the response is complete.
+        console.print("\n--- Full Analysis ---", style="bold magenta")
+        token_stream = ConsoleTokenStream()
+        full_response = await chain.ainvoke(
+            values,
+            config=merge_configs(config, {"callbacks": [token_stream]}),
+        )
         analysis_markdown = full_response
         top_ideas_list = []
 
-        json_match = re.search(r"```json\s*([\s\S]*?)\s*```", full_response, re.DOTALL)
-        if json_match:
-            json_string = json_match.group(1).strip()
-            try:
-                parsed_json = json.loads(json_string)
-                top_ideas_obj = TopIdeasList(ideas=parsed_json)
-                top_ideas_list = top_ideas_obj.model_dump()["ideas"]
-                analysis_markdown = full_response.replace(
-                    json_match.group(0), ""
-                ).strip()
-            except (json.JSONDecodeError, TypeError) as e:
+        # The top ideas end the analysis, normally in a ```json block. A
+        # malformed list is repaired locally, and only if that fails is it
+        # asked for again, on its own.
+        marker = max(full_response.find("Here are the top ideas"), 0)
+        span = find_json(full_response[marker:])
+        try:
+            if not span:
+                raise ValueError("the analysis holds no JSON")
+            start, end = marker + span[0], marker + span[1]
+            analysis_markdown = (full_response[:start] + full_response[end:]).strip()
+            top_ideas = parse_response(full_response[start:end], TopIdeasList)
+        except ValueError as e:
+            error, top_ideas = e, None
+            retries = get_setting(config, "json_retries", 1)
+            if retries:
                 console.print(
-                    f"❌ Error decoding or validating JSON from evaluation: {e}",
-                    style="red",
+                    f"⚠️ Could not read the top ideas ({e}). Asking for them again...",
+                    style="yellow",
                 )
+                try:
+                    top_ideas = await request_top_ideas(llm, analysis_markdown, config, retries - 1)
+                except ValueError as retry_error:
+                    error = retry_error
+            if top_ideas is None:
+                console.print(f"❌ Error decoding or validating JSON from evaluation: {error}", style="red")
+        if top_ideas:
+            top_ideas_list = top_ideas.model_dump()["ideas"]
+            # Link each recommendation to its registry record. Unknown IDs are
+            # cleared, as are repeats, so an ID names one recommendation.
+            linked = set()
+            for idea in top_ideas_list:
+                matched = known_ids(registry, [idea["idea_id"]])
+                idea["idea_id"] = matched[0] if matched and matched[0] not in linked else ""
+                linked.add(idea["idea_id"])
 
-        console.print("\n--- Full Analysis ---", style="bold magenta")
-        console.print(analysis_markdown)
+        if not token_stream.streamed:
+            console.print(analysis_markdown)
 
         if top_ideas_list:
             console.print("\n--- Top Ideas ---", style="bold green")
             for idea in top_ideas_list:
                 console.print(
-                    f"- Title: {idea['title']}\n  Description: {idea['description']}\n"
+                    f"- Title: {idea['title']}{f' [{idea['idea_id']}]' if idea['idea_id'] else ''}\n"
+                    f"  Description: {idea['description']}\n"
                 )
 
         return {"evaluation_markdown": analysis_markdown, "top_ideas": top_ideas_list}
@@ -2,37 +2,55 @@
 
 import asyncio
 from typing import Dict, Any, List, Optional
+from brainstorm.utils.dedup import near_duplicate_groups
+from brainstorm.utils.prompt_budget import fit_prompt
+from brainstorm.utils.structured_output import ainvoke_structured, format_instructions
 from brainstorm.utils.ui import console
 
 from langchain.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.runnables import RunnableConfig
 
 from ..schemas import PersonaList, ProjectIdeasList, ResearchIdeasList
 from ..prompts import persona_prompts, ideation_prompts
+from ..registry import add_idea, copy_registry, merge_ideas, new_registry, proposed_by
+from ..runtime import get_blob_store, get_setting, native_json_provider, node_budget, node_llm
 from ..state import GraphState
 
 
-async def persona_generation_node(state: GraphState) -> Dict[str, Any]:
+async def persona_generation_node(
+    state: GraphState, config: RunnableConfig
+) -> Dict[str, Any]:
     """Generates a team of distinct expert personas for a given topic."""
     console.print("\n--- 🧑‍💼 Persona Generation Node ---", style="bold cyan")
     topic = state["topic"]
-    combined_context = state["combined_context"]
+    combined_context = get_blob_store(config).get(state["combined_context_ref"])
     brainstorm_type = state["brainstorm_type"]
-    llm = state["llm"]
+    llm = node_llm(config, "persona_generation")
 
-    parser = JsonOutputParser(pydantic_object=PersonaList)
     template = persona_prompts[brainstorm_type]
     prompt = PromptTemplate(
         template=template,
         input_variables=["topic", "combined_context"],
-        partial_variables={"format_instructions": parser.get_format_instructions()},
+        partial_variables={"format_instructions": format_instructions(PersonaList)},
     )
-    chain = prompt | llm | parser
     try:
-        response = await chain.ainvoke(
-            {"topic": topic, "combined_context": combined_context}
+        values, _ = fit_prompt(
+            prompt,
+            {"topic": topic, "combined_context": combined_context},
+            ["combined_context"],
+            node_budget(config, "persona_generation"),
+            "persona generation",
         )
-        personas = response["personas"]
+        response = await ainvoke_structured(
+            prompt,
+            llm,
+            values,
+            PersonaList,
+            provider=native_json_provider(config),
+            retries=get_setting(config, "json_retries", 1),
+            label="persona list",
+        )
+        personas = [persona.model_dump() for persona in response.personas]
         for p in personas:
             console.print(
                 f"- Role: {p['Role']}\n  Goal: {p['Goal']}\n  Backstory: {p['Backstory']}\n"
@@ -43,29 +61,33 @@ async def persona_generation_node(state: GraphState) -> Dict[str, Any]:
         return {"personas": []}
 
 
-async def divergent_ideation_node(state: GraphState) -> Dict[str, Any]:
+async def divergent_ideation_node(
+    state: GraphState, config: RunnableConfig
+) -> Dict[str, Any]:
     """Generates a wide range of ideas from the perspective of each persona."""
     console.print("\n--- 💡 Divergent Ideation Node ---", style="bold cyan")
     topic = state["topic"]
     personas = state["personas"]
-    combined_context = state["combined_context"]
+    combined_context = get_blob_store(config).get(state["combined_context_ref"])
     brainstorm_type = state["brainstorm_type"]
-    llm = state["llm"]
+    llm = node_llm(config, "divergent_ideation")
 
     if brainstorm_type == "project":
-        parser = JsonOutputParser(pydantic_object=ProjectIdeasList)
+        schema = ProjectIdeasList
         ideas_key = "project_ideas"
     else:
-        parser = JsonOutputParser(pydantic_object=ResearchIdeasList)
+        schema = ResearchIdeasList
         ideas_key = "research_ideas"
 
     template = ideation_prompts[brainstorm_type]
     prompt_template = PromptTemplate(
         template=template,
         input_variables=["Role", "backstory", "goal", "topic", "combined_context"],
-        partial_variables={"format_instructions": parser.get_format_instructions()},
+        partial_variables={"format_instructions": format_instructions(schema)},
     )
-    chain = prompt_template | llm | parser
+    budget = node_budget(config, "divergent_ideation")
+    provider = native_json_provider(config)
+    retries = get_setting(config, "json_retries", 1)
 
     async def generate_for_persona(persona: Dict) -> Optional[List[Dict]]:
         try:
@@ -74,21 +96,29 @@ async def divergent_ideation_node(state: GraphState) -> Dict[str, Any]:
                 "backstory": persona["Backstory"],
                 "goal": persona["Goal"],
             }
-            result = await chain.ainvoke(
-                {**persona_input, "topic": topic, "combined_context": combined_context}
+            values, _ = fit_prompt(
+                prompt_template,
+                {**persona_input, "topic": topic, "combined_context": combined_context},
+                ["combined_context"],
+                budget,
+                f"{persona['Role']} ideation",
+            )
+            result = await ainvoke_structured(
+                prompt_template,
+                llm,
+                values,
+                schema,
+                provider=provider,
+                retries=retries,
+                label=f"{persona['Role']} ideas",
             )
 
-            ideas_with_context = []
-            for idea_obj in result.get(ideas_key, []):
-                idea_with_context = idea_obj
-                idea_with_context["Role"] = persona["Role"]
-                ideas_with_context.append(idea_with_context)
-
+            ideas = [idea.model_dump() for idea in getattr(result, ideas_key)]
             console.print(
                 f"✅ Ideas successfully generated and parsed for {persona['Role']}.",
                 style="green",
             )
-            return ideas_with_context
+            return ideas
         except Exception as e:
             console.print(
                 f"❌ Error generating ideas for {persona['Role']}: {e}", style="red"
@@ -98,11 +128,56 @@ async def divergent_ideation_node(state: GraphState) -> Dict[str, Any]:
     results_from_personas = await asyncio.gather(
         *(generate_for_persona(p) for p in personas)
     )
-    all_generated_ideas = [
-        idea for sublist in results_from_personas if sublist for idea in sublist
+    # Every idea gets a short, stable ID that later stages use to refer to it.
+    registry = new_registry()
+    idea_ids = [
+        add_idea(registry, idea, persona["Role"])
+        for persona, ideas in zip(personas, results_from_personas)
+        if ideas
+        for idea in ideas
     ]
     console.print(
-        f"\nTotal ideas generated across all personas: {len(all_generated_ideas)}\n",
+        f"\nTotal ideas generated across all personas: {len(idea_ids)}\n",
         style="bold",
     )
-    return {"all_generated_ideas": all_generated_ideas}
+    return {"idea_registry": registry, "idea_ids": idea_ids}
+
+
+async def idea_deduplication_node(
+    state: GraphState, config: RunnableConfig
+) -> Dict[str, Any]:
+    """
+    Merges near-identical ideas before the discussion, offline.
+
+    Ideas whose content (every field except the rationale) has a cosine
+    similarity of at least "dedup_threshold" are merged into the first of
+    them, which keeps its ID and is credited to every contributing persona.
+    """
+    console.print("\n--- 🧹 Idea Deduplication Node ---", style="bold cyan")
+    idea_ids = state["idea_ids"]
+    threshold = get_setting(config, "dedup_threshold", 0.6)
+    if not threshold or len(idea_ids) < 2:
+        return {"idea_ids": idea_ids}
+
+    registry = copy_registry(state["idea_registry"])
+    texts = [
+        " ".join(str(value) for key, value in registry["ideas"][idea_id].items() if key != "rationale")
+        for idea_id in idea_ids
+    ]
+    kept_ids = []
+    for group in near_duplicate_groups(texts, threshold):
+        keep_id = idea_ids[group[0]]
+        merge_ideas(registry, keep_id, [idea_ids[i] for i in group[1:]])
+        kept_ids.append(keep_id)
+        if len(group) > 1:
+            console.print(
+                f"  Merged {', '.join(idea_ids[i] for i in group)} (from {proposed_by(registry, keep_id)})",
+                style="dim",
+            )
+
+    console.print(
+        f"✅ Merged {len(idea_ids) - len(kept_ids)} near-duplicate ideas; "
+        f"{len(kept_ids)} ideas go to the discussion.",
+        style="green",
+    )
+    return {"idea_registry": registry, "idea_ids": kept_ids}
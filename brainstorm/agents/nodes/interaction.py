@@ -1,10 +1,14 @@
 # This file contains nodes that require user interaction (interrupts).
 
 from typing import Dict, Any
+from langchain_core.runnables import RunnableConfig
 from langgraph.types import interrupt
 from brainstorm.utils.ui import console
 
+from ..registry import known_ids, proposed_by, top_idea_key
 from ..state import GraphState
+from .context import NO_ARXIV_CONTEXT
+from .planning import start_plan_speculation
 
 
 async def user_filter_ideas_node(state: GraphState) -> Dict[str, Any]:
@@ -17,13 +21,17 @@ async def user_filter_ideas_node(state: GraphState) -> Dict[str, Any]:
         style="white",
     )
     brainstorm_type = state["brainstorm_type"]
-    all_ideas = state.get("all_generated_ideas")
+    registry = state["idea_registry"]
+    all_ideas = state.get("idea_ids")
     if not all_ideas:
         console.print("\nNo ideas were generated to be filtered. Continuing.", style="yellow")
-        return {"filtered_ideas": []}
+        return {"filtered_idea_ids": []}
 
-    for i, idea in enumerate(all_ideas):
-        console.print(f"\n--- Idea [{i+1}] (from Personas' Discussion) ---", style="bold")
+    for i, idea_id in enumerate(all_ideas):
+        idea = registry["ideas"][idea_id]
+        console.print(
+            f"\n--- Idea [{i+1}] (proposed by {proposed_by(registry, idea_id)}) ---", style="bold"
+        )
         if brainstorm_type == "project":
             console.print(f"  Idea: {idea.get('idea', 'N/A')}")
             console.print(f"  Target Audience: {idea.get('target_audience', 'N/A')}")
@@ -37,32 +45,33 @@ async def user_filter_ideas_node(state: GraphState) -> Dict[str, Any]:
 
     indices_to_remove_str = interrupt(
         {
+            "kind": "filter_ideas",
             "message": "\nEnter the numbers of ideas to REMOVE, separated by commas (e.g., 2, 5), or press Enter to keep all: "
         }
     )
 
     if not indices_to_remove_str or not indices_to_remove_str.strip():
         console.print(f"\n✅ Keeping all {len(all_ideas)} ideas. Resuming workflow...", style="green")
-        return {"filtered_ideas": all_ideas}
+        return {"filtered_idea_ids": all_ideas}
 
     try:
         indices_to_remove = {
             int(num.strip()) - 1 for num in indices_to_remove_str.split(",")
         }
-        filtered_ideas = [
-            idea for i, idea in enumerate(all_ideas) if i not in indices_to_remove
+        filtered_ids = [
+            idea_id for i, idea_id in enumerate(all_ideas) if i not in indices_to_remove
         ]
         console.print(
-            f"\n✅ Removed {len(all_ideas) - len(filtered_ideas)} ideas. {len(filtered_ideas)} ideas remaining. Resuming workflow...",
+            f"\n✅ Removed {len(all_ideas) - len(filtered_ids)} ideas. {len(filtered_ids)} ideas remaining. Resuming workflow...",
             style="green",
         )
-        return {"filtered_ideas": filtered_ideas}
+        return {"filtered_idea_ids": filtered_ids}
     except ValueError:
         console.print("⚠️ Invalid input. Could not parse numbers. Keeping all ideas.", style="yellow")
-        return {"filtered_ideas": all_ideas}
+        return {"filtered_idea_ids": all_ideas}
 
 
-async def user_select_idea_node(state: GraphState) -> Dict[str, Any]:
+async def user_select_idea_node(state: GraphState, config: RunnableConfig) -> Dict[str, Any]:
     """
     A node that interrupts the graph to ask the user to select the final idea.
     """
@@ -76,49 +85,87 @@ async def user_select_idea_node(state: GraphState) -> Dict[str, Any]:
         console.print("⚠️ No top ideas were provided by the analyst. Skipping.", style="yellow")
         return {"chosen_idea": None}
 
+    registry = state["idea_registry"]
+    plan_memo = state.get("plan_memo") or {}
     for i, idea in enumerate(top_ideas):
-        console.print(f"\n  [{i+1}] Title: {idea['title']}")
+        ready = " (plan ready)" if top_idea_key(idea) in plan_memo else ""
+        console.print(f"\n  [{i+1}] Title: {idea['title']}{ready}")
         console.print(f"      Description: {idea['description']}")
+        if idea.get("idea_id"):
+            console.print(
+                f"      Based on: [{idea['idea_id']}] by {proposed_by(registry, idea['idea_id'])}"
+            )
+
+    # Opt-in: plan the leading ideas while the user is still choosing.
+    start_plan_speculation(state, config)
 
     choice_str = interrupt(
-        {"message": f"\nChoose an idea to proceed with (1-{len(top_ideas)}): "}
+        {
+            "kind": "select_idea",
+            "message": f"\nChoose an idea to proceed with (1-{len(top_ideas)}): ",
+        }
     )
 
     try:
         choice = int(choice_str)
         if 1 <= choice <= len(top_ideas):
             chosen = top_ideas[choice - 1]
-            console.print(
-                f"✅ Great choice! Selecting '{chosen['title']}'. Generating the final document...",
-                style="green",
-            )
-            return {"chosen_idea": chosen}
+            console.print(f"✅ Great choice! Selecting '{chosen['title']}'.", style="green")
         else:
             console.print(
                 f"⚠️ Invalid choice. Number out of range. Select the first idea by default.",
                 style="yellow",
             )
-            return {"chosen_idea": top_ideas[0]}
+            chosen = top_ideas[0]
     except (ValueError, IndexError, TypeError):
         console.print(
             "⚠️ Invalid input. Could not parse number. Selecting the first idea by default.",
             style="yellow",
         )
-        return {"chosen_idea": top_ideas[0]}
+        chosen = top_ideas[0]
+    # The recommendation's registry ID; empty if the analyst gave none it could match.
+    matched = known_ids(registry, [chosen.get("idea_id", "")])
+    chosen = {**chosen, "idea_id": matched[0] if matched else ""}
+
+    saved = plan_memo.get(top_idea_key(chosen))
+    if saved:
+        # Planned earlier in this session: show that plan, with its ArXiv papers.
+        console.print(
+            "♻️ Showing the plan already generated for this idea. "
+            "Type 'G' at the review to regenerate it.",
+            style="green",
+        )
+        return {
+            "chosen_idea": chosen,
+            "use_arxiv_search": saved["use_arxiv_search"],
+            "arxiv_context": saved["arxiv_context"],
+            "regenerate_plan": False,
+        }
+    console.print("Generating the final document...", style="green")
+    # Not planned yet: drop the papers and ArXiv choice of the idea planned before.
+    return {
+        "chosen_idea": chosen,
+        "use_arxiv_search": True,
+        "arxiv_context": NO_ARXIV_CONTEXT,
+        "regenerate_plan": False,
+    }
 
 
 async def user_feedback_on_plan_node(state: GraphState) -> Dict[str, Any]:
     """Interrupts to ask the user for feedback on the generated plan."""
     console.print("\n--- ⏸️ User Input Required: Plan Review ---", style="bold cyan")
     console.print(
-        "Please review the generated plan. Do you approve it, or would you like to select a different idea?",
+        "Please review the generated plan. Do you approve it, would you like to select a different idea, or regenerate this one?",
         style="white",
     )
 
     feedback = interrupt(
         {
-            "message": "Type 'Y' to finish, or 'R' to go back to the idea selection screen: "
+            "kind": "plan_feedback",
+            "message": "Type 'Y' to finish, 'R' to go back to the idea selection screen, or 'G' to regenerate this plan: "
         }
     )
 
-    return {"user_plan_feedback": feedback.strip().lower()}
+    feedback = feedback.strip().lower()
+    # Regenerating asks the ArXiv question again and skips the saved plan and the response cache.
+    return {"user_plan_feedback": feedback, "regenerate_plan": feedback == "g"}
@@ -1,66 +1,254 @@
 # This file contains the final node for implementation planning.
 
 import re
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from brainstorm.utils.prompt_budget import fit_prompt
+from brainstorm.utils.token_stream import ConsoleTokenStream
 from brainstorm.utils.ui import console
 
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import merge_configs
 
 from ..prompts import planning_prompts
+from ..runtime import (
+    get_blob_store,
+    get_setting,
+    node_budget,
+    node_llm,
+    node_tracer,
+    open_cache,
+)
+from ..speculation import (
+    background_config,
+    has_speculation,
+    speculate,
+    spend_budget,
+    take_speculation,
+)
+from ..registry import top_idea_key
 from ..state import GraphState
+from .context import NO_ARXIV_CONTEXT, fetch_arxiv_context
 
 
-async def implementation_planning_node(state: GraphState) -> Dict[str, Any]:
-    """Generates a final plan for the selected idea."""
-    console.print("\n--- 📝 Implementation Planning Node ---", style="bold cyan")
-    idea = state["chosen_idea"]
-    brainstorm_type = state["brainstorm_type"]
-    llm = state["llm"]
-    arxiv_context = state["arxiv_context"]
-
-    if not idea:
-        return {"final_plan_text": "No idea chosen for planning."}
-
+async def generate_plan(
+    llm,
+    brainstorm_type: str,
+    idea: Dict,
+    arxiv_context: str,
+    combined_context: str,
+    config: Optional[RunnableConfig] = None,
+    budget: Optional[int] = None,
+) -> str:
+    """
+    Asks the model for the plan of `idea`. The ArXiv and topic contexts are
+    trimmed to fit a prompt of `budget` tokens. Returns the raw response.
+    """
     parser = StrOutputParser()
     template = planning_prompts[brainstorm_type]
     prompt = PromptTemplate(
         template=template, input_variables=["title", "description", "arxiv_context"]
     )
     chain = prompt | llm | parser
+    values, _ = fit_prompt(
+        prompt,
+        {
+            "title": idea["title"],
+            "description": idea["description"],
+            "arxiv_context": arxiv_context,
+            "combined_context": combined_context,
+        },
+        ["arxiv_context", "combined_context"],
+        budget,
+        "planning",
+    )
+    return await chain.ainvoke(values, config=config)
+
+
+def _plan_name(idea: Dict, use_arxiv: bool) -> str:
+    return f"plan:{'arxiv' if use_arxiv else 'no-arxiv'}:{top_idea_key(idea)}"
+
+
+def _plan_inputs(idea: Dict, arxiv_context: str) -> Dict[str, str]:
+    """The inputs a plan was written from; a plan is only reused for the same ones."""
+    return {"title": idea["title"], "description": idea["description"], "arxiv_context": arxiv_context}
+
 
+def start_plan_speculation(state: GraphState, config: RunnableConfig) -> None:
+    """
+    Starts generating plans for the top ideas in the background, if enabled.
+
+    Plans are prepared for the first "speculative_plans" ideas, with the ArXiv
+    choice the user made last (searching by default), and at most
+    "max_speculative_plans" are started per session.
+    """
+    top_n = get_setting(config, "speculative_plans", 0)
+    limit = get_setting(config, "max_speculative_plans", 6)
+    if not top_n:
+        return
+    llm = node_llm(config, "implementation_planning")
+    brainstorm_type = state["brainstorm_type"]
+    use_arxiv = state.get("use_arxiv_search", True)
+    combined_context = get_blob_store(config).get(state.get("combined_context_ref")) or ""
+    arxiv_cache = open_cache(config, "arxiv")
+    arxiv_fetch = get_setting(config, "arxiv_fetch")
+    tracer = node_tracer(config)
+    plan_config = background_config(config, "implementation_planning")
+    budget = node_budget(config, "implementation_planning")
+    just_planned = top_idea_key(state["chosen_idea"]) if state.get("chosen_idea") else None
+    plan_memo = state.get("plan_memo") or {}
+
+    for idea in state["top_ideas"][:top_n]:
+        name = _plan_name(idea, use_arxiv)
+        if top_idea_key(idea) in (just_planned, *plan_memo) or has_speculation(config, name):
+            continue
+        if not spend_budget(config, "plan", limit):
+            break
+
+        async def prepare(idea=idea) -> Dict[str, Any]:
+            arxiv_context = NO_ARXIV_CONTEXT
+            if use_arxiv:
+                arxiv_context, _ = await fetch_arxiv_context(
+                    idea["title"], cache=arxiv_cache, fetch=arxiv_fetch, tracer=tracer
+                )
+            plan_text = await generate_plan(
+                llm,
+                brainstorm_type,
+                idea,
+                arxiv_context,
+                combined_context,
+                config=plan_config,
+                budget=budget,
+            )
+            return {"inputs": _plan_inputs(idea, arxiv_context), "plan_text": plan_text}
+
+        speculate(config, name, prepare)
+
+
+async def take_speculative_plan(
+    config: RunnableConfig, idea: Dict, arxiv_context: str, use_arxiv: bool
+) -> Optional[str]:
+    """
+    Returns the plan prepared in the background for `idea`, waiting for it if
+    it is still being generated, or None if there is no usable one.
+    """
+    stale = take_speculation(config, _plan_name(idea, not use_arxiv))
+    if stale:
+        stale.cancel()
+    speculative = take_speculation(config, _plan_name(idea, use_arxiv))
+    if not speculative:
+        return None
+    if not speculative.done():
+        console.print("⏳ Finishing the plan started while you were choosing...", style="dim")
     try:
-        plan_text = await chain.ainvoke(
-            {
-                "title": idea["title"],
-                "description": idea["description"],
-                "arxiv_context": arxiv_context,
-                "combined_context": state.get("combined_context", ""),
-            }
+        prepared = await speculative
+    except Exception as e:
+        console.print(f"⚠️ Background plan failed ({e}). Generating it now.", style="yellow")
+        return None
+    # A plan written with different ArXiv papers does not answer this request.
+    if prepared["inputs"] != _plan_inputs(idea, arxiv_context):
+        console.print("Discarding the background plan: it was written from other ArXiv papers.", style="dim")
+        return None
+    console.print("♻️ Using the plan prepared while you were choosing.", style="dim")
+    return prepared["plan_text"]
+
+
+def _print_plan(final_plan_text: str, arxiv_context: str, streamed: bool) -> None:
+    """Prints a plan, or only its ArXiv context if the plan was streamed, then its Mermaid chart."""
+    markdown_plan = final_plan_text
+    mermaid_match = re.search(
+        r"```mermaid\s*([\s\S]*?)```", final_plan_text, re.DOTALL
+    )
+    if mermaid_match:
+        mermaid_chart = mermaid_match.group(1).strip()
+        markdown_plan = final_plan_text.replace(mermaid_match.group(0), "").strip()
+
+    if streamed:
+        console.print(arxiv_context)
+    else:
+        console.print(markdown_plan)
+
+    if mermaid_match:
+        console.print("\n--- Generated Mermaid Flowchart ---", style="bold magenta")
+        console.print(
+            "Copy the code below and paste it into a Mermaid.js renderer (e.g., https://mermaid.live)",
+            style="white",
         )
-        final_plan_text = plan_text + "\n\n---\n\n" + arxiv_context
+        console.print(f"```mermaid\n{mermaid_chart}\n```")
+
+
+async def implementation_planning_node(
+    state: GraphState, config: RunnableConfig
+) -> Dict[str, Any]:
+    """
+    Generates a final plan for the selected idea.
+
+    Plans are saved in "plan_memo" by idea ID (title if none), and an idea planned earlier
+    in the session gets its saved plan back unless "regenerate_plan" is set.
+    """
+    console.print("\n--- 📝 Implementation Planning Node ---", style="bold cyan")
+    idea = state["chosen_idea"]
+    brainstorm_type = state["brainstorm_type"]
+    llm = node_llm(config, "implementation_planning")
+    use_arxiv = state.get("use_arxiv_search", True)
+    # Without the search, no papers: not the context left from another idea.
+    arxiv_context = state["arxiv_context"] if use_arxiv else NO_ARXIV_CONTEXT
+    plan_memo = state.get("plan_memo") or {}
+    regenerate = state.get("regenerate_plan", False)
+
+    blob_store = get_blob_store(config)
+
+    if not idea:
+        return {"final_plan_ref": blob_store.put("No idea chosen for planning.")}
 
-        markdown_plan = final_plan_text
-        mermaid_match = re.search(
-            r"```mermaid\s*([\s\S]*?)```", final_plan_text, re.DOTALL
+    saved = plan_memo.get(top_idea_key(idea))
+    if saved and not regenerate:
+        console.print(
+            f"\n--- Saved {brainstorm_type.replace('_', ' ').title()} Outline ---",
+            style="bold green",
         )
-        if mermaid_match:
-            mermaid_chart = mermaid_match.group(1).strip()
-            markdown_plan = final_plan_text.replace(mermaid_match.group(0), "").strip()
-            console.print("\n--- Generated Mermaid Flowchart ---", style="bold magenta")
-            console.print(
-                "Copy the code below and paste it into a Mermaid.js renderer (e.g., https://mermaid.live)",
-                style="white",
-            )
-            console.print(f"```mermaid\n{mermaid_chart}\n```")
+        _print_plan(blob_store.get(saved["final_plan_ref"]) or "", saved["arxiv_context"], False)
+        return {"final_plan_ref": saved["final_plan_ref"]}
 
+    try:
+        # The outline is printed as it is generated; the Mermaid chart is
+        # extracted once the response is complete.
         console.print(
             f"\n--- Generated {brainstorm_type.replace('_', ' ').title()} Outline ---",
             style="bold green",
         )
-        console.print(markdown_plan)
+        token_stream = ConsoleTokenStream()
+        plan_text = None
+        if regenerate:
+            # A fresh plan, not the cached response to the same prompt.
+            llm = llm.model_copy(update={"cache": False})
+        else:
+            plan_text = await take_speculative_plan(config, idea, arxiv_context, use_arxiv)
+        if plan_text is None:
+            plan_text = await generate_plan(
+                llm,
+                brainstorm_type,
+                idea,
+                arxiv_context,
+                blob_store.get(state.get("combined_context_ref")) or "",
+                config=merge_configs(config, {"callbacks": [token_stream]}),
+                budget=node_budget(config, "implementation_planning"),
+            )
+        final_plan_text = plan_text + "\n\n---\n\n" + arxiv_context
+        _print_plan(final_plan_text, arxiv_context, token_stream.streamed)
 
-        return {"final_plan_text": final_plan_text}
+        final_plan_ref = blob_store.put(final_plan_text)
+        saved = {
+            "use_arxiv_search": use_arxiv,
+            "arxiv_context": arxiv_context,
+            "final_plan_ref": final_plan_ref,
+        }
+        return {
+            "final_plan_ref": final_plan_ref,
+            "plan_memo": {**plan_memo, top_idea_key(idea): saved},
+            "regenerate_plan": False,
+        }
     except Exception as e:
         console.print(f"❌ Error generating final document: {e}", style="red")
-        return {"final_plan_text": "Error during plan generation."}
+        return {"final_plan_ref": blob_store.put("Error during plan generation.")}
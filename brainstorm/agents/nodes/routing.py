@@ -1,20 +1,15 @@
 # This file contains the conditional logic (routers) for the graph.
 
+from ..registry import top_idea_key
 from ..state import GraphState
 
 
-def route_pdf_input(state: GraphState) -> str:
-    """Determines the next node based on whether a PDF path was provided."""
-    if state.get("pdf_text"):
-        return "process_pdf"
-    else:
-        return "context_generation"
-
-
 def route_after_plan_feedback(state: GraphState) -> str:
     """Determines the next step after user feedback on the plan."""
     if state.get("user_plan_feedback") == "r":
         return "user_select_idea"
+    elif state.get("user_plan_feedback") == "g":
+        return "ask_for_arxiv_search"
     else:  # approve or anything else
         return "END"
 
@@ -25,3 +20,12 @@ def route_arxiv_search_feedback(state: GraphState) -> str:
         return "arxiv_search"
     else:
         return "implementation_planning"
+
+
+def route_after_idea_selection(state: GraphState) -> str:
+    """Shows the saved plan of an idea planned earlier in the session instead of planning it again."""
+    idea = state.get("chosen_idea")
+    if idea and top_idea_key(idea) in (state.get("plan_memo") or {}):
+        return "implementation_planning"
+    else:
+        return "ask_for_arxiv_search"
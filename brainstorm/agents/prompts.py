@@ -59,7 +59,7 @@ Here are the ideas to critique:
 {ideas_to_critique}
 ---
 
-STRICTLY return your response as a single, valid JSON object. Each critique should correspond to an original idea.
+STRICTLY return your response as a single, valid JSON object. Each critique should correspond to an original idea and carry its Idea ID.
 {format_instructions}""",
     "research_paper": """You are a "Red Team" agent, a skeptical academic rival. Your task is to challenge a list of research ideas by identifying potential flaws.
 For each research question, you must generate a concise but impactful critique.
@@ -76,7 +76,7 @@ Here are the research questions to critique:
 {ideas_to_critique}
 ---
 
-STRICTLY return your response as a single, valid JSON object. Each critique should correspond to an original research question.
+STRICTLY return your response as a single, valid JSON object. Each critique should correspond to an original research question and carry its Idea ID.
 {format_instructions}""",
 }
 
@@ -85,7 +85,7 @@ evaluation_prompts = {
 
 1. **Synthesize & Cluster:** Read all the ideas and their critiques. De-duplicate them and group similar concepts into project themes.
 2. **Critique & Evaluate:** For each unique project theme, provide a critical evaluation in a markdown table with columns: 'Project Theme', 'Description', 'Novelty (1-10)', 'Feasibility (1-10)', 'Impact (1-10)', 'Justification (incorporating red team feedback)'.
-3. **Select Top Ideas:** After the table, explicitly state 'Here are the top ideas:'. Then, provide a JSON array of objects for the top 3-5 projects you recommend. Each object needs 'title' (a concise project title) and 'description' (a DETAILED explanation of the project). This JSON array must be at the very end in a ```json code block.
+3. **Select Top Ideas:** After the table, explicitly state 'Here are the top ideas:'. Then, provide a JSON array of objects for the top 3-5 projects you recommend. Each object needs 'idea_id' (the bracketed ID of the listed idea it is based on, e.g. 'I3'; the most representative one for a theme), 'title' (a concise project title) and 'description' (a DETAILED explanation of the project). This JSON array must be at the very end in a ```json code block.
 
 Raw Ideas & Critiques:
 ---
@@ -95,7 +95,7 @@ Raw Ideas & Critiques:
 
 1. **Synthesize & Cluster:** Read all the ideas and critiques. Group similar concepts into distinct research avenues.
 2. **Critique & Evaluate:** For each research avenue, provide a critical evaluation in a markdown table with columns: 'Research Avenue', 'Description', 'Novelty (1-10)', 'Methodology (1-10)', 'Contribution (1-10)', 'Justification (incorporating red team feedback)'.
-3. **Select Top Ideas:** After the table, explicitly state 'Here are the top ideas:'. Then, provide a JSON array of objects for the top 3-5 research questions you recommend. Each object needs 'title' (a concise research avenue) and 'description' (a DETAILED explanation of the study). This JSON array must be at the very end in a ```json code block.
+3. **Select Top Ideas:** After the table, explicitly state 'Here are the top ideas:'. Then, provide a JSON array of objects for the top 3-5 research questions you recommend. Each object needs 'idea_id' (the bracketed ID of the listed idea it is based on, e.g. 'I3'; the most representative one for an avenue), 'title' (a concise research avenue) and 'description' (a DETAILED explanation of the study). This JSON array must be at the very end in a ```json code block.
 
 Raw Ideas & Critiques:
 ---
@@ -103,6 +103,16 @@ Raw Ideas & Critiques:
 ---""",
 }
 
+top_ideas_prompt = """The analysis below ends by recommending its top ideas, but their list could not be read. Return the ideas it recommends, with the IDs of the ideas they are based on and the titles and descriptions it gives them.
+
+STRICTLY return your response as a single, valid JSON object in the following format. Do not include any explanatory text, markdown formatting, or anything outside of the JSON structure.
+{format_instructions}
+
+Analysis:
+---
+{analysis}
+---"""
+
 planning_prompts = {
     "project": """You are an expert AI Project Manager. A promising project idea has been selected. Your task is to generate a detailed and actionable project initiation document (PID) based on the provided title, description, and recent academic research.
 
@@ -192,7 +202,7 @@ collaborative_discussion_prompts = {
     "project": """
 You are {role}, with the following backstory: {backstory}.
 
-You are in a collaborative brainstorming session about "{topic}". The group has generated the following list of project ideas. Review ALL the ideas, and then select the 6-7 ideas that you believe are the most promising, innovative.
+You are in a collaborative brainstorming session about "{topic}". The group has generated the following list of project ideas, each with an ID in brackets. Review ALL the ideas, and then select the 6-7 ideas that you believe are the most promising, innovative.
 
 For each idea you select, you MUST provide a new, concise 'rationale' from YOUR perspective, explaining why it's a strong choice. You can agree with, build upon, or even contradict the original rationale.
 
@@ -200,14 +210,14 @@ For each idea you select, you MUST provide a new, concise 'rationale' from YOUR
 {all_ideas}
 
 ---
-Based on your expert review, provide your final selections. The output MUST be a JSON object that strictly follows this format. Ensure the selected ideas are copied exactly from the list above, but with your new rationale.
+Based on your expert review, provide your final selections. The output MUST be a JSON object that strictly follows this format. Refer to each selected idea only by its ID (e.g. "I3"); do not repeat the idea itself.
 
 {format_instructions}
 """,
     "research_paper": """
 You are {role}, with the following backstory: {backstory}.
 
-You are in a collaborative brainstorming session about "{topic}". The group has generated the following list of research ideas. Review ALL the ideas, and then select the 6-7 ideas that you believe are the most promising, innovative.
+You are in a collaborative brainstorming session about "{topic}". The group has generated the following list of research ideas, each with an ID in brackets. Review ALL the ideas, and then select the 6-7 ideas that you believe are the most promising, innovative.
 
 For each idea you select, you MUST provide a new, concise 'rationale' from YOUR perspective, explaining why it's a strong choice. You can agree with, build upon, or even contradict the original rationale.
 
@@ -215,7 +225,7 @@ For each idea you select, you MUST provide a new, concise 'rationale' from YOUR
 {all_ideas}
 
 ---
-Based on your expert review, provide your final selections. The output MUST be a JSON object that strictly follows this format. Ensure the selected ideas are copied exactly from the list above, but with your new rationale.
+Based on your expert review, provide your final selections. The output MUST be a JSON object that strictly follows this format. Refer to each selected idea only by its ID (e.g. "I3"); do not repeat the idea itself.
 
 {format_instructions}
 """,
@@ -0,0 +1,71 @@
+# registry.py
+# This file contains the idea registry: one record per generated idea, keyed by
+# a short stable ID, with indexes from the ID to the personas who proposed the
+# idea, their discussion votes and its Red Team critique.
+
+import copy
+from typing import Dict, Iterable, List, Optional, TypedDict
+
+
+class IdeaRegistry(TypedDict):
+    """
+    The ideas of a session and what later stages learned about them.
+
+    Attributes:
+        ideas: The idea fields (idea/research question, audience, rationale, ...) by ID.
+        origins: The Roles of the personas who proposed each idea, by ID.
+        votes: The rationale of each persona who voted for an idea, by ID and Role.
+        critiques: The Red Team critique of each idea, by ID.
+    """
+
+    ideas: Dict[str, Dict]
+    origins: Dict[str, List[str]]
+    votes: Dict[str, Dict[str, str]]
+    critiques: Dict[str, str]
+
+
+def new_registry() -> IdeaRegistry:
+    return {"ideas": {}, "origins": {}, "votes": {}, "critiques": {}}
+
+
+def copy_registry(registry: Optional[IdeaRegistry]) -> IdeaRegistry:
+    """Returns a copy a node can update without touching the state it was given."""
+    return copy.deepcopy(registry) if registry else new_registry()
+
+
+def add_idea(registry: IdeaRegistry, idea: Dict, role: str) -> str:
+    """Records an idea proposed by the persona `role`. Returns its new ID."""
+    idea_id = f"I{len(registry['ideas']) + 1}"
+    registry["ideas"][idea_id] = dict(idea)
+    registry["origins"][idea_id] = [role]
+    return idea_id
+
+
+def merge_ideas(registry: IdeaRegistry, keep_id: str, merged_ids: Iterable[str]) -> None:
+    """Credits the personas behind `merged_ids` to the idea `keep_id`."""
+    origins = registry["origins"][keep_id]
+    for idea_id in merged_ids:
+        origins += [role for role in registry["origins"][idea_id] if role not in origins]
+
+
+def idea_title(idea: Dict, default: str = "Untitled") -> str:
+    return idea.get("idea") or idea.get("research_question", default)
+
+
+def top_idea_key(idea: Dict) -> str:
+    """Returns the key of a recommended idea: the ID it is based on, or its title if it has none."""
+    return idea.get("idea_id") or idea["title"]
+
+
+def proposed_by(registry: IdeaRegistry, idea_id: str) -> str:
+    return ", ".join(registry["origins"].get(idea_id, [])) or "Unknown"
+
+
+def known_ids(registry: IdeaRegistry, ids: Iterable[str]) -> List[str]:
+    """Returns the IDs in `ids` that name a recorded idea, normalised and in order."""
+    known = []
+    for idea_id in ids:
+        idea_id = str(idea_id).strip().strip("[]")
+        if idea_id in registry["ideas"] and idea_id not in known:
+            known.append(idea_id)
+    return known
@@ -0,0 +1,101 @@
+# runtime.py
+# This file contains helpers for reading per-session settings that are passed
+# to the graph through the LangGraph runtime config.
+
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from brainstorm.utils.blob_store import BlobStore
+from brainstorm.utils.cache import DiskCache
+
+# Type-only imports: the CLI reads LLM_NODES at startup, before LangChain is needed.
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
+
+    from brainstorm.utils.tracing import Tracer
+
+# Stages that call the language model, in graph order. Both context branches
+# (process_pdf and web_research) use the "context_generation" setting.
+LLM_NODES = (
+    "context_generation",
+    "persona_generation",
+    "divergent_ideation",
+    "collaborative_discussion",
+    "red_team_critique",
+    "convergent_evaluation",
+    "implementation_planning",
+)
+
+# Default prompt budgets in estimated tokens, by node. Prompts over budget
+# have their context, idea lists or ArXiv abstracts trimmed to fit (see
+# prompt_budget.fit_prompt). The summarizer of the context stage is bounded
+# by "summary_chunk_tokens" instead.
+DEFAULT_PROMPT_BUDGETS = {
+    "persona_generation": 4_000,
+    "divergent_ideation": 4_000,
+    "collaborative_discussion": 12_000,
+    "red_team_critique": 6_000,
+    "convergent_evaluation": 12_000,
+    "implementation_planning": 8_000,
+}
+
+_open_caches: Dict[Tuple, DiskCache] = {}
+
+
+def get_setting(config: Optional["RunnableConfig"], key: str, default: Any = None) -> Any:
+    """Returns a value from config["configurable"], or the default."""
+    if not config:
+        return default
+    return config.get("configurable", {}).get(key, default)
+
+
+def node_llm(config: Optional["RunnableConfig"], node_name: str):
+    """Returns the language model a node should call, honouring the per-node cache opt-out."""
+    llm = get_setting(config, "llm")
+    if node_name in get_setting(config, "uncached_nodes", ()):
+        return llm.model_copy(update={"cache": False})
+    return llm
+
+
+def native_json_provider(config: Optional["RunnableConfig"]) -> Optional[str]:
+    """Returns the provider whose native JSON output mode nodes should request, or None when it is off."""
+    if not get_setting(config, "native_json", True):
+        return None
+    return get_setting(config, "llm_provider")
+
+
+def node_budget(config: Optional["RunnableConfig"], node_name: str) -> Optional[int]:
+    """Returns the prompt budget of a node in tokens, or None when it has none (0 disables it)."""
+    budgets = {**DEFAULT_PROMPT_BUDGETS, **get_setting(config, "prompt_budgets", {})}
+    return budgets.get(node_name) or None
+
+
+def open_cache(config: Optional["RunnableConfig"], namespace: str) -> Optional[DiskCache]:
+    """
+    Returns the shared on-disk cache for `namespace`, or None when caching is off.
+
+    The TTL and size bound come from the "<namespace>_cache_ttl" and
+    "<namespace>_cache_max_entries" settings. Instances are shared within the
+    process so concurrent sessions reuse one connection and one set of counters.
+    """
+    if not get_setting(config, "cache_enabled", True):
+        return None
+    directory = get_setting(config, "cache_dir")
+    max_age = get_setting(config, f"{namespace}_cache_ttl")
+    max_entries = get_setting(config, f"{namespace}_cache_max_entries", 10_000)
+    key = (str(directory), namespace, max_age, max_entries)
+    if key not in _open_caches:
+        _open_caches[key] = DiskCache(
+            namespace, directory=directory, max_entries=max_entries, max_age=max_age
+        )
+    return _open_caches[key]
+
+
+def get_blob_store(config: Optional["RunnableConfig"]) -> BlobStore:
+    """Returns the blob store holding the large text fields referenced by the state."""
+    return BlobStore(get_setting(config, "blob_dir"))
+
+
+def node_tracer(config: Optional["RunnableConfig"]) -> Optional["Tracer"]:
+    """Returns the tracer, labelling spans with the session id, or None when tracing is off."""
+    tracer = get_setting(config, "tracer")
+    return tracer.bind(session=get_setting(config, "thread_id")) if tracer else None
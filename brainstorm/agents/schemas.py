@@ -72,10 +72,25 @@ class ResearchIdeasList(BaseModel):
     research_ideas: List[ResearchIdea]
 
 
+class IdeaVote(BaseModel):
+    """A persona's vote for one idea in the collaborative discussion."""
+
+    id: str = Field(..., description="The ID of the selected idea, exactly as shown in brackets, e.g. 'I3'.")
+    rationale: str = Field(
+        ..., description="A concise rationale, from your perspective, for why the idea is strong."
+    )
+
+
+class IdeaVoteList(BaseModel):
+    """The ideas a persona selects in the collaborative discussion."""
+
+    votes: List[IdeaVote]
+
+
 class Critique(BaseModel):
     """Represents a critique for a single idea."""
 
-    idea_title: str = Field(..., description="The title of the idea being critiqued.")
+    idea_id: str = Field(..., description="The ID of the idea being critiqued, exactly as given, e.g. 'I3'.")
     critique: str = Field(..., description="The devil's advocate critique of the idea.")
 
 
@@ -88,6 +103,10 @@ class CritiqueList(BaseModel):
 class TopIdea(BaseModel):
     """Represents a single top idea selected from the brainstorming session."""
 
+    idea_id: str = Field(
+        default="",
+        description="The ID of the listed idea it is based on, exactly as given, e.g. 'I3'.",
+    )
     title: str = Field(..., description="The concise title of the idea.")
     description: str = Field(..., description="A detailed description of the idea.")
 
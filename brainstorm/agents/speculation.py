@@ -0,0 +1,99 @@
+# speculation.py
+# This file contains the registry of background LLM work started ahead of the
+# user's answer to an interrupt.
+
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+
+from .runtime import get_setting
+
+# Keyed by (thread_id, name). Tasks live in the process, not the checkpoint: a
+# resumed session simply does the work again when it is needed.
+_speculations: Dict[Tuple[str, str], asyncio.Task] = {}
+_spent: Dict[Tuple[str, str], int] = {}
+
+
+def speculate(
+    config: Optional[RunnableConfig],
+    name: str,
+    work: Callable[[], Awaitable[Any]],
+    replace: bool = True,
+) -> None:
+    """
+    Starts `work()` in the background for this session. An earlier speculation
+    with the same name is replaced, or kept if `replace` is False.
+
+    The task runs in an empty context so it is not attached to the run of
+    the node that started it, which finishes long before the task does.
+    """
+    thread_id = get_setting(config, "thread_id")
+    if not thread_id:
+        return
+    previous = _speculations.get((thread_id, name))
+    if previous and not replace:
+        return
+    if previous:
+        previous.cancel()
+    _speculations[(thread_id, name)] = asyncio.get_running_loop().create_task(
+        work(), context=contextvars.Context()
+    )
+
+
+def background_config(config: Optional[RunnableConfig], name: str) -> RunnableConfig:
+    """
+    Returns the config for model calls made by background work.
+
+    The work outlives the node that started it, so it does not inherit the
+    node's callbacks; it is only traced, under "<name> (background)".
+    """
+    tracer = get_setting(config, "tracer")
+    if not tracer:
+        return {}
+    return {
+        "callbacks": [tracer.callback],
+        "metadata": {
+            "thread_id": get_setting(config, "thread_id"),
+            "trace_name": f"{name} (background)",
+        },
+    }
+
+
+def take_speculation(config: Optional[RunnableConfig], name: str) -> Optional[asyncio.Task]:
+    """Removes and returns this session's speculation with the given name, if any."""
+    return _speculations.pop((get_setting(config, "thread_id"), name), None)
+
+
+def has_speculation(config: Optional[RunnableConfig], name: str) -> bool:
+    return (get_setting(config, "thread_id"), name) in _speculations
+
+
+def spend_budget(config: Optional[RunnableConfig], kind: str, limit: int) -> bool:
+    """
+    Counts one speculation of `kind` against the session's `limit`.
+
+    Returns False, without counting, once the limit has been reached.
+    """
+    key = (get_setting(config, "thread_id"), kind)
+    if _spent.get(key, 0) >= limit:
+        return False
+    _spent[key] = _spent.get(key, 0) + 1
+    return True
+
+
+def cancel_speculations(thread_id: str) -> int:
+    """Cancels all unfinished speculations of a session. Returns how many."""
+    cancelled = 0
+    for key in [key for key in _speculations if key[0] == thread_id]:
+        task = _speculations.pop(key)
+        if not task.done():
+            task.cancel()
+            cancelled += 1
+        elif not task.cancelled():
+            # Unused work that failed: retrieve the error so it is not logged at exit.
+            task.exception()
+    for key in [key for key in _spent if key[0] == thread_id]:
+        del _spent[key]
+    return cancelled
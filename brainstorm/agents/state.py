@@ -1,45 +1,85 @@
 from typing import List, Dict, TypedDict, Optional
-from langchain_google_genai import ChatGoogleGenerativeAI
+
+from .registry import IdeaRegistry, new_registry
 
 
 class GraphState(TypedDict):
     """
     Represents the state of our graph.
 
+    The language model and credentials are not part of the state; nodes get
+    them from the runtime config. Large text fields are stored in the blob
+    store and the state holds their references.
+
     Attributes:
-        api_key: The Google API key.
-        llm: The language model instance.
         topic: The central topic for brainstorming.
         brainstorm_type: The type of brainstorm ('project' or 'research_paper').
-        pdf_text: Optional text extracted from a user-provided PDF.
-        combined_context: The summarized context from web search and PDF.
+        pdf_path: Optional path to a user-provided PDF.
+        pdf_text_ref: Blob reference to the text extracted from the PDF.
+        pdf_summary_ref: Blob reference to the summary of the PDF.
+        web_summary_ref: Blob reference to the summary of the web search results.
+        combined_context_ref: Blob reference to the summarized context from web search and PDF.
         personas: A list of generated expert personas.
-        all_generated_ideas: A list of all ideas generated by the personas.
-        critiques: A list of critiques for the generated ideas.
-        filtered_ideas: A list of ideas after user filtering.
+        idea_registry: Every generated idea by ID, with its origin personas, votes and critique.
+        idea_ids: The IDs of the ideas still under consideration, in order.
+        filtered_idea_ids: The IDs of the ideas kept after user filtering.
         evaluation_markdown: The markdown output from the evaluation stage.
-        top_ideas: The top ideas selected by the analyst agent.
+        top_ideas: The top ideas selected by the analyst agent, with the ID of the idea each is based on.
         chosen_idea: The final idea selected by the user for planning.
-        final_plan_text: The final project plan or research outline.
+        final_plan_ref: Blob reference to the final project plan or research outline.
         use_arxiv_search: A boolean indicating whether to use ArXiv search.
         user_plan_feedback: User's feedback on the generated plan.
         arxiv_context: Context from ArXiv search.
+        plan_memo: The plans generated this session by the ID of the idea they
+            are based on (the title if none), each with its ArXiv choice, ArXiv
+            context and plan blob reference, so going back to an idea already
+            planned shows its plan again.
+        regenerate_plan: Whether the next plan must be generated afresh.
     """
 
-    api_key: str
-    llm: ChatGoogleGenerativeAI
     topic: str
     brainstorm_type: str
-    pdf_text: Optional[str]
-    combined_context: str
+    pdf_path: Optional[str]
+    pdf_text_ref: Optional[str]
+    pdf_summary_ref: Optional[str]
+    web_summary_ref: Optional[str]
+    combined_context_ref: Optional[str]
     personas: List[Dict]
-    all_generated_ideas: List[Dict]
-    critiques: List[Dict]
-    filtered_ideas: List[Dict]
+    idea_registry: IdeaRegistry
+    idea_ids: List[str]
+    filtered_idea_ids: List[str]
     evaluation_markdown: str
     top_ideas: List[Dict]
     chosen_idea: Optional[Dict]
-    final_plan_text: str
+    final_plan_ref: Optional[str]
     use_arxiv_search: bool
     user_plan_feedback: Optional[str]
     arxiv_context: str
+    plan_memo: Dict[str, Dict]
+    regenerate_plan: bool
+
+
+def initial_state(topic: str, brainstorm_type: str) -> GraphState:
+    """Returns the state a new session starts from."""
+    return {
+        "topic": topic,
+        "brainstorm_type": brainstorm_type,
+        "pdf_path": None,
+        "pdf_text_ref": None,
+        "pdf_summary_ref": None,
+        "web_summary_ref": None,
+        "combined_context_ref": None,
+        "personas": [],
+        "idea_registry": new_registry(),
+        "idea_ids": [],
+        "filtered_idea_ids": [],
+        "evaluation_markdown": "",
+        "top_ideas": [],
+        "chosen_idea": None,
+        "final_plan_ref": None,
+        "arxiv_context": "No relevant papers found on ArXiv for this topic.",
+        "use_arxiv_search": True,
+        "user_plan_feedback": "",
+        "plan_memo": {},
+        "regenerate_plan": False,
+    }
@@ -1,15 +1,17 @@
 # This file defines the core logic for the brainstorming process using LangGraph.
 
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
 from .state import GraphState
 from .nodes import (
     ask_for_pdf_path_node,
     process_pdf_node,
+    web_research_node,
     context_generation_node,
     persona_generation_node,
     divergent_ideation_node,
+    idea_deduplication_node,
     collaborative_discussion_node,
     user_filter_ideas_node,
     red_team_critique_node,
@@ -19,22 +21,24 @@ from .nodes import (
     arxiv_search_node,
     implementation_planning_node,
     user_feedback_on_plan_node,
-    route_pdf_input,
     route_arxiv_search_feedback,
     route_after_plan_feedback,
+    route_after_idea_selection,
 )
 
 
-def build_graph(checkpointer: InMemorySaver):
+def build_graph(checkpointer: BaseCheckpointSaver):
     """Builds the LangGraph agent graph."""
     workflow = StateGraph(GraphState)
 
     # Add nodes
     workflow.add_node("ask_for_pdf_path", ask_for_pdf_path_node)
     workflow.add_node("process_pdf", process_pdf_node)
+    workflow.add_node("web_research", web_research_node)
     workflow.add_node("context_generation", context_generation_node)
     workflow.add_node("persona_generation", persona_generation_node)
     workflow.add_node("divergent_ideation", divergent_ideation_node)
+    workflow.add_node("idea_deduplication", idea_deduplication_node)
     workflow.add_node("collaborative_discussion", collaborative_discussion_node)
     workflow.add_node("user_filter_ideas", user_filter_ideas_node)
     workflow.add_node("red_team_critique", red_team_critique_node)
@@ -50,23 +54,31 @@ def build_graph(checkpointer: InMemorySaver):
     # Entry point
     workflow.set_entry_point("ask_for_pdf_path")
 
-    # Conditional edge for PDF processing
-    workflow.add_conditional_edges(
-        "ask_for_pdf_path",
-        route_pdf_input,
-        {"process_pdf": "process_pdf", "context_generation": "context_generation"},
-    )
+    # Context stage: the PDF and web branches run in parallel (the PDF branch
+    # returns at once when no PDF was given) and join in context_generation.
+    workflow.add_edge("ask_for_pdf_path", "process_pdf")
+    workflow.add_edge("ask_for_pdf_path", "web_research")
+    workflow.add_edge(["process_pdf", "web_research"], "context_generation")
 
     # Main linear flow
-    workflow.add_edge("process_pdf", "context_generation")
     workflow.add_edge("context_generation", "persona_generation")
     workflow.add_edge("persona_generation", "divergent_ideation")
-    workflow.add_edge("divergent_ideation", "collaborative_discussion")
+    workflow.add_edge("divergent_ideation", "idea_deduplication")
+    workflow.add_edge("idea_deduplication", "collaborative_discussion")
     workflow.add_edge("collaborative_discussion", "user_filter_ideas")
     workflow.add_edge("user_filter_ideas", "red_team_critique")
     workflow.add_edge("red_team_critique", "convergent_evaluation")
     workflow.add_edge("convergent_evaluation", "user_select_idea")
-    workflow.add_edge("user_select_idea", "ask_for_arxiv_search")
+
+    # An idea planned earlier in the session goes straight to its saved plan
+    workflow.add_conditional_edges(
+        "user_select_idea",
+        route_after_idea_selection,
+        {
+            "ask_for_arxiv_search": "ask_for_arxiv_search",
+            "implementation_planning": "implementation_planning",
+        },
+    )
 
     # Conditional edge for ArXiv search
     workflow.add_conditional_edges(
@@ -85,7 +97,11 @@ def build_graph(checkpointer: InMemorySaver):
     workflow.add_conditional_edges(
         "user_feedback_on_plan",
         route_after_plan_feedback,
-        {"user_select_idea": "user_select_idea", "END": END},
+        {
+            "user_select_idea": "user_select_idea",
+            "ask_for_arxiv_search": "ask_for_arxiv_search",
+            "END": END,
+        },
     )
 
     # Compile the graph
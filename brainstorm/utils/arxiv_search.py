@@ -0,0 +1,68 @@
+# arxiv_search.py
+# This file contains the cached, non-blocking ArXiv lookup used by the planning stage.
+
+import asyncio
+from typing import Callable, Dict, List, Optional
+
+from brainstorm.utils.cache import DiskCache
+from brainstorm.utils.tracing import Tracer, trace_span
+from brainstorm.utils.web_search import normalize_query
+
+
+def _fetch_papers(query: str, max_docs: int) -> List[Dict[str, Optional[str]]]:
+    """Runs the blocking ArXiv query and returns JSON-serializable paper records."""
+    from langchain_community.document_loaders import ArxivLoader
+
+    arxiv_loader = ArxivLoader(
+        query=query, load_max_docs=max_docs, load_all_available_meta=True
+    )
+    papers = []
+    for doc in arxiv_loader.get_summaries_as_docs():
+        # The wrapper reports network and API errors as a document without
+        # metadata instead of raising; caching it would serve the error for days.
+        if doc.page_content.startswith("Arxiv exception") or not (
+            doc.metadata.get("Entry ID") and doc.metadata.get("Published")
+        ):
+            raise RuntimeError(f"ArXiv search failed: {doc.page_content}")
+        published_date = doc.metadata.get("Published")
+        papers.append(
+            {
+                "title": doc.metadata.get("Title"),
+                "published": published_date.isoformat() if published_date else None,
+                "summary": doc.page_content,
+            }
+        )
+    return papers
+
+
+async def search_arxiv(
+    query: str,
+    cache: Optional[DiskCache] = None,
+    max_docs: int = 8,
+    fetch: Optional[Callable[[str, int], List[Dict[str, Optional[str]]]]] = None,
+    tracer: Optional[Tracer] = None,
+) -> List[Dict[str, Optional[str]]]:
+    """
+    Returns paper records ({title, published, summary}) for `query`.
+
+    The ArXiv round trip runs on a worker thread so the event loop stays free,
+    and results are cached by normalized query. Dates are ISO strings. `fetch`
+    replaces the ArXiv query itself, for example to run offline. Raises
+    RuntimeError if ArXiv returns an error, which is not cached.
+    """
+    async with trace_span(tracer, "arxiv", query, cache_hit=False) as span:
+        key = f"{max_docs}:{normalize_query(query)}"
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, key)
+            # Error records cached by earlier versions are searched again.
+            if cached is not None and not any(
+                (paper.get("summary") or "").startswith("Arxiv exception") for paper in cached
+            ):
+                span.update(cache_hit=True, papers=len(cached))
+                return cached
+
+        papers = await asyncio.to_thread(fetch or _fetch_papers, query, max_docs)
+        span["papers"] = len(papers)
+        if papers and cache is not None:
+            await asyncio.to_thread(cache.set, key, papers)
+        return papers
@@ -0,0 +1,66 @@
+# blob_store.py
+# This file contains a content-addressed store for large text kept out of the graph state.
+
+import hashlib
+import os
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Optional, Union
+
+from brainstorm.utils.cache import DEFAULT_CACHE_DIR
+
+DEFAULT_BLOB_DIR = DEFAULT_CACHE_DIR / "blobs"
+REF_PREFIX = "sha256:"
+
+
+class BlobStore:
+    """
+    Stores text by the SHA-256 of its content and returns a short reference.
+
+    The graph state keeps only these references, so checkpoints stay the same
+    size however large the documents are. Identical text is stored once.
+    """
+
+    def __init__(self, directory: Union[str, Path, None] = None):
+        self.directory = Path(directory) if directory else DEFAULT_BLOB_DIR
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / digest[2:]
+
+    def put(self, text: str) -> str:
+        """Stores `text` and returns its reference."""
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if path.exists():
+            os.utime(path)  # Blobs in use are kept out of pruning
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(data))
+            os.replace(tmp_path, path)
+        return REF_PREFIX + digest
+
+    def get(self, ref: Optional[str]) -> Optional[str]:
+        """Returns the text for `ref`, or None if `ref` is empty."""
+        if not ref:
+            return None
+        path = self._path(ref[len(REF_PREFIX):])
+        text = zlib.decompress(path.read_bytes()).decode("utf-8")
+        os.utime(path)
+        return text
+
+    def prune(self, max_age_days: float) -> int:
+        """Deletes blobs not written or read for `max_age_days`. Returns how many."""
+        if not self.directory.exists():
+            return 0
+        cutoff = time.time() - max_age_days * 24 * 3600
+        removed = 0
+        for path in self.directory.glob("*/*"):
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
@@ -0,0 +1,133 @@
+# cache.py
+# This file contains a small SQLite-backed key/value cache with age- and
+# size-based eviction. It is shared by the LLM, web search and ArXiv layers.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+# Where cached data lives unless the user points somewhere else.
+DEFAULT_CACHE_DIR = Path(
+    os.environ.get("BRAINSTORM_CACHE_DIR", Path.home() / ".cache" / "agent-brainstorm")
+)
+DEFAULT_CACHE_FILE = "cache.sqlite"
+
+
+class DiskCache:
+    """
+    A persistent key/value store for JSON-serializable values.
+
+    Entries are grouped by namespace so several caches can share one SQLite
+    file. Entries older than `max_age` seconds are treated as misses and
+    removed, and once a namespace holds more than `max_entries` the least
+    recently used entries are evicted. The file is opened in WAL mode so that
+    concurrent sessions (threads or processes) can share it.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        directory: Union[str, Path, None] = None,
+        max_entries: Optional[int] = 10_000,
+        max_age: Optional[float] = None,
+    ):
+        self.namespace = namespace
+        self.path = Path(directory or DEFAULT_CACHE_DIR) / DEFAULT_CACHE_FILE
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed"
+            " ON cache_entries (namespace, accessed_at)"
+        )
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.max_age is not None and now - created_at > self.max_age
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if self._is_expired(created_at, now):
+                self._conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                )
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        """Stores `value` under `key` and applies the eviction policy."""
+        now = time.time()
+        payload = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries"
+                " (namespace, key, value, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, payload, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        if self.max_age is not None:
+            self._conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND created_at < ?",
+                (self.namespace, now - self.max_age),
+            )
+        if self.max_entries is not None:
+            self._conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                " SELECT key FROM cache_entries WHERE namespace = ?"
+                " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_entries),
+            )
+
+    def clear(self) -> None:
+        """Removes every entry in this cache's namespace."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit/miss counters for this process."""
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
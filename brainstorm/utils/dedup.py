@@ -0,0 +1,65 @@
+# dedup.py
+# This file contains an offline near-duplicate detector for short texts, based
+# on hashed TF-IDF vectors and cosine similarity.
+
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+# Hashed feature space. Collisions are rare at this size for a few dozen
+# short ideas, and the matrix stays small enough to build densely.
+N_FEATURES = 1 << 14
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _features(text: str) -> List[int]:
+    """
+    Returns the hashed features of `text`: its words, plus the character
+    trigrams of each word so that inflections ("disease", "diseases") overlap.
+    """
+    words = _WORD.findall(text.lower())
+    grams = list(words)
+    for word in words:
+        padded = f" {word} "
+        grams += [padded[i : i + 3] for i in range(len(padded) - 2)]
+    return [zlib.crc32(gram.encode()) % N_FEATURES for gram in grams]
+
+
+def tfidf_matrix(texts: List[str]) -> np.ndarray:
+    """Returns the L2-normalised hashed TF-IDF vectors of `texts`, one row each."""
+    counts = np.zeros((len(texts), N_FEATURES), dtype=np.float32)
+    for row, text in enumerate(texts):
+        np.add.at(counts[row], _features(text), 1.0)
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1.0
+    vectors = np.log1p(counts) * idf.astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def near_duplicate_groups(texts: List[str], threshold: float) -> List[List[int]]:
+    """
+    Groups the indices of `texts` whose cosine similarity is at least `threshold`.
+
+    Each text joins the group of the first earlier group leader it is similar
+    enough to, so groups are listed in order of their first member and every
+    member is close to its leader. Returns singleton groups when `texts` has no
+    near-duplicates.
+    """
+    if not texts:
+        return []
+    vectors = tfidf_matrix(texts)
+    similar = (vectors @ vectors.T) >= threshold
+    groups: List[List[int]] = []
+    leaders: List[int] = []
+    for index in range(len(texts)):
+        matches = np.flatnonzero(similar[index, leaders]) if leaders else ()
+        if len(matches):
+            groups[matches[0]].append(index)
+        else:
+            leaders.append(index)
+            groups.append([index])
+    return groups
@@ -4,30 +4,21 @@
 import re
 from typing import Optional
 from brainstorm.agents.state import GraphState
+from brainstorm.utils.blob_store import BlobStore
+from brainstorm.utils.pdf_utils import extract_pdf_text
 from brainstorm.utils.ui import console
 
-# Try to import pypdf, but handle the case where it's not installed.
-try:
-    import pypdf
-except ImportError:
-    pypdf = None
 
-
-def get_pdf_text(pdf_path: str) -> Optional[str]:
+def get_pdf_text(
+    pdf_path: str, backend: str = "pypdf", pages: Optional[str] = None
+) -> Optional[str]:
     """Extracts text from a PDF file."""
-    if not pypdf:
-        console.print("⚠️ 'pypdf' library not found. PDF processing is disabled.", style="yellow")
-        console.print("   Please install it with: pip install pypdf", style="yellow")
-        return None
     try:
-        with open(pdf_path, "rb") as f:
-            reader = pypdf.PdfReader(f)
-            text = ""
-            for page in reader.pages:
-                extracted = page.extract_text()
-                if extracted:
-                    text += extracted + "\n\n"
-            return text
+        return extract_pdf_text(pdf_path, backend=backend, pages=pages)
+    except ImportError:
+        console.print(f"⚠️ '{backend}' library not found. PDF processing is disabled.", style="yellow")
+        console.print(f"   Please install it with: pip install {backend}", style="yellow")
+        return None
     except FileNotFoundError:
         console.print(f"❌ Error: The file '{pdf_path}' was not found.", style="red")
         return None
@@ -36,19 +27,22 @@ def get_pdf_text(pdf_path: str) -> Optional[str]:
         return None
 
 
-def generate_markdown_export(state: GraphState) -> str:
+def generate_markdown_export(state: GraphState, blob_store: BlobStore) -> str:
     """
     Generates a complete markdown string of the entire brainstorming session
-    from the final graph state.
+    from the final graph state, resolving blob references through `blob_store`.
     """
+    combined_context = blob_store.get(state.get("combined_context_ref"))
+    final_plan_text = blob_store.get(state.get("final_plan_ref"))
+
     md = []
     md.append(f"# Brainstorm Session: {state.get('topic', 'N/A')}")
     md.append(f"**Type:** {state.get('brainstorm_type', '').replace('_', ' ').title()}")
 
-    if state.get("combined_context"):
+    if combined_context:
         md.append("\n## Stage 1: Context & Team")
         md.append("### Research Context")
-        md.append(state["combined_context"])
+        md.append(combined_context)
 
     if state.get("personas"):
         md.append("\n### Assembled Agent Team")
@@ -57,14 +51,14 @@ def generate_markdown_export(state: GraphState) -> str:
             md.append(f"  - **Goal:** {p['Goal']}")
             md.append(f"  - **Backstory:** {p['Backstory']}")
 
-    if state.get("all_generated_ideas"):
+    registry = state.get("idea_registry")
+    if registry and state.get("idea_ids"):
         md.append("\n## Stage 2: Divergent Ideation")
         md.append("### All Generated Ideas (Pre-Filtering)")
-        idea_idx = 1
-        for idea in state["all_generated_ideas"]:
-            md.append(f"\n#### Idea {idea_idx}")
-            idea_idx += 1
-            title = idea.get("idea") or idea.get("research_question", "Untitled")
+        for idea_idx, idea_id in enumerate(state["idea_ids"], start=1):
+            idea = registry["ideas"][idea_id]
+            md.append(f"\n#### Idea {idea_idx} ({idea_id})")
+            md.append(f"- **Proposed By:** {', '.join(registry['origins'].get(idea_id, []))}")
             if state.get("brainstorm_type") == "project":
                 md.append(f"- **Idea:** {idea.get('idea', 'N/A')}")
                 md.append(
@@ -84,25 +78,17 @@ def generate_markdown_export(state: GraphState) -> str:
             md.append(f"- **Rationale:** {idea.get('rationale', 'N/A')}")
 
             # Include the critique in the export, if it exists for this idea
-            if state.get("critiques"):
-                matching_critique = next(
-                    (
-                        c["critique"]
-                        for c in state["critiques"]
-                        if c["idea_title"] == title
-                    ),
-                    None,
-                )
-                if matching_critique:
-                    md.append(f"- **🔥 Red Team Critique:** {matching_critique}")
+            critique = registry["critiques"].get(idea_id)
+            if critique:
+                md.append(f"- **🔥 Red Team Critique:** {critique}")
 
     if state.get("evaluation_markdown"):
         md.append("\n## Stage 3: Convergent Evaluation")
         md.append(state["evaluation_markdown"])
 
-    if state.get("final_plan_text"):
+    if final_plan_text:
         md.append("\n## Stage 4: Final Plan")
-        md.append(state["final_plan_text"])
+        md.append(final_plan_text)
 
     return "\n\n".join(md)
 
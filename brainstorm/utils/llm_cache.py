@@ -0,0 +1,82 @@
+# llm_cache.py
+# This file contains the persistent LLM response cache used by every node chain.
+
+import hashlib
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.globals import get_llm_cache, set_llm_cache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+from brainstorm.utils.cache import DiskCache
+
+
+class LLMResponseCache(BaseCache):
+    """
+    A LangChain cache backed by `DiskCache`.
+
+    Keys are content addresses over the serialized model configuration (which
+    includes the model name and temperature) and the fully rendered prompt, so
+    any change to either produces a fresh call.
+    """
+
+    def __init__(self, store: DiskCache):
+        self.store = store
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        cached = self.store.get(self._key(prompt, llm_string))
+        if cached is None:
+            return None
+        generations = []
+        for item in cached:
+            if "message" in item:
+                message = messages_from_dict([item["message"]])[0]
+                generations.append(ChatGeneration(message=message, generation_info={"cached": True}))
+            else:
+                generations.append(Generation(text=item["text"], generation_info={"cached": True}))
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        payload = []
+        for generation in return_val:
+            if isinstance(generation, ChatGeneration):
+                payload.append({"message": message_to_dict(generation.message)})
+            else:
+                payload.append({"text": generation.text})
+        self.store.set(self._key(prompt, llm_string), payload)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear()
+
+    @property
+    def hits(self) -> int:
+        return self.store.hits
+
+    @property
+    def misses(self) -> int:
+        return self.store.misses
+
+
+def configure_llm_cache(
+    directory: Union[str, Path, None] = None,
+    max_entries: Optional[int] = 10_000,
+    max_age: Optional[float] = None,
+) -> LLMResponseCache:
+    """Installs a persistent LLM response cache as the LangChain global cache."""
+    cache = LLMResponseCache(
+        DiskCache("llm", directory=directory, max_entries=max_entries, max_age=max_age)
+    )
+    set_llm_cache(cache)
+    return cache
+
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """Returns the active persistent LLM cache, if one has been configured."""
+    cache = get_llm_cache()
+    return cache if isinstance(cache, LLMResponseCache) else None
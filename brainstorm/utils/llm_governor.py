@@ -0,0 +1,330 @@
+# llm_governor.py
+# This file contains the process-wide scheduler that every language model call goes through.
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from langchain_core.language_models.chat_models import BaseChatModel, generate_from_stream
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, Field
+
+from brainstorm.utils.rate_limit import TokenBucket, backoff_delay
+
+T = TypeVar("T")
+
+CHARS_PER_TOKEN = 4
+# Output tokens reserved for a request before its real usage is known.
+EXPECTED_OUTPUT_TOKENS = 1_024
+
+_governors: Dict[Tuple, "LLMGovernor"] = {}
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Returns True for provider quota / rate limit errors (HTTP 429)."""
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(
+        marker in text
+        for marker in ("429", "resourceexhausted", "resource exhausted", "ratelimit", "rate limit", "quota")
+    )
+
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    """Roughly estimates the prompt tokens of `messages` from their length."""
+    return sum(len(str(m.content)) for m in messages) // CHARS_PER_TOKEN
+
+
+class LLMGovernor:
+    """
+    Schedules language model requests against the provider's quota.
+
+    Requests wait for a free in-flight slot and for the requests-per-minute and
+    tokens-per-minute budgets. The in-flight limit grows by one after a full
+    window of successes and halves on a quota error, and a quota error also
+    pauses new requests briefly, so fan-outs settle just under the quota.
+    Rejected requests are retried rather than dropped.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        rpm: float = 60.0,
+        tpm: float = 1_000_000.0,
+        max_retries: int = 6,
+        on_retry: Optional[Callable[[Exception, int, float], None]] = None,
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.limit = self.max_in_flight
+        self.max_retries = max_retries
+        self.on_retry = on_retry
+        self._requests = TokenBucket(rpm / 60, capacity=min(rpm, self.max_in_flight))
+        self._tokens = TokenBucket(tpm / 60, capacity=tpm)
+        self._in_flight = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._condition = asyncio.Condition()
+        self.requests = 0
+        self.quota_errors = 0
+
+    async def _acquire_slot(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+
+    async def _release_slot(self) -> None:
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def _record_success(self) -> None:
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.max_in_flight:
+            self.limit += 1
+            self._successes = 0
+
+    def _record_quota_error(self, delay: float) -> None:
+        self.quota_errors += 1
+        self.limit = max(1, self.limit // 2)
+        self._successes = 0
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    async def _admit(self, reserved: float) -> None:
+        """Waits out any quota pause, then takes a slot and the rate budgets."""
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        await self._acquire_slot()
+        try:
+            await self._requests.acquire()
+            await self._tokens.acquire(reserved)
+        except BaseException:
+            await self._release_slot()
+            raise
+        self.requests += 1
+
+    def _should_retry(
+        self, error: Exception, attempt: int, on_retry: Optional[Callable] = None
+    ) -> bool:
+        if not is_quota_error(error) or attempt >= self.max_retries:
+            return False
+        delay = backoff_delay(attempt, base_delay=2.0, max_delay=60.0)
+        self._record_quota_error(delay)
+        for callback in (self.on_retry, on_retry):
+            if callback:
+                callback(error, attempt + 1, delay)
+        return True
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        return min(estimated_tokens + EXPECTED_OUTPUT_TOKENS, self._tokens.capacity)
+
+    def settle(self, estimated_tokens: int, used_tokens: int) -> None:
+        """Charges the difference between a request's real and reserved token usage."""
+        self._tokens.charge(used_tokens - self._reserve(estimated_tokens))
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        estimated_tokens: int = 0,
+        count_tokens: Optional[Callable[[T], Optional[int]]] = None,
+        on_retry: Optional[Callable[[Exception, int, float], None]] = None,
+    ) -> T:
+        """
+        Awaits `call()` once the quota allows, retrying quota errors.
+
+        `estimated_tokens` is reserved from the tokens-per-minute budget up
+        front; `count_tokens` returns the real usage of a result, if known,
+        and the difference is settled afterwards. `on_retry` is told about
+        this call's retries, in addition to the governor's own callback.
+        """
+        reserved = self._reserve(estimated_tokens)
+        attempt = 0
+        while True:
+            await self._admit(reserved)
+            try:
+                result = await call()
+            except Exception as e:
+                if not self._should_retry(e, attempt, on_retry):
+                    raise
+                attempt += 1
+                continue
+            finally:
+                await self._release_slot()
+            self._record_success()
+            used = count_tokens(result) if count_tokens else None
+            if used is not None:
+                self.settle(estimated_tokens, used)
+            return result
+
+    async def stream(
+        self,
+        open_stream: Callable[[], AsyncIterator[T]],
+        estimated_tokens: int = 0,
+        on_retry: Optional[Callable[[Exception, int, float], None]] = None,
+    ) -> AsyncIterator[T]:
+        """
+        Yields from `open_stream()` once the quota allows.
+
+        The slot is held until the stream ends. A quota error is retried only
+        if it arrives before the first chunk, so nothing is yielded twice.
+        """
+        reserved = self._reserve(estimated_tokens)
+        attempt = 0
+        while True:
+            await self._admit(reserved)
+            started = False
+            try:
+                async for chunk in open_stream():
+                    started = True
+                    yield chunk
+            except Exception as e:
+                if started or not self._should_retry(e, attempt, on_retry):
+                    raise
+                attempt += 1
+                continue
+            finally:
+                await self._release_slot()
+            self._record_success()
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "quota_errors": self.quota_errors,
+            "in_flight_limit": self.limit,
+        }
+
+
+def get_llm_governor(
+    max_in_flight: int = 8, rpm: float = 60.0, tpm: float = 1_000_000.0
+) -> LLMGovernor:
+    """Returns the process-wide governor for the given limits."""
+    key = (max_in_flight, rpm, tpm)
+    if key not in _governors:
+        _governors[key] = LLMGovernor(max_in_flight, rpm, tpm, on_retry=_print_retry)
+    return _governors[key]
+
+
+def _print_retry(error: Exception, attempt: int, delay: float) -> None:
+    from brainstorm.utils.ui import console
+
+    console.print(
+        f"⚠️ LLM quota reached, retrying in {delay:.1f}s (attempt {attempt})...",
+        style="yellow",
+    )
+
+
+def _result_tokens(result: ChatResult) -> Optional[int]:
+    usage = [
+        g.message.usage_metadata
+        for g in result.generations
+        if getattr(g.message, "usage_metadata", None)
+    ]
+    if not usage:
+        return None
+    return sum(u.get("total_tokens", 0) for u in usage)
+
+
+def _supports_streaming(model: BaseChatModel) -> bool:
+    return (
+        type(model)._astream is not BaseChatModel._astream
+        or type(model)._stream is not BaseChatModel._stream
+    )
+
+
+class GovernedChatModel(BaseChatModel):
+    """
+    A chat model that sends every request of the wrapped model through a governor.
+
+    The wrapper reports the wrapped model's identity, so cache keys do not
+    change, and cache hits never reach the governor. When the wrapped model
+    can stream, responses are streamed and each token is reported to the
+    callbacks (see ConsoleTokenStream) while still being cached as a whole.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model: BaseChatModel
+    governor: LLMGovernor = Field(exclude=True)
+    streaming: bool = True
+
+    @property
+    def _llm_type(self) -> str:
+        return self.model._llm_type
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.model._identifying_params
+
+    def _get_llm_string(self, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        return self.model._get_llm_string(stop=stop, **kwargs)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Synchronous calls are not scheduled; the graph only uses the async API.
+        return self.model._generate(messages, stop=stop, **kwargs)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # The retries of this call are reported in llm_output, for tracing.
+        retries = []
+
+        def on_retry(error: Exception, attempt: int, delay: float) -> None:
+            retries.append(attempt)
+
+        if not (self.streaming and _supports_streaming(self.model)):
+            result = await self.governor.run(
+                lambda: self.model._agenerate(messages, stop=stop, **kwargs),
+                estimated_tokens=estimate_tokens(messages),
+                count_tokens=_result_tokens,
+                on_retry=on_retry,
+            )
+            result.llm_output = {**(result.llm_output or {}), "retries": len(retries)}
+            return result
+        chunks = []
+        async for chunk in self._astream(messages, stop=stop, on_retry=on_retry, **kwargs):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            chunks.append(chunk)
+        result = generate_from_stream(iter(chunks))
+        used = _result_tokens(result)
+        if used is not None:
+            self.governor.settle(estimate_tokens(messages), used)
+        result.llm_output = {"retries": len(retries)}
+        return result
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        on_retry: Optional[Callable[[Exception, int, float], None]] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if not _supports_streaming(self.model):
+            result = await self._agenerate(messages, stop=stop, **kwargs)
+            message = result.generations[0].message
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content=message.content, usage_metadata=message.usage_metadata
+                )
+            )
+            return
+        async for chunk in self.governor.stream(
+            lambda: self.model._astream(messages, stop=stop, **kwargs),
+            estimated_tokens=estimate_tokens(messages),
+            on_retry=on_retry,
+        ):
+            yield chunk
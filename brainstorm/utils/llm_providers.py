@@ -0,0 +1,155 @@
+# llm_providers.py
+# This file contains the chat model providers the app can run against, and the
+# keep-alive HTTP connection pool shared by the models they create.
+
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+PROVIDERS = ("gemini", "openai")
+DEFAULT_MODELS = {"gemini": "gemini-2.0-flash", "openai": "gpt-4o-mini"}
+API_KEY_ENV_VARS = {"gemini": "GOOGLE_API_KEY", "openai": "OPENAI_API_KEY"}
+PROVIDER_NAMES = {"gemini": "Google", "openai": "OpenAI"}
+
+# Idle connections are kept this long, which covers the gap between the
+# calls of a session, including the time the user takes to answer a prompt.
+KEEPALIVE_SECONDS = 300.0
+
+# Pooled clients, keyed by (event loop, pool size). A client's connections
+# belong to the loop that opened them, so each loop gets its own.
+_http_clients: Dict[Tuple[asyncio.AbstractEventLoop, int], Any] = {}
+
+
+def get_http_client(max_connections: int = 8):
+    """
+    Returns the keep-alive HTTP client shared by every model created on the
+    running event loop, so nodes and concurrent sessions reuse open
+    connections instead of paying connection setup on each call.
+    """
+    import httpx
+
+    key = (asyncio.get_running_loop(), max_connections)
+    if key not in _http_clients:
+        _http_clients[key] = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=KEEPALIVE_SECONDS,
+            ),
+        )
+    return _http_clients[key]
+
+
+async def close_http_clients() -> None:
+    """Closes the pooled clients of the running event loop."""
+    loop = asyncio.get_running_loop()
+    for key in [key for key in _http_clients if key[0] is loop]:
+        await _http_clients.pop(key).aclose()
+
+
+def create_chat_model(
+    provider: str,
+    api_key: Optional[str],
+    model: Optional[str] = None,
+    base_url: Optional[str] = None,
+    temperature: float = 0.7,
+    max_connections: int = 8,
+):
+    """
+    Returns the chat model of `provider`, with the provider's default model
+    unless `model` is given.
+
+    "gemini" calls the Gemini API, or the endpoint at `base_url`; its client
+    keeps its connection open for the model's lifetime. "openai" calls any
+    OpenAI-compatible endpoint (OpenAI itself unless `base_url` is given,
+    e.g. an inference gateway or a local server) through the shared pool.
+    Raises ValueError for an unknown provider.
+    """
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown provider '{provider}'. Choose one of: {', '.join(PROVIDERS)}.")
+    model = model or DEFAULT_MODELS[provider]
+
+    if provider == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(
+            model=model,
+            google_api_key=api_key,
+            temperature=temperature,
+            client_options={"api_endpoint": base_url} if base_url else None,
+        )
+
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=model,
+        # Local servers usually accept any key, but the client requires one.
+        api_key=api_key or "not-needed",
+        base_url=base_url,
+        temperature=temperature,
+        # Responses are streamed (see GovernedChatModel); ask for their token usage too.
+        stream_usage=True,
+        http_async_client=get_http_client(max_connections),
+    )
+
+
+def _gemini_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts an inlined JSON schema to the subset Gemini's response_schema accepts."""
+    converted: Dict[str, Any] = {"type_": schema.get("type", "string").upper()}
+    if "description" in schema:
+        converted["description"] = schema["description"]
+    if "properties" in schema:
+        converted["properties"] = {
+            name: _gemini_schema(value) for name, value in schema["properties"].items()
+        }
+        converted["required"] = schema.get("required", [])
+    if "items" in schema:
+        converted["items"] = _gemini_schema(schema["items"])
+    return converted
+
+
+def _strict_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Makes an inlined JSON schema acceptable to OpenAI's strict mode, which
+    requires every property and rejects defaults. Fields with a default are
+    still answered, possibly with an empty value.
+    """
+    strict = {key: value for key, value in schema.items() if key != "default"}
+    if "properties" in schema:
+        strict["properties"] = {
+            name: _strict_schema(value) for name, value in schema["properties"].items()
+        }
+        strict["required"] = list(schema["properties"])
+    if "items" in schema:
+        strict["items"] = _strict_schema(schema["items"])
+    return strict
+
+
+def native_json_kwargs(provider: Optional[str], schema: Any) -> Dict[str, Any]:
+    """
+    Returns the call options that make `provider` answer with JSON matching
+    the pydantic `schema` (Gemini's response schema, OpenAI's strict JSON
+    schema response format), or {} for no provider.
+    """
+    if provider not in PROVIDERS:
+        return {}
+    from langchain_core.utils.function_calling import convert_to_openai_function
+
+    if provider == "gemini":
+        parameters = convert_to_openai_function(schema)["parameters"]
+        return {
+            "generation_config": {
+                "response_mime_type": "application/json",
+                "response_schema": _gemini_schema(parameters),
+            }
+        }
+    function = convert_to_openai_function(schema, strict=True)
+    return {
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {
+                "name": function["name"],
+                "schema": _strict_schema(function["parameters"]),
+                "strict": True,
+            },
+        }
+    }
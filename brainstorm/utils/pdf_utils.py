@@ -0,0 +1,116 @@
+# pdf_utils.py
+# This file contains PDF text extraction with pluggable backends and
+# page-range parallelism.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+PDF_BACKENDS = ("pypdf", "pymupdf")
+
+# Below this many pages, starting worker processes costs more than it saves.
+MIN_PAGES_FOR_POOL = 32
+
+
+def parse_page_ranges(spec: str) -> List[Tuple[int, Optional[int]]]:
+    """
+    Parses a 1-based, inclusive page selection such as "1-20,25,40-".
+
+    Returns (start, end) pairs where `end` is None for an open-ended range.
+    Raises ValueError on malformed input.
+    """
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start_str, end_str = part.split("-", 1)
+            start = int(start_str) if start_str.strip() else 1
+            end = int(end_str) if end_str.strip() else None
+        else:
+            start = end = int(part)
+        if start < 1 or (end is not None and end < start):
+            raise ValueError(f"Invalid page range: '{part}'")
+        ranges.append((start, end))
+    if not ranges:
+        raise ValueError("Empty page selection")
+    return ranges
+
+
+def select_pages(spec: Optional[str], page_count: int) -> List[int]:
+    """Returns the sorted 0-based page indices selected by `spec` (all pages if None)."""
+    if not spec:
+        return list(range(page_count))
+    selected = set()
+    for start, end in parse_page_ranges(spec):
+        last = page_count if end is None else min(end, page_count)
+        selected.update(range(start - 1, last))
+    return sorted(selected)
+
+
+def _import_backend(backend: str):
+    if backend == "pypdf":
+        import pypdf
+
+        return pypdf
+    if backend == "pymupdf":
+        try:
+            import pymupdf
+        except ImportError:  # Older releases only ship the 'fitz' name.
+            import fitz as pymupdf
+        return pymupdf
+    raise ValueError(f"Unknown PDF backend '{backend}'. Choose one of: {', '.join(PDF_BACKENDS)}")
+
+
+def count_pages(pdf_path: str, backend: str = "pypdf") -> int:
+    module = _import_backend(backend)
+    if backend == "pypdf":
+        with open(pdf_path, "rb") as f:
+            return len(module.PdfReader(f).pages)
+    with module.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def extract_pages(pdf_path: str, backend: str, page_indices: List[int]) -> List[str]:
+    """Extracts the text of the given 0-based pages. Runs inside worker processes."""
+    module = _import_backend(backend)
+    if backend == "pypdf":
+        with open(pdf_path, "rb") as f:
+            reader = module.PdfReader(f)
+            return [reader.pages[i].extract_text() or "" for i in page_indices]
+    with module.open(pdf_path) as doc:
+        return [doc.load_page(i).get_text() or "" for i in page_indices]
+
+
+def extract_pdf_text(
+    pdf_path: str,
+    backend: str = "pypdf",
+    pages: Optional[str] = None,
+    workers: Optional[int] = None,
+) -> str:
+    """
+    Extracts the text of a PDF, optionally restricted to a page selection.
+
+    Large documents are split into contiguous page ranges that are extracted
+    in parallel worker processes. Page texts are joined once at the end, with
+    empty pages dropped.
+    """
+    page_indices = select_pages(pages, count_pages(pdf_path, backend))
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1 or len(page_indices) < MIN_PAGES_FOR_POOL:
+        page_texts = extract_pages(pdf_path, backend, page_indices)
+    else:
+        chunk_size = -(-len(page_indices) // workers)
+        chunks = [
+            page_indices[i : i + chunk_size]
+            for i in range(0, len(page_indices), chunk_size)
+        ]
+        with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+            chunk_texts = pool.map(
+                extract_pages, [pdf_path] * len(chunks), [backend] * len(chunks), chunks
+            )
+            page_texts = [text for chunk in chunk_texts for text in chunk]
+
+    return "".join(f"{text}\n\n" for text in page_texts if text)
@@ -0,0 +1,140 @@
+# prompt_budget.py
+# This file contains the prompt budget manager. It counts the tokens of a
+# rendered prompt and, when the prompt is over its node's budget, compresses
+# and trims the prompt's variable sections (context, idea lists, ArXiv
+# abstracts) until it fits.
+
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.prompts import BasePromptTemplate
+
+from brainstorm.utils.llm_governor import CHARS_PER_TOKEN
+from brainstorm.utils.ui import console
+
+# Sections are split into blocks (ideas, papers, context parts) and blocks
+# into lines (an idea's fields), so trimming shortens the longest entries and
+# keeps every entry's first line, which carries its ID or title.
+SEPARATORS = ("\n---\n", "\n")
+ELLIPSIS = " …"
+# Lines that would be cut shorter than this are dropped instead.
+MIN_PIECE_CHARS = 24
+
+
+def count_tokens(text: str) -> int:
+    """Estimates the tokens of `text` the way the LLM governor does."""
+    return len(text) // CHARS_PER_TOKEN
+
+
+def compress_text(text: str) -> str:
+    """Collapses runs of spaces and blank lines, which cost tokens but carry nothing."""
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r" ?\n ?", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def fair_shares(lengths: Sequence[int], capacity: int) -> List[int]:
+    """
+    Splits `capacity` between pieces of the given lengths: pieces shorter
+    than an equal share keep their length, and the longer ones share what
+    is left equally.
+    """
+    shares = [0] * len(lengths)
+    remaining, count = max(capacity, 0), len(lengths)
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        shares[index] = min(lengths[index], remaining // count)
+        remaining -= shares[index]
+        count -= 1
+    return shares
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Cuts `text` to `max_chars` on a word boundary, or to nothing if that leaves a stub."""
+    if len(text) <= max_chars:
+        return text
+    if max_chars < MIN_PIECE_CHARS:
+        return ""
+    cut = text[: max_chars - len(ELLIPSIS)]
+    # End on a word boundary unless that would drop most of the piece.
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + ELLIPSIS
+
+
+def shrink_text(text: str, max_chars: int, separators: Sequence[str] = SEPARATORS) -> str:
+    """Shortens `text` to at most `max_chars`, cutting its longest blocks and lines first."""
+    if len(text) <= max_chars:
+        return text
+    if not separators:
+        return _truncate(text, max_chars)
+    separator, rest = separators[0], separators[1:]
+    pieces = text.split(separator)
+    if len(pieces) == 1:
+        return shrink_text(text, max_chars, rest)
+
+    head = ""
+    if not rest:
+        # The first line of an entry names it (its ID, title or heading), so
+        # it is kept before the other lines share what is left.
+        start = next((i for i, piece in enumerate(pieces) if piece.strip()), 0)
+        head = separator.join(pieces[: start + 1])
+        pieces = pieces[start + 1 :]
+        head = _truncate(head, max_chars)
+        max_chars -= len(head)
+    # Pieces too short on room to keep a readable part are dropped, the last
+    # first, and their share goes to the others.
+    lengths = [len(p) + len(separator) for p in pieces]
+    capacity = max_chars - len(separator) * bool(head)
+    active = list(range(len(pieces)))
+    while True:
+        shares = dict(zip(active, fair_shares([lengths[i] for i in active], capacity)))
+        starved = [i for i in active if shares[i] < min(lengths[i], MIN_PIECE_CHARS + len(separator))]
+        if not starved:
+            break
+        active.remove(starved[-1])
+    kept = [shrink_text(pieces[i], shares[i] - len(separator), rest) for i in active]
+    return separator.join(([head] if head else []) + kept)
+
+
+def fit_prompt(
+    prompt: BasePromptTemplate,
+    values: Dict[str, Any],
+    sections: Sequence[str],
+    budget: Optional[int],
+    label: str = "prompt",
+) -> Tuple[Dict[str, Any], int]:
+    """
+    Fits `prompt`, rendered with `values`, to `budget` tokens.
+
+    Only the `sections` (names of variable, text-valued inputs) are changed:
+    they are compressed first and then trimmed, sharing the room left by the
+    rest of the prompt so that short sections stay whole. Returns the values
+    to call the prompt with and the prompt's size in tokens. A falsy budget
+    leaves the values unchanged.
+    """
+    size = count_tokens(prompt.format(**values))
+    if not budget or size <= budget:
+        return values, size
+
+    fitted = dict(values)
+    for name in sections:
+        fitted[name] = compress_text(str(fitted[name] or ""))
+    fixed = len(prompt.format(**{**fitted, **{name: "" for name in sections}}))
+    shares = fair_shares([len(fitted[name]) for name in sections], budget * CHARS_PER_TOKEN - fixed)
+    for name, share in zip(sections, shares):
+        fitted[name] = shrink_text(fitted[name], share)
+
+    fitted_size = count_tokens(prompt.format(**fitted))
+    if fitted_size > budget:
+        console.print(
+            f"⚠️ The {label} prompt needs {fixed // CHARS_PER_TOKEN} tokens without its context, "
+            f"over its budget of {budget}; trimmed it from {size} to {fitted_size} tokens.",
+            style="yellow",
+        )
+    else:
+        console.print(
+            f"✂️ Fitted the {label} prompt to its budget: {size} → {fitted_size} tokens (limit {budget}).",
+            style="dim",
+        )
+    return fitted, fitted_size
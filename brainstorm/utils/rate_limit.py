@@ -0,0 +1,83 @@
+# rate_limit.py
+# This file contains async rate limiting and retry helpers for external services.
+
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    An async token-bucket rate limiter.
+
+    Tokens refill continuously at `rate` per second up to `capacity`, so short
+    bursts are allowed while the long-run rate stays bounded. Waiters are served
+    in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Waits until `tokens` are available and takes them."""
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+    def charge(self, tokens: float) -> None:
+        """
+        Takes (or, if negative, returns) `tokens` without waiting.
+
+        Used to settle usage that is only known afterwards; the balance may go
+        negative, which delays later callers.
+        """
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens - tokens)
+
+
+def backoff_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 30.0) -> float:
+    """Returns a 'full jitter' exponential backoff delay for the given attempt (0-based)."""
+    return random.uniform(0, min(max_delay, base_delay * (2**attempt)))
+
+
+async def retry_with_backoff(
+    func: Callable[[], Awaitable[T]],
+    is_retryable: Callable[[Exception], bool],
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+    on_retry: Optional[Callable[[Exception, int, float], None]] = None,
+) -> T:
+    """
+    Awaits `func()`, retrying retryable errors with jittered exponential backoff.
+
+    The last error is re-raised once `max_retries` retries have been used, and
+    non-retryable errors are raised immediately.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await func()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            if on_retry:
+                on_retry(e, attempt + 1, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
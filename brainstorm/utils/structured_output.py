@@ -0,0 +1,249 @@
+# structured_output.py
+# This file contains the helpers for JSON-producing prompts: compact format
+# instructions, calls in the provider's native JSON mode, and a local repair
+# pass that fixes malformed responses before any call is repeated.
+
+import ast
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar, get_args, get_origin
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel, ValidationError
+
+from brainstorm.utils.llm_providers import native_json_kwargs
+from brainstorm.utils.ui import console
+
+Model = TypeVar("Model", bound=BaseModel)
+
+FENCE_PATTERN = re.compile(r"```[a-zA-Z]*[ \t]*\n?([\s\S]*?)(?:```|$)")
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _skeleton(node: Dict[str, Any], defs: Dict[str, Any]) -> Any:
+    if "$ref" in node:
+        node = defs[node["$ref"].split("/")[-1]]
+    if node.get("type") == "object" or "properties" in node:
+        return {name: _skeleton(value, defs) for name, value in node["properties"].items()}
+    if node.get("type") == "array":
+        return [_skeleton(node.get("items", {}), defs)]
+    return node.get("description") or node.get("type", "value")
+
+
+def format_instructions(schema: Type[BaseModel]) -> str:
+    """
+    Returns a one-line JSON example of `schema` with each field's description
+    as its value, a fraction of the size of the full JSON schema.
+    """
+    json_schema = schema.model_json_schema()
+    return json.dumps(_skeleton(json_schema, json_schema.get("$defs", {})), ensure_ascii=False)
+
+
+def _json_start(text: str) -> int:
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    return min(starts) if starts else -1
+
+
+def find_json(text: str) -> Optional[Tuple[int, int]]:
+    """
+    Returns the span of the last fenced JSON block in `text`, fence included
+    (an unclosed fence runs to the end), or else of the first bare JSON value.
+    Returns None if `text` holds neither.
+    """
+    fenced = [match for match in FENCE_PATTERN.finditer(text) if _json_start(match.group(1)) >= 0]
+    if fenced:
+        return fenced[-1].span()
+    start = _json_start(text)
+    if start < 0:
+        return None
+    return start, start + _close_json(text[start:])[1]
+
+
+def _close_json(text: str) -> Tuple[str, int]:
+    """
+    Scans the JSON value `text` starts with and returns it repaired, with the
+    number of characters it took up: trailing commas are dropped, mismatched
+    brackets corrected, Python literals converted, and a truncated value is
+    closed.
+    """
+    out: List[str] = []
+    closers: List[str] = []
+    in_string = escaped = False
+    last = ""  # The last character outside whitespace and strings.
+    # Where the key being written started, so a key left without a value can be dropped.
+    key_start: Optional[int] = None
+    index = 0
+    while index < len(text) and (closers or not out):
+        char = text[index]
+        index += 1
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char.isspace():
+            out.append(char)
+            continue
+        if last == ":":
+            key_start = None
+        if char == '"':
+            if closers and closers[-1] == "}" and last in ("{", ","):
+                key_start = len(out)
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if not closers:
+                break
+            while out and (out[-1].isspace() or out[-1] == ","):
+                out.pop()
+            char = closers.pop()
+            key_start = None
+        elif char.isalpha():
+            word = re.match(r"[A-Za-z]+", text[index - 1 :]).group(0)
+            index += len(word) - 1
+            char = PYTHON_LITERALS.get(word, word)
+        out.append(char)
+        last = char[-1]
+
+    if not closers:
+        return "".join(out), index
+    # Truncated: close the open string, drop a key left without a value and
+    # a dangling separator, then close the open containers.
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    if key_start is not None:
+        del out[key_start:]
+    repaired = "".join(out).rstrip()
+    while repaired and repaired[-1] in ",:":
+        repaired = repaired[:-1].rstrip()
+    return repaired + "".join(reversed(closers)), index
+
+
+def load_json(text: str) -> Any:
+    """
+    Loads the JSON value in a model response, ignoring fences and prose around
+    it and repairing it locally when it is malformed. A Python literal (single
+    quotes, True/None) is read as a last resort. Raises ValueError if no
+    JSON value can be recovered.
+    """
+    span = find_json(text)
+    if span is None:
+        raise ValueError("the response holds no JSON")
+    candidate = text[span[0] : span[1]]
+    fence = FENCE_PATTERN.fullmatch(candidate)
+    if fence:
+        candidate = fence.group(1)
+    candidate = candidate[max(_json_start(candidate), 0) :].strip()
+    try:
+        return json.loads(candidate, strict=False)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(_close_json(candidate)[0], strict=False)
+    except json.JSONDecodeError as e:
+        error = e
+    # Models without a JSON mode often answer with a Python dict's repr.
+    try:
+        return ast.literal_eval(candidate)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        raise ValueError(f"the JSON could not be repaired ({error})") from error
+
+
+def _list_item_types(schema: Type[BaseModel]) -> Dict[str, Type[BaseModel]]:
+    """Returns the fields of `schema` that are lists of models, with their item model."""
+    fields = {}
+    for name, field in schema.model_fields.items():
+        args = get_args(field.annotation)
+        if get_origin(field.annotation) is not list or not args:
+            continue
+        if isinstance(args[0], type) and issubclass(args[0], BaseModel):
+            fields[name] = args[0]
+    return fields
+
+
+def validate_response(data: Any, schema: Type[Model]) -> Model:
+    """
+    Validates loaded JSON against `schema`, leniently: a bare list, or a list
+    under another key, fills a schema with a single list field, and list
+    items that are invalid are dropped instead of failing the whole response.
+    Raises ValueError if a list loses every item or the rest is invalid.
+    """
+    list_fields = _list_item_types(schema)
+    if len(list_fields) == 1:
+        name = next(iter(list_fields))
+        if isinstance(data, list):
+            data = {name: data}
+        elif isinstance(data, dict) and name not in data:
+            lists = [value for value in data.values() if isinstance(value, list)]
+            if len(lists) == 1:
+                data = {**data, name: lists[0]}
+    try:
+        return schema.model_validate(data)
+    except ValidationError as e:
+        error = e
+    if not isinstance(data, dict):
+        raise ValueError(f"the response is not a {schema.__name__}: {error}")
+
+    salvaged = dict(data)
+    for name, item_type in list_fields.items():
+        items = data.get(name)
+        if not isinstance(items, list):
+            continue
+        valid = []
+        for item in items:
+            try:
+                valid.append(item_type.model_validate(item))
+            except ValidationError:
+                pass
+        if items and not valid:
+            raise ValueError(f"no valid item in '{name}': {error}")
+        salvaged[name] = valid
+    try:
+        return schema.model_validate(salvaged)
+    except ValidationError as e:
+        raise ValueError(f"the response is not a {schema.__name__}: {e}") from e
+
+
+def parse_response(text: str, schema: Type[Model]) -> Model:
+    """Parses a model response into `schema`, repairing it locally (see load_json and validate_response)."""
+    return validate_response(load_json(text), schema)
+
+
+async def ainvoke_structured(
+    prompt: BasePromptTemplate,
+    llm,
+    values: Dict[str, Any],
+    schema: Type[Model],
+    config: Optional[RunnableConfig] = None,
+    provider: Optional[str] = None,
+    retries: int = 1,
+    label: str = "response",
+) -> Model:
+    """
+    Calls `llm` with `prompt` and returns its answer as a `schema` instance.
+
+    The call uses the native JSON mode of `provider`, if given. A malformed
+    answer is repaired locally, and only one that cannot be repaired is
+    requested again, up to `retries` times, bypassing the response cache.
+    Raises ValueError if the last answer cannot be repaired either.
+    """
+    native = native_json_kwargs(provider, schema)
+    for attempt in range(retries + 1):
+        model = llm.bind(**native) if native else llm
+        text = await (prompt | model | StrOutputParser()).ainvoke(values, config=config)
+        try:
+            return parse_response(text, schema)
+        except ValueError as e:
+            if attempt == retries:
+                raise
+            console.print(f"⚠️ Could not repair the {label} ({e}). Requesting it again...", style="yellow")
+            llm = llm.model_copy(update={"cache": False})
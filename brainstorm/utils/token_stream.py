@@ -0,0 +1,31 @@
+# token_stream.py
+# This file contains the callback that prints a model's response as it is
+# streamed. It is kept out of ui.py so that the CLI can print help and
+# errors without importing LangChain.
+
+from typing import Any
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from brainstorm.utils.ui import console
+
+
+class ConsoleTokenStream(AsyncCallbackHandler):
+    """
+    Prints a model's response to the console token by token as it arrives.
+
+    `streamed` stays False when the response came from the cache or the model
+    does not stream, in which case the caller prints the full text itself.
+    """
+
+    def __init__(self):
+        self.streamed = False
+
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if token:
+            self.streamed = True
+            console.print(token, end="", markup=False, highlight=False, soft_wrap=True)
+
+    async def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        if self.streamed:
+            console.print()
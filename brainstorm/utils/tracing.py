@@ -0,0 +1,175 @@
+# tracing.py
+# This file contains the session tracer: it records a span for every graph
+# node and every LLM, web search and ArXiv call as a JSON line, and keeps the
+# totals shown in the end-of-session summary.
+
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from brainstorm.utils.llm_governor import CHARS_PER_TOKEN
+
+SUMMARY_FIELDS = ("input_tokens", "output_tokens", "cache_hit", "retries")
+# Spans of these kinds are named after their query; the summary totals them per kind.
+QUERY_KINDS = ("search", "arxiv")
+
+
+class Tracer:
+    """
+    Appends spans to a JSONL file, one object per line.
+
+    Every span has "kind" (node, llm, search or arxiv), "name", "start" and
+    "end" (Unix time) and "duration_ms", plus whatever the caller recorded:
+    token counts, prompt size, retries, cache hits, errors. Spans are written
+    as they finish, so a crashed session still leaves its trace behind.
+    """
+
+    def __init__(self, path: Union[str, Path], **attrs: Any):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.attrs = attrs
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._totals: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self.callback = TraceCallbackHandler(self)
+
+    def bind(self, **attrs: Any) -> "Tracer":
+        """Returns a view of this tracer that adds `attrs` to every span it records."""
+        bound = object.__new__(Tracer)
+        bound.__dict__.update(self.__dict__)
+        bound.attrs = {**self.attrs, **attrs}
+        return bound
+
+    def record(self, kind: str, name: str, start: float, end: float, **attrs: Any) -> None:
+        span = {
+            "kind": kind,
+            "name": name,
+            "start": round(start, 6),
+            "end": round(end, 6),
+            "duration_ms": round((end - start) * 1000, 3),
+            **self.attrs,
+            **attrs,
+        }
+        with self._lock:
+            self._file.write(json.dumps(span, default=str) + "\n")
+            self._file.flush()
+            key = (kind, "all queries" if kind in QUERY_KINDS else name)
+            totals = self._totals.setdefault(
+                key, {"count": 0, "duration_ms": 0.0, **{f: 0 for f in SUMMARY_FIELDS}}
+            )
+            totals["count"] += 1
+            totals["duration_ms"] += span["duration_ms"]
+            for field in SUMMARY_FIELDS:
+                totals[field] += int(attrs.get(field) or 0)
+
+    @asynccontextmanager
+    async def span(self, kind: str, name: str, **attrs: Any) -> AsyncIterator[Dict[str, Any]]:
+        """Times the block as a span. The block can add fields to the yielded dict."""
+        fields = dict(attrs)
+        start = time.time()
+        try:
+            yield fields
+        except BaseException as e:
+            fields["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(kind, name, start, time.time(), **fields)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Returns the totals per (kind, name), the slowest first."""
+        rows = [{"kind": kind, "name": name, **totals} for (kind, name), totals in self._totals.items()]
+        return sorted(rows, key=lambda row: row["duration_ms"], reverse=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+@asynccontextmanager
+async def trace_span(
+    tracer: Optional[Tracer], kind: str, name: str, **attrs: Any
+) -> AsyncIterator[Dict[str, Any]]:
+    """Like Tracer.span, but does nothing when tracing is off."""
+    if tracer is None:
+        yield dict(attrs)
+        return
+    async with tracer.span(kind, name, **attrs) as fields:
+        yield fields
+
+
+class TraceCallbackHandler(BaseCallbackHandler):
+    """
+    Records graph nodes and LLM calls as spans, from LangChain's callbacks.
+
+    Token counts come from the model's usage metadata when it reports them
+    and are otherwise estimated from the text ("tokens_estimated"); cache
+    hits spend no tokens and record none. Retries are reported by
+    GovernedChatModel and cache hits by LLMResponseCache.
+    """
+
+    run_inline = True
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        self._open: Dict[Any, Tuple[str, str, float, Dict[str, Any]]] = {}
+
+    @staticmethod
+    def _session(metadata: Optional[Dict]) -> Dict[str, Any]:
+        thread_id = (metadata or {}).get("thread_id")
+        return {"session": thread_id} if thread_id else {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        name = kwargs.get("name")
+        if metadata and name and metadata.get("langgraph_node") == name:
+            self._open[run_id] = ("node", name, time.time(), self._session(metadata))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._close(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        # Interrupts end a node's run with an error; they are not failures.
+        status = "interrupted" if type(error).__name__ == "GraphInterrupt" else None
+        self._close(run_id, **({"status": status} if status else {"error": type(error).__name__}))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        name = metadata.get("langgraph_node") or metadata.get("trace_name") or "llm"
+        prompt_chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        self._open[run_id] = (
+            "llm", name, time.time(), {**self._session(metadata), "prompt_chars": prompt_chars}
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        if run_id not in self._open:
+            return
+        fields: Dict[str, Any] = {"retries": (response.llm_output or {}).get("retries", 0)}
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        if generation is not None:
+            fields["output_chars"] = len(generation.text)
+            fields["cache_hit"] = bool((generation.generation_info or {}).get("cached"))
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if fields["cache_hit"]:
+                pass  # Served from the cache; no tokens were spent.
+            elif usage:
+                fields["input_tokens"] = usage.get("input_tokens")
+                fields["output_tokens"] = usage.get("output_tokens")
+            else:
+                fields["input_tokens"] = self._open[run_id][3]["prompt_chars"] // CHARS_PER_TOKEN
+                fields["output_tokens"] = len(generation.text) // CHARS_PER_TOKEN
+                fields["tokens_estimated"] = True
+        self._close(run_id, **fields)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, error=type(error).__name__)
+
+    def _close(self, run_id, **fields: Any) -> None:
+        opened = self._open.pop(run_id, None)
+        if opened is None:
+            return
+        kind, name, start, attrs = opened
+        self.tracer.record(kind, name, start, time.time(), **attrs, **fields)
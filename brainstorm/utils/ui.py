@@ -1,6 +1,7 @@
 # ui.py
 # This file contains functions for user interface and console interaction.
 
+import os
 import sys
 from typing import Optional
 
@@ -14,13 +15,44 @@ from rich.prompt import Prompt
 console = Console()
 
 
+class StdinLines:
+    """
+    Reads lines from the stdin file descriptor one byte at a time, like input().
+
+    Nothing is read ahead and no lock is held while waiting, so a prompt left
+    waiting on a daemon thread (Ctrl-C while the graph waits for an answer)
+    does not stop the interpreter from shutting down, as a pending input()
+    on sys.stdin does.
+    """
+
+    def readline(self) -> str:
+        data = bytearray()
+        while not data.endswith(b"\n"):
+            chunk = os.read(sys.stdin.fileno(), 1)
+            if not chunk:
+                if not data:
+                    raise EOFError
+                break
+            data += chunk
+        return data.decode(sys.stdin.encoding or "utf-8", errors="replace").rstrip("\r\n")
+
+
+def _stdin_stream() -> Optional[StdinLines]:
+    try:
+        sys.stdin.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None  # Not backed by a file (e.g. replaced in tests): use input().
+    return StdinLines()
+
+
 def prompt_user_input(prompt_text: str, default: Optional[str] = None) -> str:
     """Shows the cursor and prompts the user for input using Rich."""
     sys.stdout.write("\033[?25h")  # Make cursor visible
     sys.stdout.flush()
+    stream = _stdin_stream()
     if default is not None and default != "":
-        return Prompt.ask(prompt_text, default=str(default)).strip()
-    return Prompt.ask(prompt_text).strip()
+        return Prompt.ask(prompt_text, default=str(default), stream=stream).strip()
+    return Prompt.ask(prompt_text, stream=stream).strip()
 
 
 def select_brainstorm_type() -> str:
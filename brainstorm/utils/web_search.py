@@ -0,0 +1,106 @@
+# web_search.py
+# This file contains the web search wrapper used during context generation.
+
+import asyncio
+import re
+from typing import Dict, Optional, Tuple
+
+from brainstorm.utils.cache import DiskCache
+from brainstorm.utils.rate_limit import TokenBucket, retry_with_backoff
+from brainstorm.utils.tracing import Tracer, trace_span
+from brainstorm.utils.ui import console
+
+# What DuckDuckGoSearchRun returns when nothing matched, and what LangChain tools
+# set to handle their errors return instead of raising.
+NO_RESULTS_TEXTS = ("No good DuckDuckGo Search Result was found", "Tool execution error")
+ERROR_TEXT_PATTERN = re.compile(r"^\s*(error|exception)\b", re.IGNORECASE)
+
+# Rate limiters are shared by every session in the process, keyed by (rate, burst).
+_limiters: Dict[Tuple[float, float], TokenBucket] = {}
+
+
+def normalize_query(query: str) -> str:
+    """Lower-cases a query and collapses whitespace so equivalent queries share a cache key."""
+    return " ".join(query.lower().split())
+
+
+def get_search_limiter(rate: float, burst: float) -> TokenBucket:
+    """Returns the process-wide search rate limiter for the given rate and burst size."""
+    key = (rate, burst)
+    if key not in _limiters:
+        _limiters[key] = TokenBucket(rate, burst)
+    return _limiters[key]
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return "ratelimit" in str(error).lower()
+
+
+def is_search_result(text: Optional[str]) -> bool:
+    """Whether `text` holds search results, not an empty answer, a "no results" sentinel or error text."""
+    if not text or not text.strip():
+        return False
+    return not text.strip().startswith(NO_RESULTS_TEXTS) and not ERROR_TEXT_PATTERN.match(text)
+
+
+class CachedWebSearch:
+    """A DuckDuckGo search that serves repeated queries from an on-disk cache."""
+
+    def __init__(
+        self,
+        cache: Optional[DiskCache] = None,
+        search=None,
+        limiter: Optional[TokenBucket] = None,
+        max_retries: int = 5,
+        tracer: Optional[Tracer] = None,
+    ):
+        self.cache = cache
+        if search is None:
+            # Imported here so only sessions that search pay for it.
+            from langchain_community.tools import DuckDuckGoSearchRun
+
+            search = DuckDuckGoSearchRun()
+        self.search = search
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.tracer = tracer
+
+    async def arun(self, query: str) -> str:
+        """
+        Returns search results for `query`, using the cache when possible.
+
+        The blocking search runs on a worker thread. Network calls go through
+        the rate limiter, and rate-limit errors are retried with jittered
+        exponential backoff up to `max_retries` times. Cache hits skip the
+        limiter entirely.
+        """
+        async with trace_span(self.tracer, "search", query, cache_hit=False, retries=0) as span:
+            key = normalize_query(query)
+            if self.cache is not None:
+                cached = await asyncio.to_thread(self.cache.get, key)
+                # Entries cached before non-results were filtered are searched again.
+                if is_search_result(cached):
+                    span.update(cache_hit=True, output_chars=len(cached))
+                    return cached
+
+            async def fetch() -> str:
+                if self.limiter is not None:
+                    await self.limiter.acquire()
+                return await asyncio.to_thread(self.search.run, query)
+
+            def on_retry(error: Exception, attempt: int, delay: float) -> None:
+                span["retries"] = attempt
+                console.print(
+                    f"⚠️ Rate limit reached for '{query}'. Retry {attempt}/{self.max_retries} in {delay:.1f}s...",
+                    style="yellow",
+                )
+
+            results = await retry_with_backoff(
+                fetch, is_rate_limit_error, max_retries=self.max_retries, on_retry=on_retry
+            )
+            span["output_chars"] = len(results or "")
+            # Only real results are cached, so a transient failure or an empty
+            # answer is searched again next time.
+            if is_search_result(results) and self.cache is not None:
+                await asyncio.to_thread(self.cache.set, key, results)
+            return results
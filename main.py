@@ -4,104 +4,685 @@
 import os
 import asyncio
 import sys
-from typing import Optional
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langgraph.checkpoint.memory import InMemorySaver
-from langgraph.types import Command
-from brainstorm.agents.workflow import build_graph
-from brainstorm.agents.state import GraphState
+import typer
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+from brainstorm.agents.runtime import DEFAULT_PROMPT_BUDGETS, LLM_NODES
 from brainstorm.utils.ui import (
     prompt_user_input,
     select_brainstorm_type,
     console,
 )
-import typer
-from rich.panel import Panel
-from brainstorm.utils.file_utils import (
-    generate_markdown_export,
-    save_markdown_file,
+from brainstorm.utils.pdf_utils import PDF_BACKENDS, parse_page_ranges
+from brainstorm.utils.llm_providers import (
+    API_KEY_ENV_VARS,
+    DEFAULT_MODELS,
+    PROVIDER_NAMES,
+    PROVIDERS,
+    close_http_clients,
+    create_chat_model,
 )
 
+# LangChain, LangGraph and the model provider take seconds to import, so they
+# are imported by the functions that start a session. `--help` and invalid
+# arguments return without loading them (see benchmarks/bench_startup.py).
+if TYPE_CHECKING:
+    from brainstorm.agents.batch import BatchItem
+    from brainstorm.utils.llm_governor import GovernedChatModel
+    from brainstorm.utils.tracing import Tracer
 
-async def main_async(api_key: str, topic: str, brainstorm_type: str):
-    """Main async function that runs the graph-based workflow."""
-    console.print(Panel.fit("🚀 Welcome to the AI Brainstorming Agent!", style="bold green"))
 
-    # 1. --- Initial Setup ---
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash", google_api_key=api_key, temperature=0.7
+def create_llm(api_key: str, settings: Optional[Dict[str, Any]] = None) -> "GovernedChatModel":
+    """
+    Returns the configured provider's chat model, scheduled by the
+    process-wide LLM governor and, unless caching is off, answered from the
+    on-disk response cache.
+    """
+    from brainstorm.utils.llm_cache import configure_llm_cache
+    from brainstorm.utils.llm_governor import GovernedChatModel, get_llm_governor
+
+    settings = settings or {}
+    if settings.get("cache_enabled", True):
+        configure_llm_cache(
+            directory=settings.get("cache_dir"),
+            max_entries=settings.get("llm_cache_max_entries", 10_000),
+            max_age=settings.get("llm_cache_max_age"),
+        )
+    governor = get_llm_governor(
+        max_in_flight=settings.get("llm_max_in_flight", 8),
+        rpm=settings.get("llm_rpm", 60.0),
+        tpm=settings.get("llm_tpm", 1_000_000.0),
     )
+    llm = create_chat_model(
+        settings.get("llm_provider", "gemini"),
+        api_key,
+        model=settings.get("llm_model"),
+        base_url=settings.get("llm_base_url"),
+        max_connections=settings.get("llm_max_in_flight", 8),
+    )
+    return GovernedChatModel(model=llm, governor=governor)
 
-    # 2. --- Build and Compile the Graph ---
-    checkpointer = InMemorySaver()
-    app = build_graph(checkpointer)
-    # print(app.get_graph().draw_mermaid())
 
-    # 3. --- Run the Graph Stream ---
-    initial_state: GraphState = {
-        "api_key": api_key,
-        "llm": llm,
-        "topic": topic,
-        "brainstorm_type": brainstorm_type,
-        "pdf_text": None,
-        "combined_context": "",
-        "personas": [],
-        "all_generated_ideas": [],
-        "critiques": [],
-        "filtered_ideas": [],
-        "evaluation_markdown": "",
-        "top_ideas": [],
-        "chosen_idea": None,
-        "final_plan_text": "",
-        "arxiv_context": "No relevant papers found on ArXiv for this topic.",
-        "use_arxiv_search": True,
-        "user_plan_feedback": "",
-    }
+async def stream_graph(app, graph_input: Any, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs the graph until it finishes or is interrupted, consuming its event stream.
+
+    Nodes print as they go (the long ones token by token), so nothing waits
+    for the whole run. Returns the latest state with any pending interrupts
+    under "__interrupt__", as `ainvoke` would.
+    """
+    result: Dict[str, Any] = {}
+    interrupts = []
+    async for mode, chunk in app.astream(
+        graph_input, config=config, stream_mode=["values", "updates"]
+    ):
+        if mode == "values":
+            result = chunk
+        elif "__interrupt__" in chunk:
+            interrupts.extend(chunk["__interrupt__"])
+    if interrupts:
+        result = {**result, "__interrupt__": interrupts}
+    return result
+
+
+async def ask_in_thread(answer: Callable[[Any], str], payload: Any) -> str:
+    """
+    Returns `answer(payload)`, run on a daemon thread so background work keeps
+    running while the user reads the prompt.
+
+    Unlike asyncio.to_thread, a cancelled wait (Ctrl-C at a prompt) leaves the
+    thread blocked on input behind: neither the event loop's shutdown nor
+    the interpreter's exit waits for it (prompt_user_input reads stdin
+    without holding a lock, so the thread does not block the exit either).
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(value: Any = None, error: Optional[BaseException] = None) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
 
-    config = {
-        "configurable": {"thread_id": "brainstorm-thread-v2"}
-    }  # Using a new thread ID
+    def run() -> None:
+        try:
+            value, error = answer(payload), None
+        except BaseException as e:
+            value, error = None, e
+        try:
+            loop.call_soon_threadsafe(settle, value, error)
+        except RuntimeError:
+            pass  # The loop is closed: nobody is waiting for this answer.
+
+    threading.Thread(target=run, name="interrupt-prompt", daemon=True).start()
+    return await future
+
+
+async def drive_session(
+    app,
+    checkpointer,
+    config: Dict[str, Any],
+    result: Dict[str, Any],
+    answer: Callable[[Dict[str, Any]], str],
+    keep_checkpoints: int,
+) -> Dict[str, Any]:
+    """
+    Answers the graph's interrupts with `answer` until the session stops asking.
+
+    `result` is the output of the latest graph step. After every step the
+    session is marked active and its checkpoint history is compacted.
+    """
+    from langgraph.types import Command
+
+    from brainstorm.agents.checkpoints import compact_thread, touch_session
+    from brainstorm.agents.speculation import cancel_speculations
+
+    thread_id = config["configurable"]["thread_id"]
     try:
-        result = await app.ainvoke(input=initial_state, config=config)
         while "__interrupt__" in result:
-            user_instruction = result["__interrupt__"][0].value["message"]
-            value = prompt_user_input(user_instruction)
-            result = await app.ainvoke(Command(resume=value), config=config)
-    except Exception as e:
-        console.print(f"\nAn error occurred during graph execution: {e}", style="red")
-
-    # 4. --- Save Results ---
-    if "final_plan_text" in result:
-        console.print("\n✅ Graph execution complete.", style="bold green")
-        if result.get("final_plan_text"):
-            console.print("\n--- Session Complete ---", style="bold cyan")
-            save_choice = prompt_user_input(
-                "Would you like to save the full session to a Markdown file? (Y/n): "
-            ).lower()
-            if save_choice in ["y", "yes", ""]:
-                markdown_content = generate_markdown_export(result)
-                default_filename = (
-                    f"brainstorm_{result['topic'].replace(' ', '_').lower()}.md"
+            await touch_session(checkpointer, thread_id)
+            await compact_thread(checkpointer, thread_id, keep_checkpoints)
+            # Nodes may have started background work that overlaps this wait.
+            value = await ask_in_thread(answer, result["__interrupt__"][0].value)
+            result = await stream_graph(app, Command(resume=value), config)
+    finally:
+        cancel_speculations(thread_id)
+    await touch_session(checkpointer, thread_id)
+    await compact_thread(checkpointer, thread_id, keep_checkpoints)
+    return result
+
+
+def print_cache_stats(llm: Optional["GovernedChatModel"] = None, out: Console = console):
+    from brainstorm.utils.llm_cache import get_response_cache
+
+    llm_cache = get_response_cache()
+    if llm_cache:
+        out.print(
+            f"\n📦 LLM cache: {llm_cache.hits} hits, {llm_cache.misses} misses.",
+            style="dim",
+        )
+    if llm and llm.governor.quota_errors:
+        stats = llm.governor.stats()
+        out.print(
+            f"🚦 LLM quota: {stats['quota_errors']} rate limit errors retried over "
+            f"{stats['requests']} requests (in-flight limit now {stats['in_flight_limit']}).",
+            style="dim",
+        )
+
+
+def session_config(
+    thread_id: str, llm, settings: Optional[Dict[str, Any]], tracer: Optional["Tracer"]
+) -> Dict[str, Any]:
+    """
+    Returns the runtime config of a session. The model, its credentials and
+    the tracer travel here rather than in the checkpointed state.
+    """
+    config = {"configurable": {"thread_id": thread_id, "llm": llm, "tracer": tracer, **(settings or {})}}
+    if tracer:
+        config["callbacks"] = [tracer.callback]
+    return config
+
+
+def print_trace_summary(tracer: Optional["Tracer"], out: Console = console):
+    """Prints where the traced time went, the slowest spans first."""
+    if not tracer:
+        return
+    table = Table(title=f"Trace summary ({tracer.path})")
+    table.add_column("Kind")
+    table.add_column("Name")
+    for column in ("Calls", "Total (s)", "Mean (ms)", "In tokens", "Out tokens", "Cache hits", "Retries"):
+        table.add_column(column, justify="right")
+    for row in tracer.summary():
+        table.add_row(
+            row["kind"],
+            row["name"],
+            str(row["count"]),
+            f"{row['duration_ms'] / 1000:.2f}",
+            f"{row['duration_ms'] / row['count']:.0f}",
+            str(row["input_tokens"]),
+            str(row["output_tokens"]),
+            str(row["cache_hit"]),
+            str(row["retries"]),
+        )
+    out.print(table)
+
+
+async def main_async(
+    api_key: str,
+    topic: Optional[str],
+    brainstorm_type: Optional[str],
+    settings: Optional[Dict[str, Any]] = None,
+    resume_thread_id: Optional[str] = None,
+    checkpoint_path: Optional[Path] = None,
+    keep_checkpoints: int = 10,
+    session_retention_days: float = 30.0,
+    trace_path: Optional[Path] = None,
+):
+    """
+    Main async function that runs the graph-based workflow.
+
+    `settings` are passed to the nodes through config["configurable"]. When
+    `resume_thread_id` is given, the saved session continues from its last
+    completed node instead of starting a new one. With `trace_path`, spans
+    are appended to that JSONL file and summarized at the end.
+    """
+    from brainstorm.agents.checkpoints import (
+        new_thread_id,
+        open_checkpointer,
+        prune_sessions,
+        touch_session,
+    )
+    from brainstorm.agents.state import initial_state
+    from brainstorm.agents.workflow import build_graph
+    from brainstorm.utils.blob_store import BlobStore
+    from brainstorm.utils.file_utils import generate_markdown_export, save_markdown_file
+    from brainstorm.utils.tracing import Tracer
+
+    console.print(Panel.fit("🚀 Welcome to the AI Brainstorming Agent!", style="bold green"))
+
+    # 1. --- Initial Setup ---
+    llm = create_llm(api_key, settings)
+    tracer = Tracer(trace_path) if trace_path else None
+
+    # Every exit, including an unknown --resume id, releases the pooled
+    # connections and closes the trace.
+    try:
+        # 2. --- Build and Compile the Graph ---
+        async with open_checkpointer(checkpoint_path) as checkpointer:
+            pruned = await prune_sessions(checkpointer, session_retention_days)
+            blob_store = BlobStore((settings or {}).get("blob_dir"))
+            blob_store.prune(session_retention_days)
+            if pruned:
+                console.print(
+                    f"🧹 Removed {pruned} sessions older than {session_retention_days:g} days.",
+                    style="dim",
                 )
-                filename = (
-                    prompt_user_input(f"Enter filename (default: {default_filename}): ")
-                    or default_filename
+            app = build_graph(checkpointer)
+            # print(app.get_graph().draw_mermaid())
+
+            thread_id = resume_thread_id or new_thread_id(topic)
+            config = session_config(thread_id, llm, settings, tracer)
+            result = {}
+
+            # 3. --- Run the Graph Stream ---
+            try:
+                if resume_thread_id:
+                    snapshot = await app.aget_state(config)
+                    if not snapshot.values:
+                        console.print(f"No saved session found with id '{thread_id}'.", style="red")
+                        return
+                    console.print(
+                        f"🔁 Resuming session '{thread_id}' ({snapshot.values.get('topic')}).",
+                        style="bold",
+                    )
+                    pending = [i for task in snapshot.tasks for i in task.interrupts]
+                    if pending:
+                        result = {**snapshot.values, "__interrupt__": pending}
+                    elif snapshot.next:
+                        result = await stream_graph(app, None, config)
+                    else:
+                        result = snapshot.values
+                else:
+                    console.print(
+                        f"🧵 Session id: {thread_id} (continue later with --resume {thread_id})",
+                        style="dim",
+                    )
+                    await touch_session(checkpointer, thread_id, topic)
+                    result = await stream_graph(
+                        app, initial_state(topic, brainstorm_type), config
+                    )
+
+                result = await drive_session(
+                    app,
+                    checkpointer,
+                    config,
+                    result,
+                    lambda payload: prompt_user_input(payload["message"]),
+                    keep_checkpoints,
                 )
-                save_markdown_file(filename, markdown_content)
+            except Exception as e:
+                console.print(f"\nAn error occurred during graph execution: {e}", style="red")
+                console.print(f"Resume from the last completed step with --resume {thread_id}", style="yellow")
+
+        # 4. --- Save Results ---
+        if "final_plan_ref" in result:
+            console.print("\n✅ Graph execution complete.", style="bold green")
+            if result.get("final_plan_ref"):
+                console.print("\n--- Session Complete ---", style="bold cyan")
+                save_choice = prompt_user_input(
+                    "Would you like to save the full session to a Markdown file? (Y/n): "
+                ).lower()
+                if save_choice in ["y", "yes", ""]:
+                    markdown_content = generate_markdown_export(result, blob_store)
+                    default_filename = (
+                        f"brainstorm_{result['topic'].replace(' ', '_').lower()}.md"
+                    )
+                    filename = (
+                        prompt_user_input(f"Enter filename (default: {default_filename}): ")
+                        or default_filename
+                    )
+                    save_markdown_file(filename, markdown_content)
+                else:
+                    console.print("Session not saved.", style="yellow")
             else:
-                console.print("Session not saved.", style="yellow")
+                console.print("\nWorkflow completed, but no final plan was generated to save.", style="yellow")
         else:
-            console.print("\nWorkflow completed, but no final plan was generated to save.", style="yellow")
-    else:
-        console.print("\nWorkflow did not complete successfully or was exited early.", style="red")
+            console.print("\nWorkflow did not complete successfully or was exited early.", style="red")
+
+    finally:
+        await close_http_clients()
+        print_cache_stats(llm)
+        if tracer:
+            print_trace_summary(tracer)
+            tracer.close()
+
+
+async def batch_async(
+    api_key: str,
+    items: List["BatchItem"],
+    output_dir: Path,
+    workers: int,
+    settings: Optional[Dict[str, Any]] = None,
+    checkpoint_path: Optional[Path] = None,
+    keep_checkpoints: int = 10,
+    progress: Optional[Console] = None,
+    trace_path: Optional[Path] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Runs many sessions headlessly, at most `workers` at a time.
+
+    Each session's interrupts are answered by its policy, and every session
+    that produces a plan is exported to `output_dir`. Returns one status
+    record per item, in input order.
+    """
+    from brainstorm.agents.batch import answer_interrupt
+    from brainstorm.agents.checkpoints import new_thread_id, open_checkpointer, touch_session
+    from brainstorm.agents.state import initial_state
+    from brainstorm.agents.workflow import build_graph
+    from brainstorm.utils.blob_store import BlobStore
+    from brainstorm.utils.file_utils import generate_markdown_export, save_markdown_file
+    from brainstorm.utils.tracing import Tracer
+
+    progress = progress or console
+    llm = create_llm(api_key, settings)
+    tracer = Tracer(trace_path) if trace_path else None
+    blob_store = BlobStore((settings or {}).get("blob_dir"))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    semaphore = asyncio.Semaphore(workers)
+
+    try:
+        async with open_checkpointer(checkpoint_path) as checkpointer:
+            app = build_graph(checkpointer)
+
+            async def run_item(index: int, item: "BatchItem") -> Dict[str, Any]:
+                async with semaphore:
+                    thread_id = new_thread_id(item.topic)
+                    config = session_config(thread_id, llm, settings, tracer)
+                    record = {"topic": item.topic, "thread_id": thread_id, "file": None}
+                    try:
+                        await touch_session(checkpointer, thread_id, item.topic)
+                        result = await stream_graph(
+                            app, initial_state(item.topic, item.type), config
+                        )
+                        result = await drive_session(
+                            app,
+                            checkpointer,
+                            config,
+                            result,
+                            lambda payload: answer_interrupt(item.policy, payload),
+                            keep_checkpoints,
+                        )
+                        if result.get("final_plan_ref"):
+                            filename = output_dir / f"brainstorm_{thread_id}.md"
+                            save_markdown_file(
+                                str(filename), generate_markdown_export(result, blob_store)
+                            )
+                            record.update(status="done", file=str(filename))
+                        else:
+                            record.update(status="no plan")
+                    except Exception as e:
+                        record.update(status=f"failed: {e}")
+                    progress.print(
+                        f"[{index + 1}/{len(items)}] {item.topic}: {record['status']}",
+                        style="green" if record["status"] == "done" else "red",
+                    )
+                    return record
+
+            records = await asyncio.gather(*(run_item(i, item) for i, item in enumerate(items)))
+    finally:
+        await close_http_clients()
+        print_cache_stats(llm, progress)
+        if tracer:
+            print_trace_summary(tracer, progress)
+            tracer.close()
+    return records
 
 
 app = typer.Typer(add_completion=False)
 
 
+def resolve_api_key(api_key: Optional[str], provider: str, base_url: Optional[str] = None) -> str:
+    """
+    Returns the provider's API key from the option or environment, prompting
+    if necessary. OpenAI-compatible endpoints at a custom URL (such as local
+    servers) may run without one.
+    """
+    resolved_api_key = api_key or os.environ.get(API_KEY_ENV_VARS[provider])
+    if not resolved_api_key and provider == "openai" and base_url:
+        return ""
+    name = PROVIDER_NAMES[provider]
+    if not resolved_api_key:
+        resolved_api_key = prompt_user_input(f"Please enter your {name} API Key: ")
+    if not resolved_api_key:
+        console.print(f"A {name} API Key is required. Exiting.", style="red")
+        raise typer.Exit(code=1)
+    return resolved_api_key
+
+
+@app.callback(invoke_without_command=True)
+def main(
+    ctx: typer.Context,
+    topic: Optional[str] = typer.Option(None, "--topic", "-q", help="Topic to brainstorm"),
+    brainstorm_type: Optional[str] = typer.Option(
+        None,
+        "--type",
+        "-t",
+        help="Type of brainstorming session (project or research_paper)",
+        case_sensitive=False,
+    ),
+    provider: str = typer.Option(
+        "gemini",
+        "--provider",
+        help=f"Chat model provider ({' or '.join(PROVIDERS)}; openai covers any OpenAI-compatible endpoint)",
+        case_sensitive=False,
+    ),
+    model: Optional[str] = typer.Option(
+        None,
+        "--model",
+        help="Model name (default: "
+        + ", ".join(f"{model} for {provider}" for provider, model in DEFAULT_MODELS.items())
+        + ")",
+    ),
+    base_url: Optional[str] = typer.Option(
+        None,
+        "--base-url",
+        help="Endpoint to call instead of the provider's, e.g. a gateway or http://localhost:8000/v1",
+    ),
+    api_key: Optional[str] = typer.Option(
+        None,
+        "--api-key",
+        help="API key for the provider (or set GOOGLE_API_KEY / OPENAI_API_KEY)",
+    ),
+    cache: bool = typer.Option(
+        True,
+        "--cache/--no-cache",
+        help="Reuse LLM responses, web search and ArXiv results from the on-disk cache",
+    ),
+    cache_dir: Optional[Path] = typer.Option(
+        None, "--cache-dir", help="Directory for cached data (default: ~/.cache/agent-brainstorm)"
+    ),
+    cache_max_entries: int = typer.Option(
+        10_000, "--cache-max-entries", help="Maximum number of cached LLM responses"
+    ),
+    cache_max_age_days: float = typer.Option(
+        30.0, "--cache-max-age-days", help="Discard cached LLM responses older than this"
+    ),
+    search_cache_ttl_hours: float = typer.Option(
+        168.0, "--search-cache-ttl-hours", help="Discard cached web search results older than this"
+    ),
+    search_cache_max_entries: int = typer.Option(
+        2_000, "--search-cache-max-entries", help="Maximum number of cached web search results"
+    ),
+    arxiv_cache_ttl_hours: float = typer.Option(
+        168.0, "--arxiv-cache-ttl-hours", help="Discard cached ArXiv results older than this"
+    ),
+    search_rate: float = typer.Option(
+        1.0, "--search-rate", help="Maximum web searches per second, shared by all sessions"
+    ),
+    search_deadline: float = typer.Option(
+        60.0, "--search-deadline", help="Seconds allowed for all web searches of a session"
+    ),
+    pdf_backend: str = typer.Option(
+        "pypdf",
+        "--pdf-backend",
+        help=f"Library used to extract PDF text ({' or '.join(PDF_BACKENDS)})",
+        case_sensitive=False,
+    ),
+    pdf_pages: Optional[str] = typer.Option(
+        None, "--pdf-pages", help="Only read these PDF pages, e.g. '1-20,25' (default: all)"
+    ),
+    summary_chunk_tokens: int = typer.Option(
+        8_000,
+        "--summary-chunk-tokens",
+        help="Summarize documents longer than this many tokens in concurrent chunks",
+    ),
+    speculative_critique: bool = typer.Option(
+        True,
+        "--speculative-critique/--no-speculative-critique",
+        help="Critique the shortlist in the background while you filter it",
+    ),
+    dedup_threshold: float = typer.Option(
+        0.6,
+        "--dedup-threshold",
+        min=0.0,
+        max=1.0,
+        help="Merge generated ideas at least this similar before the discussion (0 disables)",
+    ),
+    critique_shard_size: int = typer.Option(
+        4, "--critique-shard-size", min=1, help="Ideas per Red Team call; shards are critiqued concurrently"
+    ),
+    native_json: bool = typer.Option(
+        True,
+        "--native-json/--no-native-json",
+        help="Ask the provider for schema-constrained JSON; turn off for endpoints without JSON mode",
+    ),
+    json_retries: int = typer.Option(
+        1,
+        "--json-retries",
+        min=0,
+        help="Requests repeated when a JSON response cannot be repaired locally",
+    ),
+    speculative_plans: int = typer.Option(
+        0,
+        "--speculative-plans",
+        min=0,
+        help="Start planning this many top ideas while you choose (0 disables; costs extra LLM calls)",
+    ),
+    max_speculative_plans: int = typer.Option(
+        6, "--max-speculative-plans", min=0, help="Most plans generated speculatively per session"
+    ),
+    llm_max_in_flight: int = typer.Option(
+        8, "--llm-max-in-flight", min=1, help="Maximum concurrent LLM requests across all sessions"
+    ),
+    llm_rpm: float = typer.Option(
+        60.0, "--llm-rpm", help="LLM requests per minute allowed by your quota"
+    ),
+    llm_tpm: float = typer.Option(
+        1_000_000.0, "--llm-tpm", help="LLM tokens per minute allowed by your quota"
+    ),
+    checkpoint_db: Optional[Path] = typer.Option(
+        None,
+        "--checkpoint-db",
+        help="SQLite file for session checkpoints (default: ~/.cache/agent-brainstorm/checkpoints.sqlite)",
+    ),
+    keep_checkpoints: int = typer.Option(
+        10, "--keep-checkpoints", help="Checkpoints kept per session; older history is compacted away"
+    ),
+    session_retention_days: float = typer.Option(
+        30.0, "--session-retention-days", help="Delete saved sessions inactive for longer than this"
+    ),
+    trace: Optional[Path] = typer.Option(
+        None,
+        "--trace",
+        dir_okay=False,
+        help="Append a JSON line per node, LLM, search and ArXiv call to this file and print a timing summary",
+    ),
+    uncached_nodes: List[str] = typer.Option(
+        [],
+        "--no-cache-node",
+        help=f"Always call the LLM for this node (repeatable). One of: {', '.join(LLM_NODES)}",
+    ),
+    prompt_budgets: List[str] = typer.Option(
+        [],
+        "--prompt-budget",
+        help="NODE=TOKENS: trim the node's context and idea lists to fit prompts of this size "
+        "(repeatable; 0 disables). Defaults: "
+        + ", ".join(f"{node}={tokens}" for node, tokens in DEFAULT_PROMPT_BUDGETS.items()),
+    ),
+):
+    """
+    AI Brainstorming Agent. Shared options go before the command; without a
+    command an interactive session is started, as with `run`.
+    """
+    unknown_nodes = set(uncached_nodes) - set(LLM_NODES)
+    if unknown_nodes:
+        console.print(
+            f"Unknown node(s) for --no-cache-node: {', '.join(sorted(unknown_nodes))}",
+            style="red",
+        )
+        raise typer.Exit(code=1)
+    budgets = {}
+    for item in prompt_budgets:
+        node, _, tokens = item.partition("=")
+        if node not in DEFAULT_PROMPT_BUDGETS or not tokens.isdigit():
+            console.print(
+                f"Invalid --prompt-budget '{item}'. Use NODE=TOKENS with NODE one of: "
+                f"{', '.join(DEFAULT_PROMPT_BUDGETS)}.",
+                style="red",
+            )
+            raise typer.Exit(code=1)
+        budgets[node] = int(tokens)
+    provider = provider.lower()
+    if provider not in PROVIDERS:
+        console.print(f"Invalid provider. Choose one of: {', '.join(PROVIDERS)}.", style="red")
+        raise typer.Exit(code=1)
+    pdf_backend = pdf_backend.lower()
+    if pdf_backend not in PDF_BACKENDS:
+        console.print(f"Invalid PDF backend. Choose one of: {', '.join(PDF_BACKENDS)}.", style="red")
+        raise typer.Exit(code=1)
+    if pdf_pages:
+        try:
+            parse_page_ranges(pdf_pages)
+        except ValueError as e:
+            console.print(f"Invalid --pdf-pages value: {e}", style="red")
+            raise typer.Exit(code=1)
+
+    ctx.obj = {
+        "topic": topic,
+        "brainstorm_type": brainstorm_type,
+        "api_key": api_key,
+        "provider": provider,
+        "base_url": base_url,
+        "checkpoint_db": checkpoint_db,
+        "keep_checkpoints": keep_checkpoints,
+        "session_retention_days": session_retention_days,
+        "trace": trace,
+        "settings": {
+            "cache_enabled": cache,
+            "cache_dir": cache_dir,
+            "llm_cache_max_entries": cache_max_entries,
+            "llm_cache_max_age": cache_max_age_days * 24 * 3600,
+            "blob_dir": cache_dir / "blobs" if cache_dir else None,
+            "uncached_nodes": tuple(uncached_nodes),
+            "prompt_budgets": budgets,
+            "search_cache_ttl": search_cache_ttl_hours * 3600,
+            "search_cache_max_entries": search_cache_max_entries,
+            "arxiv_cache_ttl": arxiv_cache_ttl_hours * 3600,
+            "arxiv_cache_max_entries": 1_000,
+            "search_rate": search_rate,
+            "search_deadline": search_deadline,
+            "pdf_backend": pdf_backend,
+            "pdf_pages": pdf_pages,
+            "summary_chunk_tokens": summary_chunk_tokens,
+            "speculative_critique": speculative_critique,
+            "dedup_threshold": dedup_threshold,
+            "critique_shard_size": critique_shard_size,
+            "native_json": native_json,
+            "json_retries": json_retries,
+            "speculative_plans": speculative_plans,
+            "max_speculative_plans": max_speculative_plans,
+            "llm_max_in_flight": llm_max_in_flight,
+            "llm_rpm": llm_rpm,
+            "llm_tpm": llm_tpm,
+            "llm_provider": provider,
+            "llm_model": model,
+            "llm_base_url": base_url,
+        },
+    }
+    if ctx.invoked_subcommand is None:
+        ctx.invoke(run, ctx=ctx, topic=None, brainstorm_type=None, resume=None, api_key=None)
+
+
 @app.command()
 def run(
+    ctx: typer.Context,
     topic: Optional[str] = typer.Option(None, "--topic", "-q", help="Topic to brainstorm"),
     brainstorm_type: Optional[str] = typer.Option(
         None,
@@ -110,38 +691,56 @@ def run(
         help="Type of brainstorming session (project or research_paper)",
         case_sensitive=False,
     ),
+    resume: Optional[str] = typer.Option(
+        None, "--resume", help="Continue a saved session from its last completed step"
+    ),
     api_key: Optional[str] = typer.Option(
         None,
         "--api-key",
-        envvar="GOOGLE_API_KEY",
-        help="Google API Key (or set GOOGLE_API_KEY env var)",
+        help="API key for the provider (same as the shared option; or set GOOGLE_API_KEY / OPENAI_API_KEY)",
     ),
 ):
     """Run the AI Brainstorming Agent."""
+    options = ctx.obj
+    # The session options may also be given before the command, as before it existed.
+    topic = topic or options["topic"]
+    brainstorm_type = brainstorm_type or options["brainstorm_type"]
     try:
         # Resolve API key
-        resolved_api_key = api_key or os.environ.get("GOOGLE_API_KEY")
-        if not resolved_api_key:
-            resolved_api_key = prompt_user_input("Please enter your Google API Key: ")
-        if not resolved_api_key:
-            console.print("A Google API Key is required. Exiting.", style="red")
-            raise typer.Exit(code=1)
-
-        # Resolve brainstorm type
-        resolved_type = (
-            brainstorm_type.lower() if brainstorm_type else select_brainstorm_type()
+        resolved_api_key = resolve_api_key(
+            api_key or options["api_key"], options["provider"], options["base_url"]
         )
-        if resolved_type not in {"project", "research_paper"}:
-            console.print("Invalid type. Choose 'project' or 'research_paper'.", style="red")
-            raise typer.Exit(code=1)
 
-        # Resolve topic
-        resolved_topic = topic or prompt_user_input("Enter a topic to brainstorm: ")
-        if not resolved_topic:
-            console.print("A topic is required. Exiting.", style="red")
-            raise typer.Exit(code=1)
+        # A resumed session already knows its type and topic
+        resolved_type = resolved_topic = None
+        if not resume:
+            # Resolve brainstorm type
+            resolved_type = (
+                brainstorm_type.lower() if brainstorm_type else select_brainstorm_type()
+            )
+            if resolved_type not in {"project", "research_paper"}:
+                console.print("Invalid type. Choose 'project' or 'research_paper'.", style="red")
+                raise typer.Exit(code=1)
 
-        asyncio.run(main_async(resolved_api_key, resolved_topic, resolved_type))
+            # Resolve topic
+            resolved_topic = topic or prompt_user_input("Enter a topic to brainstorm: ")
+            if not resolved_topic:
+                console.print("A topic is required. Exiting.", style="red")
+                raise typer.Exit(code=1)
+
+        asyncio.run(
+            main_async(
+                resolved_api_key,
+                resolved_topic,
+                resolved_type,
+                options["settings"],
+                resume_thread_id=resume,
+                checkpoint_path=options["checkpoint_db"],
+                keep_checkpoints=options["keep_checkpoints"],
+                session_retention_days=options["session_retention_days"],
+                trace_path=options["trace"],
+            )
+        )
     except KeyboardInterrupt:
         console.print("\nProcess interrupted by user. Exiting.", style="yellow")
     finally:
@@ -150,5 +749,79 @@ def run(
         sys.stdout.flush()
 
 
+@app.command()
+def batch(
+    ctx: typer.Context,
+    input_file: Path = typer.Argument(
+        ...,
+        exists=True,
+        dir_okay=False,
+        help='JSONL file with one session per line: {"topic": ..., "type": ..., "policy": {...}}',
+    ),
+    output_dir: Path = typer.Option(
+        Path("brainstorm_exports"), "--output-dir", "-o", help="Directory for the Markdown exports"
+    ),
+    workers: int = typer.Option(4, "--workers", "-w", min=1, help="Sessions to run concurrently"),
+    verbose: bool = typer.Option(
+        False, "--verbose", help="Show every node's output (interleaved across sessions)"
+    ),
+):
+    """
+    Brainstorm many topics without prompting.
+
+    A line's policy answers the interactive questions: "pdf_path" (null skips
+    the PDF), "remove_ideas" (1-based numbers, empty keeps all), "select_idea"
+    (1 plans the top-ranked idea) and "arxiv_search" (true/false). Plans are
+    always approved.
+    """
+    from brainstorm.agents.batch import load_batch_file
+
+    options = ctx.obj
+    try:
+        items = load_batch_file(input_file)
+    except ValueError as e:
+        console.print(f"Invalid batch file: {e}", style="red")
+        raise typer.Exit(code=1)
+    if not items:
+        console.print("The batch file contains no topics.", style="yellow")
+        raise typer.Exit()
+
+    resolved_api_key = resolve_api_key(options["api_key"], options["provider"], options["base_url"])
+    # Node output from concurrent sessions would interleave, so only progress
+    # lines are shown unless asked otherwise.
+    progress = Console()
+    console.quiet = not verbose
+    try:
+        records = asyncio.run(
+            batch_async(
+                resolved_api_key,
+                items,
+                output_dir,
+                workers,
+                options["settings"],
+                checkpoint_path=options["checkpoint_db"],
+                keep_checkpoints=options["keep_checkpoints"],
+                progress=progress,
+                trace_path=options["trace"],
+            )
+        )
+    except KeyboardInterrupt:
+        progress.print("\nBatch interrupted by user. Exiting.", style="yellow")
+        raise typer.Exit(code=130)
+    finally:
+        console.quiet = False
+
+    table = Table(title="Batch Summary")
+    table.add_column("Topic")
+    table.add_column("Session")
+    table.add_column("Status")
+    table.add_column("Export")
+    for record in records:
+        table.add_row(record["topic"], record["thread_id"], record["status"], record["file"] or "-")
+    progress.print(table)
+    if any(record["status"] != "done" for record in records):
+        raise typer.Exit(code=1)
+
+
 if __name__ == "__main__":
     app()
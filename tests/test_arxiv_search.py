@@ -0,0 +1,37 @@
+# test_arxiv_search.py
+# This file contains the tests for the cached ArXiv lookup.
+
+import asyncio
+
+import arxiv
+import pytest
+from langchain_community.utilities.arxiv import ArxivAPIWrapper
+
+from brainstorm.utils.arxiv_search import search_arxiv
+from brainstorm.utils.cache import DiskCache
+
+
+def test_arxiv_errors_are_raised_and_not_cached(tmp_path, monkeypatch):
+    def unavailable(self, query):
+        raise arxiv.HTTPError("http://export.arxiv.org/api/query", 0, 503)
+
+    monkeypatch.setattr(ArxivAPIWrapper, "_fetch_results", unavailable)
+    cache = DiskCache("arxiv", tmp_path)
+
+    with pytest.raises(RuntimeError, match="503"):
+        asyncio.run(search_arxiv("graph neural networks", cache=cache, max_docs=8))
+    assert cache.get("8:graph neural networks") is None
+
+
+def test_cached_error_records_are_searched_again(tmp_path):
+    cache = DiskCache("arxiv", tmp_path)
+    error = {"title": None, "published": None, "summary": "Arxiv exception: HTTP 503"}
+    cache.set("8:graph neural networks", [error])
+    paper = {"title": "GNNs", "published": "2025-01-01", "summary": "A survey."}
+
+    papers = asyncio.run(
+        search_arxiv("graph neural networks", cache=cache, max_docs=8, fetch=lambda query, n: [paper])
+    )
+
+    assert papers == [paper]
+    assert cache.get("8:graph neural networks") == [paper]
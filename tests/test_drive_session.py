@@ -0,0 +1,45 @@
+# test_drive_session.py
+# This file contains the tests for answering the graph's interrupts.
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from brainstorm.agents.checkpoints import open_checkpointer
+from main import drive_session
+
+
+def test_cancelled_session_does_not_wait_for_the_prompt(tmp_path):
+    release = threading.Event()
+
+    def answer(payload):
+        # Stands in for input(): blocked until the user presses Enter.
+        release.wait(10)
+        return ""
+
+    async def session():
+        async with open_checkpointer(tmp_path / "checkpoints.sqlite") as saver:
+            task = asyncio.create_task(
+                drive_session(
+                    None,
+                    saver,
+                    {"configurable": {"thread_id": "cancelled"}},
+                    {"__interrupt__": [SimpleNamespace(value={"message": "PDF path: "})]},
+                    answer,
+                    keep_checkpoints=3,
+                )
+            )
+            await asyncio.sleep(0.2)
+            task.cancel()  # What Ctrl-C does to the session under asyncio.run.
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    start = time.monotonic()
+    try:
+        asyncio.run(session())
+        assert time.monotonic() - start < 5
+    finally:
+        release.set()
@@ -0,0 +1,29 @@
+# test_structured_output.py
+# This file contains the tests for parsing and repairing JSON responses.
+
+from brainstorm.agents.schemas import TopIdeasList
+from brainstorm.utils.structured_output import parse_response
+
+
+def test_top_ideas_without_idea_ids_are_kept():
+    response = (
+        "Here are the top ideas:\n```json\n"
+        '[{"title": "Soil sensors", "description": "Cheap probes."},'
+        ' {"title": "Leaf scanner", "description": "Spots disease."}]\n```'
+    )
+
+    ideas = parse_response(response, TopIdeasList).ideas
+
+    assert [idea.title for idea in ideas] == ["Soil sensors", "Leaf scanner"]
+    assert [idea.idea_id for idea in ideas] == ["", ""]
+
+
+def test_single_quoted_python_dict_is_repaired():
+    response = (
+        "```json\n{'ideas': [{'idea_id': 'I2', 'title': \"Farmers' soil map\","
+        " 'description': 'Maps moisture.'},]}\n```"
+    )
+
+    ideas = parse_response(response, TopIdeasList).ideas
+
+    assert [(idea.idea_id, idea.title) for idea in ideas] == [("I2", "Farmers' soil map")]
@@ -0,0 +1,48 @@
+# test_web_search.py
+# This file contains the tests for the cached web search.
+
+import asyncio
+
+import pytest
+
+from brainstorm.utils.cache import DiskCache
+from brainstorm.utils.web_search import CachedWebSearch
+
+
+class ScriptedSearch:
+    """Answers each query with the given text and counts the calls."""
+
+    def __init__(self, answer: str):
+        self.answer = answer
+        self.calls = 0
+
+    def run(self, query: str) -> str:
+        self.calls += 1
+        return self.answer
+
+
+@pytest.mark.parametrize(
+    "answer",
+    [
+        "No good DuckDuckGo Search Result was found",
+        "Error: 202 Ratelimit",
+        "Tool execution error",
+        "   ",
+    ],
+)
+def test_non_results_are_not_cached(tmp_path, answer):
+    search = ScriptedSearch(answer)
+    cached_search = CachedWebSearch(cache=DiskCache("search", tmp_path), search=search)
+
+    for _ in range(2):
+        assert asyncio.run(cached_search.arun("smart garden sensors")) == answer
+    assert search.calls == 2
+
+
+def test_results_are_cached(tmp_path):
+    search = ScriptedSearch("Soil moisture sensors report every hour.")
+    cached_search = CachedWebSearch(cache=DiskCache("search", tmp_path), search=search)
+
+    for _ in range(2):
+        assert asyncio.run(cached_search.arun("Smart  garden sensors")) == search.answer
+    assert search.calls == 1